@@ -3,7 +3,15 @@ import os
 from flask import Flask, jsonify, send_from_directory
 
 from config import Config
+from json_provider import RapidoJSONProvider
 from extensions import db, jwt, cors, mail  # ⭐ Agregar mail
+import busqueda_service
+import cache_service
+import cupos_service
+import documento_service
+import expiracion_service
+import idempotencia_service
+import reportes_service
 from routes.consulta_routes import consulta_bp
 
 # imports de rutas
@@ -15,6 +23,7 @@ import routes.admin_routes as admin_routes
 
 def create_app():
     app = Flask(__name__)
+    app.json = RapidoJSONProvider(app)  # JSON con orjson (Decimal, fechas y Enum nativos)
     app.config.from_object(Config)
     app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100 MB
 
@@ -44,10 +53,17 @@ def create_app():
     cors(app, resources={r"/*": {
         "origins": origins_list,
         "methods": ["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
+        "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Idempotency-Key"],
         "supports_credentials": True if origins_list != "*" else False
     }})
     mail.init_app(app)  # ⭐ Inicializar mail
+    documento_service.init_app(app)  # Documentos precalculados de /tours/<slug>
+    cache_service.init_app(app)  # Caché de respuestas del catálogo público
+    busqueda_service.init_app(app)  # Índice de facetas para /tours/buscar
+    reportes_service.init_app(app)  # Rollups de reportes de reservas
+    cupos_service.init_app(app)  # Plazas de cupos: compactación y conciliación
+    expiracion_service.init_app(app)  # Barrido de pre-reservas vencidas
+    idempotencia_service.init_app(app)  # Purga de Idempotency-Key vencidas
 
     # Registrar blueprints
     app.register_blueprint(auth_routes.auth_bp)
@@ -72,4 +88,5 @@ def create_app():
 app = create_app()
 
 if __name__ == "__main__":
+    expiracion_service.iniciar_barrido(app)
     app.run(debug=True, threaded=True,use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,96 @@
+# benchmarks/bench_admin_reservas.py
+"""
+Consultas y tiempo de GET /admin/reservas según la cantidad de reservas
+(user-011): la cantidad de consultas no depende del número de filas.
+"Antes" reproduce el listado anterior (un .get() de usuario, tour y fecha
+por reserva) para comparar.
+
+    python -m benchmarks.bench_admin_reservas [--reservas 10 100 1000]
+    TEST_DATABASE_URL=postgresql://... python -m benchmarks.bench_admin_reservas
+"""
+import argparse
+import time
+
+from sqlalchemy import event
+
+from tests.conftest import _desmontar, crear_app_prueba, sembrar
+
+
+def _agregar_reservas(app, datos, n):
+    from extensions import db
+    from models import Reserva, Usuario
+
+    with app.app_context():
+        usuarios = [
+            Usuario(nombre=f"Cliente {i}", email=f"c{i}@bench.test", rol="cliente", password_hash="x")
+            for i in range(n)
+        ]
+        db.session.add_all(usuarios)
+        db.session.flush()
+        db.session.add_all([
+            Reserva(usuario_id=u.id, tour_id=datos["tour_id"], fecha_tour_id=datos["fecha_ids"][0],
+                    numero_personas=1, monto_total=850)
+            for u in usuarios
+        ])
+        db.session.commit()
+
+
+def _antes(app):
+    """El listado anterior: todas las reservas y tres .get() por fila."""
+    from extensions import db
+    from models import FechaTour, Reserva, Tour, Usuario
+
+    with app.app_context():
+        filas = []
+        for r in Reserva.query.order_by(Reserva.created_at.desc()).all():
+            usuario = db.session.get(Usuario, r.usuario_id)
+            tour = db.session.get(Tour, r.tour_id)
+            fecha = db.session.get(FechaTour, r.fecha_tour_id)
+            filas.append((r.id, usuario.nombre, tour.nombre, fecha.fecha_inicio))
+        db.session.remove()
+        return filas
+
+
+def _medir(app, funcion):
+    from extensions import db
+
+    consultas = []
+
+    def _anotar(*args):
+        consultas.append(1)
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", _anotar)
+    try:
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+    finally:
+        event.remove(motor, "before_cursor_execute", _anotar)
+    return len(consultas), segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reservas", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'reservas':>8}  {'antes':>22}  {'lista completa':>22}  {'page=1 per_page=50':>22}")
+    for n in args.reservas:
+        app = crear_app_prueba()
+        datos = sembrar(app)
+        _agregar_reservas(app, datos, n)
+        client = app.test_client()
+
+        columnas = [
+            _medir(app, lambda: _antes(app)),
+            _medir(app, lambda: client.get("/admin/reservas", headers=datos["admin"])),
+            _medir(app, lambda: client.get("/admin/reservas?page=1&per_page=50", headers=datos["admin"])),
+        ]
+        print(f"{n:>8}  " + "  ".join(f"{c:>5} consultas {s * 1000:6.1f} ms" for c, s in columnas))
+        _desmontar(app)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_cupos.py
+"""
+Estrés de reservas concurrentes sobre una sola salida (user-021/022): varios
+hilos reservan de a una persona en la misma FechaTour hasta agotarla, en
+modo "fila" y en modo "plazas". Al final comprueba que no hubo sobreventa
+(reservas creadas y ocupados == cupos_totales) e informa reservas por
+segundo de cada modo.
+
+--trabajo simula lo que el checkout hace después de ocupar los cupos y antes
+del commit (otras consultas, latencia de red): en modo fila la fila de
+fechas_tour queda bloqueada todo ese tiempo y las reservas de la salida se
+encolan; en modo plazas cada una bloquea solo sus plazas.
+
+    python -m benchmarks.bench_cupos [--hilos 16] [--cupos 400] [--trabajo 0.02] [--modo fila plazas]
+    TEST_DATABASE_URL=postgresql://... python -m benchmarks.bench_cupos
+
+Sin TEST_DATABASE_URL usa un SQLite en archivo, que serializa las
+transacciones enteras (un solo escritor): mide el costo por reserva, no la
+contención de Postgres, y los dos modos salen parecidos.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Primero tests.conftest: configura la BD de pruebas antes de importar la app
+from tests.conftest import POSTGRES, _desmontar, crear_app_prueba, sembrar
+
+import cupos_service
+import reserva_service
+from extensions import db
+from models import FechaTour, Reserva
+
+
+def _medir(modo, args, intentos, directorio):
+    app = crear_app_prueba(None if POSTGRES else str(Path(directorio) / f"bench-{modo}.db"))
+    app.config["CUPOS_MODO"] = modo
+    datos = sembrar(app, cupos=args.cupos)
+    url = f"/tours/{datos['tour_id']}/reservas"
+    cuerpo = {"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": 1}
+    clientes = threading.local()
+
+    def reservar(_):
+        if not hasattr(clientes, "client"):
+            clientes.client = app.test_client()
+        inicio = time.perf_counter()
+        estado = clientes.client.post(url, json=cuerpo, headers=datos["cliente"]).status_code
+        return estado, time.perf_counter() - inicio
+
+    # Primera reserva fuera de la medición (en modo plazas crea las plazas)
+    assert app.test_client().post(url, json=cuerpo, headers=datos["cliente"]).status_code == 201
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as hilos:
+        resultados = list(hilos.map(reservar, range(intentos)))
+    segundos = time.perf_counter() - inicio
+
+    with app.app_context():
+        columna = db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados
+        ocupados = cupos_service.ocupados_del_tour(datos["tour_id"])[datos["fecha_ids"][0]]
+        reservas = Reserva.query.count()
+    _desmontar(app)
+
+    creadas = sum(1 for estado, _ in resultados if estado == 201)
+    rechazadas = sum(1 for estado, _ in resultados if estado == 400)
+    latencias = sorted(t for estado, t in resultados if estado == 201)
+
+    print(f"modo={modo}")
+    print(f"  creadas={creadas} rechazadas={rechazadas} otras={intentos - creadas - rechazadas}")
+    print(f"  reservas en BD={reservas} ocupados={ocupados} cupos_ocupados(columna)={columna}")
+    print(f"  {creadas / segundos:.1f} reservas/s en {segundos:.2f} s, "
+          f"p50={latencias[len(latencias) // 2] * 1000:.1f} ms p95={latencias[int(len(latencias) * 0.95)] * 1000:.1f} ms")
+
+    sobreventa = max(reservas, ocupados) - args.cupos
+    print("  SIN SOBREVENTA" if sobreventa <= 0 and reservas == args.cupos else f"  SOBREVENTA: {sobreventa}")
+    return creadas / segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--cupos", type=int, default=400)
+    parser.add_argument("--intentos", type=int, default=None, help="Por defecto cupos + 25%%")
+    parser.add_argument("--trabajo", type=float, default=0.02, help="Segundos dentro de la transacción tras ocupar")
+    parser.add_argument("--modo", nargs="+", choices=("fila", "plazas"), default=["fila", "plazas"])
+    args = parser.parse_args()
+    intentos = args.intentos or args.cupos + args.cupos // 4
+
+    # Los correos de Resend no salen (ni cuentan en la medición)
+    reserva_service.enviar_email = lambda *args, **kwargs: {"id": "bench"}
+
+    reservar = cupos_service.reservar
+
+    def _reservar_y_trabajar(fecha, personas):
+        ocupados = reservar(fecha, personas)
+        time.sleep(args.trabajo)
+        return ocupados
+
+    cupos_service.reservar = _reservar_y_trabajar
+
+    print(f"hilos={args.hilos} cupos={args.cupos} intentos={intentos} "
+          f"trabajo={args.trabajo * 1000:.0f} ms bd={'postgres' if POSTGRES else 'sqlite'}")
+    with tempfile.TemporaryDirectory() as directorio:
+        ritmos = {modo: _medir(modo, args, intentos - 1, directorio) for modo in args.modo}
+
+    if len(ritmos) == 2:
+        print(f"plazas/fila: {ritmos['plazas'] / ritmos['fila']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_json.py
+"""
+Microbenchmark del proveedor JSON (user-008): jsonify() con el proveedor por
+defecto de Flask frente a RapidoJSONProvider, sobre un payload con la forma
+de GET /admin/tours (to_detail_dict de cada tour).
+
+    python -m benchmarks.bench_json [--tours 200] [--repeticiones 20]
+"""
+import argparse
+import decimal
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import RapidoJSONProvider
+from models import ReservaEstado
+
+
+def _tour(i):
+    inicio = date(2026, 1, 1) + timedelta(days=i)
+    return {
+        "id": i,
+        "nombre": f"Tour {i} - Galápagos y Amazonía",
+        "slug": f"tour-{i}",
+        "pais": "Ecuador",
+        "precio_pp": decimal.Decimal("1850.00") + i,
+        "moneda": "USD",
+        "duracion_dias": 8,
+        "descripcion_larga": "Texto largo del tour. " * 40,
+        "categoria": {"id": 1, "nombre": "Islas", "slug": "islas"},
+        "fechas": [
+            {
+                "id": i * 10 + f,
+                "fecha_inicio": (inicio + timedelta(weeks=f)).isoformat(),
+                "fecha_fin": (inicio + timedelta(weeks=f, days=7)).isoformat(),
+                "cupos_totales": 16,
+                "cupos_ocupados": f,
+                "estado": "abierta",
+            }
+            for f in range(12)
+        ],
+        "itinerarios": [
+            {"id": d, "orden_dia": d, "titulo_dia": f"Día {d}", "descripcion_dia": "Caminata y snorkel. " * 10}
+            for d in range(1, 9)
+        ],
+        "galeria": [{"id": g, "foto_url": f"/uploads/{i}/{g}.jpg", "orden": g} for g in range(20)],
+        "ubicaciones": [
+            {"id": u, "nombre": f"Punto {u}", "latitud": -0.5 - u / 100, "longitud": -90.3 + u / 100}
+            for u in range(10)
+        ],
+        "reservas_recientes": [
+            {
+                "id": r,
+                "monto_total": decimal.Decimal("3700.00"),
+                "estado_reserva": ReservaEstado.CONFIRMADA,
+                "created_at": datetime(2026, 1, 1, 10, r).isoformat(),
+            }
+            for r in range(5)
+        ],
+    }
+
+
+def _convertido(valor):
+    """Lo que hacían los to_dict antes: Decimal -> float, Enum -> .value."""
+    if isinstance(valor, dict):
+        return {k: _convertido(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_convertido(v) for v in valor]
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    if isinstance(valor, ReservaEstado):
+        return valor.value
+    return valor
+
+
+def _medir(app, proveedor, payload, repeticiones):
+    app.json = proveedor
+    tiempos = []
+    with app.app_context():
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            cuerpo = app.json.response(payload).get_data()
+            tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), len(cuerpo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tours", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    nativo = [_tour(i) for i in range(args.tours)]
+
+    convertido = _convertido(nativo)
+    casos = [
+        ("Flask por defecto (to_dict convierte)", DefaultJSONProvider(app), convertido),
+        ("RapidoJSONProvider (to_dict convierte)", RapidoJSONProvider(app), convertido),
+        ("RapidoJSONProvider (Decimal/Enum nativos)", RapidoJSONProvider(app), nativo),
+    ]
+
+    base = None
+    print(f"{args.tours} tours, mediana de {args.repeticiones} repeticiones de jsonify()")
+    for nombre, proveedor, payload in casos:
+        segundos, tamano = _medir(app, proveedor, payload, args.repeticiones)
+        base = base or segundos
+        print(f"  {nombre:42s} {segundos * 1000:7.2f} ms  x{base / segundos:4.1f}  ({tamano / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
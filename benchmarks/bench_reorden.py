@@ -0,0 +1,90 @@
+# benchmarks/bench_reorden.py
+"""
+Reordenar galerías grandes (user-019): un UPDATE por id, como hacían los
+endpoints anteriores, frente a reorden_service.reordenar() con un solo
+UPDATE ... FROM (VALUES ...). Las consultas de reordenar() incluyen la
+regeneración del documento público del tour al hacer commit (fijas).
+
+    python -m benchmarks.bench_reorden [--fotos 100 1000 5000]
+    TEST_DATABASE_URL=postgresql://... python -m benchmarks.bench_reorden
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import event
+
+from tests.conftest import _desmontar, crear_app_prueba, sembrar
+
+
+def _galeria(app, tour_id, n):
+    from extensions import db
+    from models import Galeria
+
+    with app.app_context():
+        fotos = [Galeria(tour_id=tour_id, foto_url=f"/g{i}.jpg", orden=i + 1) for i in range(n)]
+        db.session.add_all(fotos)
+        db.session.commit()
+        return [f.id for f in fotos]
+
+
+def _antes(ids):
+    from extensions import db
+    from models import Galeria
+
+    for posicion, id_ in enumerate(ids, start=1):
+        Galeria.query.filter_by(id=id_).update({"orden": posicion})
+    db.session.commit()
+
+
+def _despues(ids, tour_id):
+    import reorden_service
+    from extensions import db
+
+    reorden_service.reordenar("galeria", ids, tour_id)
+    db.session.commit()
+
+
+def _medir(app, funcion):
+    from extensions import db
+
+    consultas = []
+
+    def _anotar(*args):
+        consultas.append(1)
+
+    with app.app_context():
+        motor = db.engine
+        event.listen(motor, "before_cursor_execute", _anotar)
+        try:
+            inicio = time.perf_counter()
+            funcion()
+            segundos = time.perf_counter() - inicio
+        finally:
+            event.remove(motor, "before_cursor_execute", _anotar)
+            db.session.remove()
+    return len(consultas), segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fotos", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'fotos':>6}  {'un UPDATE por id':>26}  {'reordenar()':>26}")
+    for n in args.fotos:
+        app = crear_app_prueba()
+        datos = sembrar(app)
+        ids = _galeria(app, datos["tour_id"], n)
+
+        columnas = []
+        for funcion in (lambda: _antes(ids), lambda: _despues(ids, datos["tour_id"])):
+            random.shuffle(ids)
+            columnas.append(_medir(app, funcion))
+
+        print(f"{n:>6}  " + "  ".join(f"{c:>6} consultas {s * 1000:8.1f} ms" for c, s in columnas))
+        _desmontar(app)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_reservas.py
+"""
+Latencia de POST /tours/<id>/reservas (user-025) con los correos de Resend
+simulados (--retraso segundos por correo; son dos: cliente y admin).
+Compara enviarlos antes de responder (RESERVAS_CORREOS_EN_FONDO=0, como
+antes) con encargarlos al hilo de reserva_service (por defecto).
+
+    python -m benchmarks.bench_reservas [--reservas 50] [--retraso 0.3]
+    TEST_DATABASE_URL=postgresql://... python -m benchmarks.bench_reservas
+"""
+import argparse
+import time
+
+# Primero tests.conftest: configura la BD de pruebas antes de importar la app
+from tests.conftest import _desmontar, crear_app_prueba, sembrar
+
+import reserva_service
+
+
+def _medir(en_fondo, reservas, retraso):
+    app = crear_app_prueba()
+    app.config["RESERVAS_CORREOS_EN_FONDO"] = en_fondo
+    datos = sembrar(app, cupos=reservas)
+    client = app.test_client()
+    url = f"/tours/{datos['tour_id']}/reservas"
+    cuerpo = {"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": 1}
+
+    latencias = []
+    for _ in range(reservas):
+        inicio = time.perf_counter()
+        assert client.post(url, json=cuerpo, headers=datos["cliente"]).status_code == 201
+        latencias.append(time.perf_counter() - inicio)
+
+    # Hasta que sale el último correo (un solo hilo: la cola es FIFO)
+    inicio = time.perf_counter()
+    if en_fondo:
+        reserva_service._ejecutor_avisos().submit(lambda: None).result()
+    pendiente = time.perf_counter() - inicio
+    _desmontar(app)
+
+    latencias.sort()
+    return latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.95)], pendiente
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reservas", type=int, default=50)
+    parser.add_argument("--retraso", type=float, default=0.3, help="Segundos por correo")
+    args = parser.parse_args()
+
+    def _enviar(*_args, **_kwargs):
+        time.sleep(args.retraso)
+        return {"id": "bench"}
+
+    reserva_service.enviar_email = _enviar
+
+    print(f"reservas={args.reservas} retraso por correo={args.retraso * 1000:.0f} ms")
+    print(f"{'correos':>22}  {'p50':>9}  {'p95':>9}  {'cola al terminar':>16}")
+    for nombre, en_fondo in (("antes de responder", False), ("en fondo", True)):
+        p50, p95, pendiente = _medir(en_fondo, args.reservas, args.retraso)
+        print(f"{nombre:>22}  {p50 * 1000:7.1f}ms  {p95 * 1000:7.1f}ms  {pendiente:14.2f} s")
+
+
+if __name__ == "__main__":
+    main()
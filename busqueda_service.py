@@ -0,0 +1,266 @@
+# busqueda_service.py
+"""
+Índice de facetas del catálogo en memoria (por proceso).
+
+GET /tours/buscar filtra por país, categoría, nivel, rangos de duración y
+precio y mes de la próxima salida abierta, y devuelve además el conteo de
+cada faceta. El mes no mira si quedan cupos: eso cambia con cada reserva, que
+no toca la versión del catálogo, y los demás workers no se enterarían.
+Todo se resuelve con intersecciones de conjuntos sobre este índice, sin
+consultar Postgres.
+
+Actualización:
+- Se construye al arrancar el worker (INDICE_CATALOGO_PRECARGA) o, si no se
+  pudo, en la primera búsqueda.
+- Los commits de este worker marcan sus tours (documento_service resuelve qué
+  tours tocó cada commit) y la siguiente búsqueda recarga solo esos tours.
+- Cada INDICE_CATALOGO_REVISION segundos se comparan las versiones de las
+  tablas del índice (tours, fechas_tour, categorias; ver cache_service) y, si
+  cambiaron (p. ej. por otro worker) o cambió el día, se reconstruye entero:
+  con unos cientos de tours son tres consultas.
+"""
+import threading
+import time
+import unicodedata
+from datetime import date
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import SQLAlchemyError
+
+from cache_service import tablas_catalogo, version_catalogo
+from documento_service import CLAVE_TOURS_MODIFICADOS
+from extensions import db
+from models import Categoria, Tour, FechaTour, tour_card_options
+
+# (clave, mínimo inclusive, máximo exclusivo o None)
+RANGOS_DURACION = (
+    ("1-3", 1, 4),
+    ("4-7", 4, 8),
+    ("8-14", 8, 15),
+    ("15+", 15, None),
+)
+
+RANGOS_PRECIO = (
+    ("0-500", 0, 500),
+    ("500-1000", 500, 1000),
+    ("1000-2000", 1000, 2000),
+    ("2000-4000", 2000, 4000),
+    ("4000+", 4000, None),
+)
+
+FACETAS = ("pais", "categoria", "nivel", "duracion", "precio", "mes")
+
+# Tablas que alimentan el índice. Las altas y ediciones de salidas del admin
+# cambian la faceta "mes": que incrementen su versión (los cupos de
+# cupos_service no lo hacen)
+_TABLAS_INDICE = (Tour.__tablename__, FechaTour.__tablename__, Categoria.__tablename__)
+tablas_catalogo.update(_TABLAS_INDICE)
+
+
+def normalizar(texto):
+    """minúsculas y sin tildes: 'Perú' -> 'peru'."""
+    texto = unicodedata.normalize("NFKD", (texto or "").strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _rango(valor, rangos):
+    if valor is None:
+        return None
+    for clave, minimo, maximo in rangos:
+        if valor >= minimo and (maximo is None or valor < maximo):
+            return clave
+    return None
+
+
+# =====================================================
+# ÍNDICE
+# =====================================================
+
+class _Indice:
+    """Foto inmutable del catálogo: se reemplaza entera, nunca se modifica."""
+
+    def __init__(self, entradas, version, dia):
+        self.entradas = entradas  # tour_id -> (orden, card, facetas)
+        self.version = version
+        self.dia = dia
+        self.orden = sorted(entradas, key=lambda tour_id: entradas[tour_id][0])
+        self.todos = frozenset(entradas)
+
+        self.invertido = {faceta: {} for faceta in FACETAS}
+        for tour_id, (_, _, facetas) in entradas.items():
+            for faceta, valor in facetas.items():
+                if valor is not None:
+                    self.invertido[faceta].setdefault(valor, set()).add(tour_id)
+
+    def _coincidentes(self, filtros, excepto=None):
+        ids = self.todos
+        for faceta, valores in filtros.items():
+            if faceta == excepto:
+                continue
+            indice = self.invertido[faceta]
+            ids = ids & set().union(*(indice.get(v, ()) for v in valores))
+        return ids
+
+    def buscar(self, filtros):
+        ids = self._coincidentes(filtros)
+
+        # Conteo de cada faceta ignorando su propio filtro, para que el front
+        # pueda mostrar las demás opciones de esa faceta
+        facetas = {}
+        for faceta in FACETAS:
+            base = ids if faceta not in filtros else self._coincidentes(filtros, excepto=faceta)
+            conteo = {valor: len(tours & base) for valor, tours in self.invertido[faceta].items()}
+            facetas[faceta] = {valor: n for valor, n in sorted(conteo.items()) if n}
+
+        return {
+            "items": [self.entradas[t][1] for t in self.orden if t in ids],
+            "total": len(ids),
+            "facetas": facetas,
+        }
+
+
+_lock = threading.Lock()
+_indice = None
+_pendientes = set()
+_ultima_revision = 0.0
+
+
+def _cargar_entradas(tour_ids=None):
+    """Lee de la BD las entradas de los tours activos (todos o los indicados)."""
+    hoy = date.today()
+
+    proxima_salida = (
+        db.session.query(
+            FechaTour.tour_id.label("tour_id"),
+            func.min(FechaTour.fecha_inicio).label("fecha"),
+        )
+        .filter(
+            FechaTour.fecha_inicio >= hoy,
+            FechaTour.estado == "abierta",
+        )
+        .group_by(FechaTour.tour_id)
+        .subquery()
+    )
+
+    q = (
+        db.session.query(Tour, proxima_salida.c.fecha)
+        .options(*tour_card_options())
+        .outerjoin(proxima_salida, proxima_salida.c.tour_id == Tour.id)
+        .filter(Tour.activo == True)
+    )
+    if tour_ids is not None:
+        q = q.filter(Tour.id.in_(tour_ids))
+
+    entradas = {}
+    for tour, fecha in q.all():
+        precio = float(tour.precio_pp) if tour.precio_pp is not None else None
+        facetas = {
+            "pais": normalizar(tour.pais) or None,
+            "categoria": tour.categoria.slug if tour.categoria else None,
+            "nivel": normalizar(tour.nivel_actividad) or None,
+            "duracion": _rango(tour.duracion_dias, RANGOS_DURACION),
+            "precio": _rango(precio, RANGOS_PRECIO),
+            "mes": fecha.strftime("%Y-%m") if fecha else None,
+        }
+        orden = (tour.orden_destacado is None, tour.orden_destacado or 0, tour.id)
+        entradas[tour.id] = (orden, tour.to_card_dict(), facetas)
+    return entradas
+
+
+def reconstruir():
+    """Reconstruye el índice completo. Requiere contexto de aplicación."""
+    global _indice, _ultima_revision
+    with _lock:
+        _pendientes.clear()  # quedan incluidos en la reconstrucción
+    version = version_catalogo(_TABLAS_INDICE)
+    indice = _Indice(_cargar_entradas(), version, date.today())
+    with _lock:
+        _indice = indice
+        _ultima_revision = time.monotonic()
+    return indice
+
+
+def _aplicar_pendientes(indice):
+    global _indice
+    with _lock:
+        tour_ids = set(_pendientes)
+        _pendientes.clear()
+
+    entradas = dict(indice.entradas)
+    for tour_id in tour_ids:
+        entradas.pop(tour_id, None)
+    entradas.update(_cargar_entradas(tour_ids))
+
+    # La versión no se actualiza: la próxima revisión reconcilia con otros workers
+    indice = _Indice(entradas, indice.version, indice.dia)
+    with _lock:
+        _indice = indice
+    return indice
+
+
+def _marcar_revisado():
+    global _ultima_revision
+    with _lock:
+        _ultima_revision = time.monotonic()
+
+
+def obtener_indice(revision=30):
+    """Índice vigente; lo construye o actualiza si hace falta."""
+    indice = _indice
+    if indice is None or indice.dia != date.today():
+        return reconstruir()
+
+    if time.monotonic() - _ultima_revision >= revision:
+        if version_catalogo(_TABLAS_INDICE) != indice.version:
+            return reconstruir()
+        _marcar_revisado()
+
+    if _pendientes:
+        indice = _aplicar_pendientes(indice)
+    return indice
+
+
+def leer_filtros(args):
+    """
+    Convierte la query string en {faceta: {valores}}. Cada faceta admite
+    varios valores (?nivel=baja&nivel=moderada o ?nivel=baja,moderada), que se
+    combinan con OR; facetas distintas se combinan con AND.
+    """
+    filtros = {}
+    for faceta in FACETAS:
+        valores = set()
+        for crudo in args.getlist(faceta):
+            for valor in crudo.split(","):
+                valor = valor.strip()
+                if faceta in ("pais", "nivel"):
+                    valor = normalizar(valor)
+                if valor:
+                    valores.add(valor)
+        if valores:
+            filtros[faceta] = valores
+    return filtros
+
+
+# =====================================================
+# ACTUALIZACIÓN POR COMMIT
+# =====================================================
+
+@event.listens_for(db.session, "after_commit")
+def _marcar_pendientes(session):
+    tour_ids = session.info.pop(CLAVE_TOURS_MODIFICADOS, None)
+    if tour_ids:
+        with _lock:
+            _pendientes.update(tour_ids)
+
+
+def init_app(app):
+    if not app.config.get("INDICE_CATALOGO_PRECARGA", True):
+        return
+    with app.app_context():
+        try:
+            reconstruir()
+        except SQLAlchemyError as e:
+            # Sin BD al arrancar: se construirá en la primera búsqueda
+            app.logger.warning(f"No se pudo precargar el índice del catálogo: {e}")
+        finally:
+            db.session.remove()
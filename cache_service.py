@@ -0,0 +1,341 @@
+# cache_service.py
+"""
+Caché en memoria (por proceso) para las respuestas públicas del catálogo.
+
+- Acotada: LRU con un máximo de entradas y TTL por entrada.
+- Clave: versiones de las tablas de las que depende la vista + endpoint +
+  argumentos de la URL + query string normalizada.
+- Invalidación precisa: cada entrada declara de qué tablas depende y un
+  listener after_commit de la sesión borra solo las entradas cuyas tablas
+  cambiaron en esa transacción.
+
+Cada tabla del catálogo tiene su versión (travel.catalogo_versiones), que se
+incrementa en el mismo commit que la modifica. Sirven para dos cosas:
+- ETag fuerte de cada respuesta: un If-None-Match vigente recibe 304 sin
+  serializar nada.
+- Los demás workers de gunicorn, que no ven nuestro after_commit, dejan de
+  acertar en sus entradas viejas porque la clave ya incluye la versión nueva
+  de alguna de sus tablas. Un cambio en otra tabla no toca la clave.
+
+Un UPDATE masivo que no cambia nada visible del catálogo (los cupos ocupados
+de cupos_service) se marca con execution_options(catalogo=False) y no cuenta.
+
+Cada worker relee las versiones de la BD (una consulta, una fila por tabla)
+como mucho cada CATALOGO_VERSION_REVISION segundos y toma al instante las de
+sus propios commits, así que un acierto de la caché no consulta la BD. Lo que
+otro worker cambió se ve, como mucho, tras ese intervalo.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import CatalogoVersion
+
+# Clave en session.info donde se acumulan las tablas tocadas hasta el commit
+_CLAVE_TABLAS = "cache_tablas_modificadas"
+
+# Clave en session.info con los usuarios cuyas reservas/comentarios cambiaron
+_CLAVE_USUARIOS = "cache_usuarios_modificados"
+
+# Clave en session.info con las versiones escritas en el commit en curso
+_CLAVE_VERSION = "cache_versiones_catalogo"
+
+# Tablas con usuario_id cuyas filas alimentan datos cacheados por usuario
+_TABLAS_POR_USUARIO = ("reservas", "comentarios")
+
+
+class CacheTTL:
+    """Diccionario LRU con TTL, seguro entre hilos, con contadores de uso."""
+
+    def __init__(self, max_entradas=512, ttl=60):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira_en, tablas, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+        self.invalidadas = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+
+            expira_en, _, valor = entrada
+            if expira_en <= time.monotonic():
+                del self._datos[clave]
+                self.expiradas += 1
+                self.misses += 1
+                return None
+
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, clave, valor, tablas=(), ttl=None):
+        expira_en = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (expira_en, frozenset(tablas), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojadas += 1
+
+    def invalidar(self, clave):
+        with self._lock:
+            if self._datos.pop(clave, None) is not None:
+                self.invalidadas += 1
+
+    def invalidar_tablas(self, tablas):
+        """Elimina las entradas que dependen de alguna de las tablas dadas."""
+        tablas = set(tablas)
+        with self._lock:
+            claves = [c for c, (_, deps, _) in self._datos.items() if deps & tablas]
+            for clave in claves:
+                del self._datos[clave]
+            self.invalidadas += len(claves)
+        return len(claves)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / consultas, 4) if consultas else 0,
+                "expiradas": self.expiradas,
+                "desalojadas": self.desalojadas,
+                "invalidadas": self.invalidadas,
+            }
+
+
+# Caché de respuestas del catálogo público (tour_bp)
+respuestas = CacheTTL()
+
+# Fotos de pocos segundos de consultas agregadas del admin (dashboard, etc.)
+instantaneas = CacheTTL(max_entradas=32, ttl=5)
+
+# Estadísticas de perfil por usuario (clave: usuario_id). Se invalidan cuando
+# cambian el usuario, sus reservas o sus comentarios (en este worker; en los
+# demás, como mucho tras el TTL)
+estadisticas_usuarios = CacheTTL(max_entradas=2048, ttl=60)
+
+# Tablas de las que depende alguna respuesta cacheada (se llena con @cachear)
+tablas_catalogo = set()
+
+# Versiones por tabla vistas por este worker y cuándo se leyeron (monotonic)
+_version = None  # {tabla: version}
+_version_leida_en = 0.0
+_version_lock = threading.Lock()
+revision_version = 5  # segundos entre lecturas de la BD (ver init_app)
+
+
+# =====================================================
+# DECORADOR PARA ENDPOINTS
+# =====================================================
+
+def _clave_request():
+    """endpoint + view_args + query string normalizada (ordenada, sin vacíos)."""
+    args = tuple(
+        (k, tuple(v for v in valores if v != ""))
+        for k, valores in sorted(request.args.lists())
+        if any(v != "" for v in valores)
+    )
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    return (request.endpoint, view_args, args)
+
+
+def _recordar_versiones(versiones, completas=False):
+    """Guarda versiones leídas (completas) o escritas por un commit propio."""
+    global _version, _version_leida_en
+    with _version_lock:
+        if completas:
+            _version = dict(versiones)
+            _version_leida_en = time.monotonic()
+        elif _version is not None:
+            _version = {**_version, **versiones}
+
+
+def version_catalogo(tablas=None):
+    """
+    Tupla con la versión de cada tabla (ordenadas; 0 si aún no tiene fila),
+    por defecto de todas las del catálogo. Solo consulta la BD si la última
+    lectura de este worker tiene más de revision_version segundos.
+    """
+    versiones = _version
+    if versiones is None or time.monotonic() - _version_leida_en >= revision_version:
+        versiones = dict(db.session.execute(select(CatalogoVersion.tabla, CatalogoVersion.version)).all())
+        _recordar_versiones(versiones, completas=True)
+    return tuple(versiones.get(t, 0) for t in sorted(tablas or tablas_catalogo))
+
+
+def respuesta_no_modificada(etag):
+    """304 con el ETag vigente, sin cuerpo."""
+    respuesta = current_app.response_class(status=304)
+    respuesta.set_etag(etag)
+    respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta
+
+
+def cachear(*modelos):
+    """
+    Cachea la respuesta 200 de un GET público y la sirve con ETag.
+    Los modelos indican de qué tablas depende la respuesta; cualquier commit
+    que las modifique invalida la entrada y cambia el ETag.
+
+        @tour_bp.get("/guias")
+        @cachear(Guia)
+        def public_list_guias(): ...
+    """
+    tablas = frozenset(m.__tablename__ for m in modelos)
+    tablas_catalogo.update(tablas)
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            clave = (version_catalogo(tablas), *_clave_request())
+            etag = hashlib.blake2b(repr(clave).encode(), digest_size=16).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                return respuesta_no_modificada(etag)
+
+            cacheada = respuestas.obtener(clave)
+            if cacheada is not None:
+                cuerpo, mimetype = cacheada
+                respuesta = current_app.response_class(cuerpo, mimetype=mimetype)
+            else:
+                respuesta = current_app.make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200 or respuesta.is_streamed:
+                    return respuesta
+                respuestas.guardar(clave, (respuesta.get_data(), respuesta.mimetype), tablas)
+
+            respuesta.set_etag(etag)
+            respuesta.headers["Cache-Control"] = "no-cache"
+            return respuesta
+
+        return envoltura
+
+    return decorador
+
+
+# =====================================================
+# INVALIDACIÓN POR COMMIT
+# =====================================================
+
+def _tablas_pendientes(session):
+    return session.info.setdefault(_CLAVE_TABLAS, set())
+
+
+def _usuarios_pendientes(session):
+    return session.info.setdefault(_CLAVE_USUARIOS, set())
+
+
+def _usuarios_de_objeto(obj, nombre):
+    if nombre == "usuarios":
+        return {obj.id}
+    if nombre in _TABLAS_POR_USUARIO:
+        # Incluir el usuario anterior si la fila cambió de dueño
+        historial = inspect(obj).attrs.usuario_id.history
+        return {obj.usuario_id, *(historial.deleted or ())}
+    return set()
+
+
+@event.listens_for(db.session, "after_flush")
+def _registrar_tablas_flush(session, flush_context):
+    tablas = _tablas_pendientes(session)
+    usuarios = _usuarios_pendientes(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        nombre = getattr(obj, "__tablename__", None)
+        if nombre:
+            tablas.add(nombre)
+            usuarios.update(_usuarios_de_objeto(obj, nombre))
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _registrar_tablas_masivas(orm_execute_state):
+    # UPDATE/DELETE/INSERT masivos no pasan por el flush
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    if orm_execute_state.execution_options.get("catalogo") is False:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        nombre = mapper.local_table.name
+        _tablas_pendientes(orm_execute_state.session).add(nombre)
+        if nombre == "usuarios" or nombre in _TABLAS_POR_USUARIO:
+            # No sabemos qué usuarios toca: invalidar todos al confirmar
+            _usuarios_pendientes(orm_execute_state.session).add(None)
+
+
+@event.listens_for(db.session, "before_commit")
+def _incrementar_version(session):
+    # before_commit se dispara antes del flush final: vaciar primero lo pendiente
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+
+    tablas = sorted((session.info.get(_CLAVE_TABLAS) or set()) & tablas_catalogo)
+    if not tablas:
+        return
+
+    # Una fila por tabla (en orden, para evitar deadlocks); la primera vez se crea
+    stmt = pg_insert(CatalogoVersion.__table__).values([{"tabla": t, "version": 1} for t in tablas])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tabla"],
+        set_={"version": CatalogoVersion.__table__.c.version + 1},
+    ).returning(CatalogoVersion.tabla, CatalogoVersion.version)
+    session.info[_CLAVE_VERSION] = dict(session.execute(stmt).all())
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidar_tras_commit(session):
+    versiones = session.info.pop(_CLAVE_VERSION, None)
+    if versiones:
+        # Este worker ve su propio cambio sin esperar a la próxima lectura
+        _recordar_versiones(versiones)
+
+    tablas = session.info.pop(_CLAVE_TABLAS, None)
+    if tablas:
+        respuestas.invalidar_tablas(tablas)
+        instantaneas.invalidar_tablas(tablas)
+
+    usuarios = session.info.pop(_CLAVE_USUARIOS, None)
+    if usuarios:
+        if None in usuarios:
+            estadisticas_usuarios.limpiar()
+        else:
+            for usuario_id in usuarios:
+                estadisticas_usuarios.invalidar(usuario_id)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _descartar_tablas(session, previous_transaction):
+    session.info.pop(_CLAVE_TABLAS, None)
+    session.info.pop(_CLAVE_USUARIOS, None)
+    session.info.pop(_CLAVE_VERSION, None)
+
+
+def init_app(app):
+    global revision_version
+    revision_version = app.config.get("CATALOGO_VERSION_REVISION", revision_version)
+    respuestas.max_entradas = app.config.get("CACHE_RESPUESTAS_MAX", respuestas.max_entradas)
+    respuestas.ttl = app.config.get("CACHE_RESPUESTAS_TTL", respuestas.ttl)
+    instantaneas.ttl = app.config.get("CACHE_INSTANTANEAS_TTL", instantaneas.ttl)
+    estadisticas_usuarios.ttl = app.config.get("CACHE_ESTADISTICAS_USUARIO_TTL", estadisticas_usuarios.ttl)
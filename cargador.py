@@ -0,0 +1,76 @@
+# cargador.py
+"""
+Carga por lotes con memoria por request (estilo DataLoader).
+
+En vez de un Tour.query.get() por cada fila que se serializa:
+
+    tours = cargador(Tour)
+    tours.pedir(r.tour_id for r in reservas)      # anota los ids
+    for r in reservas:
+        tour = tours.obtener(r.tour_id)            # 1 SELECT ... IN para todos
+
+Todo lo pedido hasta el primer obtener() se resuelve con una sola consulta
+WHERE id IN (...); lo ya resuelto queda en memoria hasta el fin del request,
+así que otra parte del mismo request que pida esos ids no vuelve a la BD.
+"""
+from flask import g
+
+from extensions import db
+
+
+class CargadorLotes:
+    """Agrupa los ids pedidos de un modelo y los resuelve con un IN."""
+
+    def __init__(self, modelo, opciones=()):
+        self.modelo = modelo
+        self.opciones = tuple(opciones)
+        self._pk = modelo.__mapper__.primary_key[0]
+        self._resueltos = {}  # id -> instancia o None si no existe
+        self._pendientes = set()
+
+    def pedir(self, ids):
+        """Anota ids (ignora None y los ya resueltos) para el próximo lote."""
+        for id_ in ids:
+            if id_ is not None and id_ not in self._resueltos:
+                self._pendientes.add(id_)
+        return self
+
+    def _resolver(self):
+        ids = self._pendientes
+        self._pendientes = set()
+        if not ids:
+            return
+
+        q = db.session.query(self.modelo).filter(self._pk.in_(ids))
+        if self.opciones:
+            q = q.options(*self.opciones)
+        encontrados = {getattr(obj, self._pk.key): obj for obj in q.all()}
+        for id_ in ids:
+            self._resueltos[id_] = encontrados.get(id_)
+
+    def obtener(self, id_):
+        """Instancia con ese id (o None). Resuelve en lote todo lo pendiente."""
+        if id_ is None:
+            return None
+        if id_ not in self._resueltos:
+            self._pendientes.add(id_)
+            self._resolver()
+        return self._resueltos[id_]
+
+    def obtener_varios(self, ids):
+        """{id: instancia} para los ids dados, con una sola consulta."""
+        ids = [i for i in ids if i is not None]
+        self.pedir(ids)
+        self._resolver()
+        return {i: self._resueltos[i] for i in ids}
+
+
+def cargador(modelo, opciones=()):
+    """
+    Cargador de modelo para el request actual (se guarda en flask.g).
+    Las opciones de carga solo se aplican al crearlo en el request.
+    """
+    cargadores = g.setdefault("_cargadores_lotes", {})
+    if modelo not in cargadores:
+        cargadores[modelo] = CargadorLotes(modelo, opciones)
+    return cargadores[modelo]
@@ -34,6 +34,38 @@ class Config:
         "pool_recycle": 300,
     }
 
+    # Caché en memoria de respuestas públicas del catálogo (cache_service)
+    CACHE_RESPUESTAS_MAX = int(os.getenv("CACHE_RESPUESTAS_MAX", "512"))
+    CACHE_RESPUESTAS_TTL = int(os.getenv("CACHE_RESPUESTAS_TTL", "60"))  # segundos
+    # Cada cuánto relee cada worker la versión del catálogo (cambios de otros workers)
+    CATALOGO_VERSION_REVISION = int(os.getenv("CATALOGO_VERSION_REVISION", "5"))  # segundos
+    # Fotos cortas de agregados del admin (dashboard)
+    CACHE_INSTANTANEAS_TTL = int(os.getenv("CACHE_INSTANTANEAS_TTL", "5"))  # segundos
+    # Estadísticas del perfil de cada usuario (se invalidan al cambiar sus datos)
+    CACHE_ESTADISTICAS_USUARIO_TTL = int(os.getenv("CACHE_ESTADISTICAS_USUARIO_TTL", "60"))  # segundos
+
+    # Cupos de salidas (cupos_service): "fila" = UPDATE condicional sobre
+    # fechas_tour; "plazas" = una fila por plaza, tomadas con SKIP LOCKED
+    CUPOS_MODO = os.getenv("CUPOS_MODO", "fila")
+
+    # Expiración de pre-reservas sin confirmar (expiracion_service); 0 = nunca
+    RESERVAS_EXPIRACION_HORAS = int(os.getenv("RESERVAS_EXPIRACION_HORAS", "48"))
+    RESERVAS_EXPIRACION_INTERVALO = int(os.getenv("RESERVAS_EXPIRACION_INTERVALO", "300"))  # segundos
+    RESERVAS_EXPIRACION_LOTE = int(os.getenv("RESERVAS_EXPIRACION_LOTE", "500"))
+    # Hilo de barrido dentro de cada worker de gunicorn (lo arranca
+    # gunicorn.conf.py); desactivar si se usa un cron
+    RESERVAS_EXPIRACION_HILO = os.getenv("RESERVAS_EXPIRACION_HILO", "1") == "1"
+    # Correos de una pre-reserva nueva en un hilo aparte, fuera del request
+    # (reserva_service); "0" = enviarlos antes de responder
+    RESERVAS_CORREOS_EN_FONDO = os.getenv("RESERVAS_CORREOS_EN_FONDO", "1") == "1"
+
+    # Respuestas guardadas por Idempotency-Key (idempotencia_service)
+    IDEMPOTENCIA_TTL = int(os.getenv("IDEMPOTENCIA_TTL", "86400"))  # segundos
+
+    # Índice de facetas del catálogo en memoria (busqueda_service)
+    INDICE_CATALOGO_PRECARGA = os.getenv("INDICE_CATALOGO_PRECARGA", "1") == "1"
+    INDICE_CATALOGO_REVISION = int(os.getenv("INDICE_CATALOGO_REVISION", "30"))  # segundos
+
     # CORS
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
 
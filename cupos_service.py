@@ -0,0 +1,389 @@
+# cupos_service.py
+"""
+Asignación y liberación de cupos de una salida (FechaTour) sin sobreventa.
+
+Leer cupos_ocupados, comparar en Python y escribir ocupados + n pierde
+actualizaciones cuando dos checkouts compiten por la misma salida. Hay dos
+modos (config CUPOS_MODO):
+
+"fila" (por defecto): cada operación es un único UPDATE condicional
+
+    UPDATE travel.fechas_tour
+       SET cupos_ocupados = cupos_ocupados + :n
+     WHERE id = :id AND cupos_ocupados + :n <= cupos_totales
+    RETURNING cupos_ocupados
+
+  Postgres bloquea la fila hasta el commit y una transacción concurrente
+  vuelve a evaluar el WHERE sobre el valor ya confirmado.
+
+"plazas": no se toca fechas_tour. Cada salida tiene una fila por plaza en
+  travel.cupos_plazas (numero 1..cupos_totales, ocupada sí/no) y reservar
+  n personas es un único
+
+      UPDATE travel.cupos_plazas SET ocupada = true
+       WHERE id IN (SELECT id FROM travel.cupos_plazas
+                     WHERE fecha_tour_id = :id AND NOT ocupada AND numero <= :tope
+                     ORDER BY numero LIMIT :n
+                       FOR UPDATE SKIP LOCKED)
+      RETURNING id
+
+  Dos reservas de la misma salida toman plazas distintas sin esperarse:
+  ninguna comparte fila ni bloqueo con otra. Si no alcanzan las plazas
+  libres sin bloquear se lanza CuposInsuficientes (el llamador hace
+  rollback y suelta las que tomó): las que faltan están en manos de
+  reservas en vuelo, que casi siempre confirman. Como ninguna reserva ni
+  liberación espera por una plaza, tampoco hay interbloqueos entre ellas.
+  Las plazas se crean la primera vez que hacen falta (_asegurar_plazas),
+  ocupando tantas como diga la columna; también al subir cupos_totales.
+  En este modo fechas_tour.cupos_ocupados es la foto de la última
+  compactación (flask --app app cupos-compactar, p. ej. cada minuto por cron,
+  que también pliega los deltas de reportes pendientes, ver
+  reportes_service). Lo ocupado al día lo dan disponibles(),
+  ocupados_del_tour() y al_dia(). Para volver al modo "fila", compactar antes.
+
+Control: flask --app app cupos-conciliar compara la columna, las plazas y
+las reservas activas de cada salida.
+
+Ninguna operación marca el documento del tour (documento_service): los cupos
+ocupados no van en él y GET /tours/<slug> los lee con ocupados_del_tour().
+"""
+import click
+from flask import current_app
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm.attributes import set_committed_value
+
+import reportes_service
+from extensions import db
+from models import CupoPlaza, FechaTour, Reserva, ReservaEstado
+
+CANCELADAS = (ReservaEstado.CANCELADA_CLIENTE, ReservaEstado.CANCELADA_OPERADOR)
+
+# Los cupos no cambian la versión del catálogo (ver cache_service)
+_OPCIONES = {"synchronize_session": False, "catalogo": False}
+
+
+class CuposInsuficientes(Exception):
+    """No quedan cupos suficientes en la salida."""
+
+    def __init__(self, disponibles):
+        super().__init__(f"No hay cupos suficientes. Disponibles: {disponibles}")
+        self.disponibles = disponibles
+
+
+def _modo_plazas():
+    return current_app.config.get("CUPOS_MODO", "fila") == "plazas"
+
+
+def _actualizar_instancia(fecha, ocupados):
+    # Dejar la instancia con el valor real sin otra lectura ni marcarla sucia
+    set_committed_value(fecha, "cupos_ocupados", ocupados)
+    return ocupados
+
+
+# =====================================================
+# MODO FILA
+# =====================================================
+
+def _ejecutar(fecha, stmt):
+    fila = db.session.execute(
+        stmt.where(FechaTour.id == fecha.id).returning(FechaTour.cupos_ocupados),
+        execution_options=_OPCIONES,
+    ).first()
+    if fila is None:
+        return None
+    return _actualizar_instancia(fecha, fila.cupos_ocupados)
+
+
+# =====================================================
+# MODO PLAZAS
+# =====================================================
+
+def _ocupados_plazas():
+    """Expresión de lo ocupado por salida: sus plazas ocupadas, o la columna si aún no tiene."""
+    plazas = (
+        select(func.sum(case((CupoPlaza.ocupada, 1), else_=0)))
+        .where(CupoPlaza.fecha_tour_id == FechaTour.id)
+        .correlate(FechaTour)
+        .scalar_subquery()
+    )
+    return func.coalesce(plazas, FechaTour.cupos_ocupados)
+
+
+def _tope(fecha_id):
+    """
+    Última plaza que se puede ocupar: cupos_totales menos las ocupadas por
+    encima (quedan si el admin bajó los totales o ajustó de más).
+    """
+    totales = select(FechaTour.cupos_totales).where(FechaTour.id == fecha_id).scalar_subquery()
+    excedentes = (
+        select(func.count())
+        .where(
+            CupoPlaza.fecha_tour_id == fecha_id,
+            CupoPlaza.ocupada.is_(True),
+            CupoPlaza.numero > totales,
+        )
+        .scalar_subquery()
+    )
+    return totales - excedentes
+
+
+def _marcar_plazas(fecha_id, cantidad, ocupar, tope=None, esperar=False):
+    """
+    Ocupa (o libera) hasta `cantidad` plazas de la salida en un solo UPDATE
+    y devuelve cuántas. Sin `esperar` salta las plazas bloqueadas por otras
+    transacciones (SKIP LOCKED). Ocupa las de menor número y libera las de
+    mayor, para que las excedentes de _tope() sean las primeras en volver.
+    """
+    elegidas = (
+        select(CupoPlaza.id)
+        .where(CupoPlaza.fecha_tour_id == fecha_id, CupoPlaza.ocupada.is_(not ocupar))
+        .order_by(CupoPlaza.numero if ocupar else CupoPlaza.numero.desc())
+        .limit(cantidad)
+        .with_for_update(skip_locked=not esperar)
+    )
+    if tope is not None:
+        elegidas = elegidas.where(CupoPlaza.numero <= tope)
+    marcadas = db.session.execute(
+        update(CupoPlaza)
+        .where(CupoPlaza.id.in_(elegidas))
+        .values(ocupada=ocupar)
+        .returning(CupoPlaza.id),
+        execution_options=_OPCIONES,
+    ).all()
+    return len(marcadas)
+
+
+def _asegurar_plazas(fecha_id, minimo=0):
+    """
+    Crea las plazas que falten hasta max(cupos_totales, minimo). La primera
+    vez ocupa las primeras cupos_ocupados (lo que dice la columna).
+    """
+    totales, columna, ultima = db.session.execute(
+        select(
+            FechaTour.cupos_totales,
+            FechaTour.cupos_ocupados,
+            select(func.max(CupoPlaza.numero))
+            .where(CupoPlaza.fecha_tour_id == FechaTour.id)
+            .correlate(FechaTour)
+            .scalar_subquery(),
+        ).where(FechaTour.id == fecha_id)
+    ).one()
+    hasta = max(totales, columna, minimo)
+    if ultima is not None and ultima >= hasta:
+        return
+
+    nuevas = [
+        {"fecha_tour_id": fecha_id, "numero": numero, "ocupada": ultima is None and numero <= columna}
+        for numero in range((ultima or 0) + 1, hasta + 1)
+    ]
+    # Dos primeras reservas concurrentes crean las mismas plazas: gana una
+    db.session.execute(
+        pg_insert(CupoPlaza.__table__).on_conflict_do_nothing(
+            index_elements=["fecha_tour_id", "numero"]
+        ),
+        nuevas,
+    )
+
+
+def _ocupar(fecha_id, personas):
+    """Ocupa `personas` plazas libres sin esperar a otras reservas; devuelve cuántas tomó."""
+    tomadas = _marcar_plazas(fecha_id, personas, True, tope=_tope(fecha_id))
+    if tomadas < personas:
+        # Salida sin plazas todavía, o con cupos_totales recién subidos
+        _asegurar_plazas(fecha_id)
+        tomadas += _marcar_plazas(fecha_id, personas - tomadas, True, tope=_tope(fecha_id))
+    return tomadas
+
+
+def _soltar(fecha_id, personas):
+    """Libera hasta `personas` plazas ocupadas (nunca baja de 0)."""
+    if _marcar_plazas(fecha_id, personas, False) < personas:
+        # Salida sin plazas: crearlas con lo que dice la columna y liberar de ahí
+        _asegurar_plazas(fecha_id)
+        _marcar_plazas(fecha_id, personas, False)
+
+
+# =====================================================
+# API
+# =====================================================
+
+def disponibles(fecha_id):
+    """Cupos libres según la BD (no según la instancia en memoria)."""
+    ocupados = _ocupados_plazas() if _modo_plazas() else FechaTour.cupos_ocupados
+    libres = (
+        db.session.query(FechaTour.cupos_totales - ocupados)
+        .filter(FechaTour.id == fecha_id)
+        .scalar()
+    )
+    return max(0, libres or 0)
+
+
+def ocupados_del_tour(tour_id):
+    """{fecha_tour_id: cupos ocupados} de todas las salidas del tour, en una consulta."""
+    ocupados = _ocupados_plazas() if _modo_plazas() else FechaTour.cupos_ocupados
+    return dict(db.session.execute(
+        select(FechaTour.id, ocupados).where(FechaTour.tour_id == tour_id)
+    ).all())
+
+
+def al_dia(fechas):
+    """
+    Deja cupos_ocupados de las instancias con lo ocupado real (en modo plazas
+    la columna es la foto de la última compactación). Una consulta.
+    """
+    if not fechas or not _modo_plazas():
+        return
+    ocupados = dict(db.session.execute(
+        select(FechaTour.id, _ocupados_plazas()).where(FechaTour.id.in_({f.id for f in fechas}))
+    ).all())
+    for fecha in fechas:
+        _actualizar_instancia(fecha, ocupados.get(fecha.id, fecha.cupos_ocupados))
+
+
+def reservar(fecha, personas):
+    """
+    Ocupa `personas` cupos de la salida de forma atómica y devuelve lo ocupado
+    después (None en modo plazas: no se relee). Lanza CuposInsuficientes si
+    no alcanzan; el llamador debe hacer rollback. No hace commit.
+    """
+    if _modo_plazas():
+        tomadas = _ocupar(fecha.id, personas)
+        if tomadas < personas:
+            # Eran todas las libres (sin contar las de reservas en vuelo)
+            raise CuposInsuficientes(tomadas)
+        return None
+
+    nuevo = _ejecutar(
+        fecha,
+        update(FechaTour)
+        .where(FechaTour.cupos_ocupados + personas <= FechaTour.cupos_totales)
+        .values(cupos_ocupados=FechaTour.cupos_ocupados + personas),
+    )
+    if nuevo is None:
+        raise CuposInsuficientes(disponibles(fecha.id))
+    return nuevo
+
+
+def liberar(fecha, personas):
+    """
+    Devuelve `personas` cupos a la salida (nunca baja de 0). No hace commit.
+    """
+    if _modo_plazas():
+        _soltar(fecha.id, personas)
+        return None
+
+    return _ejecutar(
+        fecha,
+        update(FechaTour).values(
+            cupos_ocupados=func.greatest(FechaTour.cupos_ocupados - personas, 0)
+        ),
+    )
+
+
+def liberar_salidas(personas_por_fecha):
+    """
+    Libera cupos de varias salidas: {fecha_tour_id: personas}. Una sentencia
+    por salida. No hace commit.
+    """
+    if not personas_por_fecha:
+        return
+
+    if _modo_plazas():
+        for fecha_id in sorted(personas_por_fecha):
+            _soltar(fecha_id, personas_por_fecha[fecha_id])
+        return
+
+    for fecha_id, personas in personas_por_fecha.items():
+        db.session.execute(
+            update(FechaTour)
+            .where(FechaTour.id == fecha_id)
+            .values(cupos_ocupados=func.greatest(FechaTour.cupos_ocupados - personas, 0)),
+            execution_options={"synchronize_session": "fetch", "catalogo": False},
+        )
+
+
+def ajustar(fecha, ocupados):
+    """Fija lo ocupado de la salida (edición del admin). No hace commit."""
+    ocupados = max(0, int(ocupados))
+    if _modo_plazas():
+        _asegurar_plazas(fecha.id, minimo=ocupados)
+        actuales = db.session.execute(
+            select(_ocupados_plazas()).where(FechaTour.id == fecha.id)
+        ).scalar_one()
+        # El admin sí espera a las reservas en vuelo; ellas nunca lo esperan a él
+        diferencia = ocupados - actuales
+        while diferencia:
+            marcadas = _marcar_plazas(fecha.id, abs(diferencia), diferencia > 0, esperar=True)
+            if not marcadas:
+                break
+            diferencia -= marcadas if diferencia > 0 else -marcadas
+        return _actualizar_instancia(fecha, ocupados - diferencia)
+
+    return _ejecutar(fecha, update(FechaTour).values(cupos_ocupados=ocupados))
+
+
+# =====================================================
+# COMPACTACIÓN Y CONCILIACIÓN
+# =====================================================
+
+def compactar():
+    """
+    Copia a fechas_tour.cupos_ocupados lo ocupado según las plazas, en un
+    solo UPDATE de las salidas que cambiaron. Devuelve cuántas actualizó.
+    """
+    ocupados = _ocupados_plazas()
+    total = db.session.execute(
+        update(FechaTour)
+        .where(FechaTour.cupos_ocupados != ocupados)
+        .values(cupos_ocupados=ocupados),
+        execution_options=_OPCIONES,
+    ).rowcount
+    db.session.commit()
+    return total
+
+
+def conciliar():
+    """
+    Por salida: columna cupos_ocupados, plazas ocupadas y personas de las
+    reservas no canceladas. Devuelve solo las salidas donde no coinciden.
+    """
+    reservadas = (
+        select(func.coalesce(func.sum(Reserva.numero_personas), 0))
+        .where(Reserva.fecha_tour_id == FechaTour.id, Reserva.estado_reserva.notin_(CANCELADAS))
+        .correlate(FechaTour)
+        .scalar_subquery()
+    )
+    filas = db.session.execute(
+        select(
+            FechaTour.id,
+            FechaTour.tour_id,
+            FechaTour.cupos_ocupados,
+            _ocupados_plazas().label("plazas"),
+            reservadas.label("reservas"),
+        ).order_by(FechaTour.id)
+    )
+    return [
+        fila for fila in filas
+        if not fila.cupos_ocupados == fila.plazas == fila.reservas
+    ]
+
+
+def init_app(app):
+    @app.cli.command("cupos-compactar")
+    def cupos_compactar_command():
+        """Copia las plazas ocupadas a fechas_tour y pliega los deltas pendientes en los reportes."""
+        total = compactar()
+        click.echo(f"Salidas compactadas: {total}")
+        click.echo(f"Deltas de reportes plegados: {reportes_service.plegar_pendientes()}")
+
+    @app.cli.command("cupos-conciliar")
+    def cupos_conciliar_command():
+        """Compara cupos_ocupados con las plazas ocupadas y las reservas activas."""
+        diferencias = conciliar()
+        for fila in diferencias:
+            click.echo(
+                f"fecha {fila.id} (tour {fila.tour_id}): columna={fila.cupos_ocupados} "
+                f"plazas={fila.plazas} reservas={fila.reservas}"
+            )
+        click.echo(f"Salidas con diferencias: {len(diferencias)}")
@@ -0,0 +1,373 @@
+# documento_service.py
+"""
+Documentos precalculados del detalle público de cada tour.
+
+GET /tours/<slug> se lee miles de veces por cada edición del admin, así que la
+respuesta completa (to_detail_dict + comentarios aprobados) se guarda ya
+serializada en travel.tour_documentos y el endpoint público solo lee esos bytes.
+
+Los documentos se regeneran solos: un listener de la sesión anota qué tours se
+tocaron en cada flush (el tour, sus hijos, sus guías, su categoría o sus
+comentarios aprobados) y justo antes del commit los reconstruye dentro de la
+misma transacción. Solo cuentan los cambios que se ven en el documento
+(_CAMPOS_PUBLICOS): un comentario pendiente o un cambio de teléfono en el
+perfil no regeneran nada. Los UPDATE/DELETE masivos (query.update(), reorder, etc.) no pasan
+por la unidad de trabajo, así que esas rutas deben llamar a marcar_tours().
+
+Los cupos ocupados de cada salida no se guardan en el documento: cambian con
+cada reserva y regenerarlo ahí dentro de la transacción de la reserva
+serializaría todas las reservas del tour. En su lugar cada salida lleva una
+marca ("cupos_ocupados":"@<fecha_id>") que el endpoint reemplaza sobre los
+bytes, sin decodificar el JSON, con los cupos que lee aparte en una consulta
+por tour_id (cupos_service.ocupados_del_tour).
+
+El documento se construye al escribir (o con flask --app app
+reconstruir-documentos); GET /tours/<slug> nunca lo genera.
+"""
+import hashlib
+import re
+
+import click
+from flask import current_app
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import (
+    Tour,
+    FechaTour,
+    Itinerario,
+    Galeria,
+    TourSeccion,
+    TourIncluye,
+    TourGuia,
+    TourBanner,
+    TourUbicacion,
+    Comentario,
+    ComentarioEstado,
+    Guia,
+    Categoria,
+    Usuario,
+    TourDocumento,
+    tour_detail_options,
+)
+
+# Clave en session.info donde se acumulan las marcas hasta el commit
+_CLAVE_MARCAS = "documentos_tours_marcados"
+
+# Clave en session.info con los tour_ids resueltos en el commit en curso.
+# Otros servicios (p. ej. busqueda_service) la leen en after_commit.
+CLAVE_TOURS_MODIFICADOS = "tours_modificados"
+
+# Modelos hijos cuyo cambio afecta solo al documento de su tour_id
+_HIJOS_DE_TOUR = (
+    FechaTour,
+    Itinerario,
+    Galeria,
+    TourSeccion,
+    TourIncluye,
+    TourGuia,
+    TourBanner,
+    TourUbicacion,
+    Comentario,
+)
+
+# Columnas que aparecen en el documento, para los modelos que también se
+# modifican desde rutas que no son del catálogo (perfil, comentarios del
+# cliente, reservas). Un cambio en otras columnas no regenera nada.
+_CAMPOS_PUBLICOS = {
+    FechaTour: ("tour_id", "fecha_inicio", "fecha_fin", "cupos_totales", "estado"),
+    Comentario: ("tour_id", "usuario_id", "calificacion", "comentario", "created_at", "estado"),
+    Guia: ("nombre", "foto_url", "bio", "especialidad", "idiomas", "pais_base"),
+    Categoria: ("nombre", "slug"),
+    Usuario: ("nombre",),
+}
+
+# Primer argumento de pg_advisory_xact_lock(int, int) para las regeneraciones
+_LOCK_DOCUMENTOS = 21002
+
+
+# =====================================================
+# LECTURA (ENDPOINT PÚBLICO)
+# =====================================================
+
+# Marca de los cupos de cada salida en el documento guardado. Las comillas de
+# los textos del admin salen escapadas (\"), así que solo la clave real
+# "cupos_ocupados" que escribe serializar_detalle() puede coincidir.
+_MARCA_CUPOS = re.compile(rb'("cupos_ocupados":\s*)"@(\d+)"')
+
+
+def obtener_etag(slug):
+    """(etag, tour_id) del documento vigente (sin leer los bytes), o None si no existe."""
+    return (
+        db.session.query(TourDocumento.etag, TourDocumento.tour_id)
+        .filter(TourDocumento.slug == slug)
+        .first()
+    )
+
+
+def obtener_documento(slug):
+    """
+    (bytes JSON del detalle, etag, tour_id) por el slug (único), o None si
+    el tour no existe, no está activo o aún no tiene documento.
+    """
+    return (
+        db.session.query(TourDocumento.documento, TourDocumento.etag, TourDocumento.tour_id)
+        .filter(TourDocumento.slug == slug)
+        .first()
+    )
+
+
+def etag_con_cupos(etag, ocupados):
+    """ETag de la respuesta: el del documento más los cupos ocupados de sus salidas."""
+    firma = f"{etag}:{sorted(ocupados.items())}".encode()
+    return hashlib.blake2b(firma, digest_size=16).hexdigest()
+
+
+def con_cupos(documento, ocupados):
+    """
+    Los bytes del documento con las marcas de cada salida reemplazadas por
+    sus cupos ocupados ({fecha_tour_id: ocupados}). Sin decodificar el JSON.
+    """
+    return _MARCA_CUPOS.sub(
+        lambda m: m.group(1) + str(ocupados.get(int(m.group(2)), 0)).encode(),
+        documento,
+    )
+
+
+# =====================================================
+# CONSTRUCCIÓN
+# =====================================================
+
+def serializar_detalle(tour, comentarios):
+    """
+    Bytes que respondería jsonify() para el detalle del tour, con la marca de
+    cada salida en lugar de cupos_ocupados (ver con_cupos).
+    """
+    detalle = tour.to_detail_dict()
+    for fecha in detalle["fechas"]:
+        fecha["cupos_ocupados"] = f"@{fecha['id']}"
+    payload = {
+        "tour": detalle,
+        "comentarios": [c.to_public_dict() for c in comentarios],
+    }
+    return current_app.json.response(payload).get_data()
+
+
+def reconstruir_documentos(tour_ids):
+    """
+    Regenera (o elimina, si el tour ya no está activo) los documentos de los
+    tours indicados. No hace commit: queda en la transacción actual.
+    """
+    tour_ids = sorted({int(t) for t in tour_ids if t is not None})
+    if not tour_ids:
+        return
+
+    # Un lock de aplicación por tour (en orden, para evitar deadlocks) para que
+    # dos commits concurrentes sobre el mismo tour no se pisen el documento.
+    # No bloquea las filas de travel.tours; dos ids con el mismo resto solo
+    # se esperan de más.
+    for tour_id in tour_ids:
+        db.session.execute(select(func.pg_advisory_xact_lock(_LOCK_DOCUMENTOS, tour_id % 2**31)))
+
+    tours = (
+        Tour.query
+        .options(*tour_detail_options())
+        .populate_existing()
+        .filter(Tour.id.in_(tour_ids))
+        .all()
+    )
+
+    comentarios_por_tour = {}
+    comentarios = (
+        Comentario.query
+        .options(joinedload(Comentario.usuario))
+        .filter(
+            Comentario.tour_id.in_(tour_ids),
+            Comentario.estado == ComentarioEstado.APROBADO,
+        )
+        .order_by(Comentario.created_at.desc())
+        .all()
+    )
+    for c in comentarios:
+        comentarios_por_tour.setdefault(c.tour_id, []).append(c)
+
+    existentes = {
+        d.tour_id: d
+        for d in TourDocumento.query.filter(TourDocumento.tour_id.in_(tour_ids)).all()
+    }
+
+    activos = set()
+    for tour in tours:
+        if not tour.activo:
+            continue
+        activos.add(tour.id)
+
+        documento = serializar_detalle(tour, comentarios_por_tour.get(tour.id, []))
+        etag = hashlib.blake2b(documento, digest_size=16).hexdigest()
+        doc = existentes.get(tour.id)
+        if doc is None:
+            db.session.add(TourDocumento(tour_id=tour.id, slug=tour.slug, documento=documento, etag=etag))
+        elif doc.etag != etag or doc.slug != tour.slug:
+            doc.slug = tour.slug
+            doc.documento = documento
+            doc.etag = etag
+
+    # Tours desactivados o eliminados: sin documento público
+    for tour_id, doc in existentes.items():
+        if tour_id not in activos:
+            db.session.delete(doc)
+
+
+def reconstruir_todos():
+    """Regenera los documentos de todos los tours. Devuelve cuántos tours procesó."""
+    tour_ids = [t for (t,) in db.session.query(Tour.id).all()]
+    reconstruir_documentos(tour_ids)
+    db.session.commit()
+    return len(tour_ids)
+
+
+# =====================================================
+# SEGUIMIENTO DE CAMBIOS (LISTENERS DE LA SESIÓN)
+# =====================================================
+
+def marcar_tours(tour_ids, session=None):
+    """
+    Marca tours cuyo documento debe regenerarse en el próximo commit.
+    Necesario tras UPDATE/DELETE masivos que no pasan por la unidad de trabajo.
+    """
+    session = session or db.session
+    marcas = session.info.setdefault(_CLAVE_MARCAS, set())
+    for tour_id in tour_ids:
+        if tour_id is not None:
+            marcas.add(("tour", int(tour_id)))
+
+
+def _cambio_publico(obj, cambio):
+    """
+    Si el cambio ("nuevo", "modificado" o "borrado") se ve en el documento.
+    Los comentarios solo cuentan si están (o estaban) aprobados; los usuarios
+    nuevos todavía no tienen comentarios.
+    """
+    campos = _CAMPOS_PUBLICOS.get(type(obj))
+    if campos is None:
+        return True
+
+    atributos = inspect(obj).attrs
+    if isinstance(obj, Comentario):
+        estados = {obj.estado, *(atributos.estado.history.deleted or ())}
+        if ComentarioEstado.APROBADO not in estados:
+            return False
+    elif isinstance(obj, Usuario) and cambio == "nuevo":
+        return False
+
+    if cambio != "modificado":
+        return True
+    return any(atributos[campo].history.has_changes() for campo in campos)
+
+
+def _marcas_de_objeto(obj, cambio):
+    """Marcas (tipo, id) que genera un objeto nuevo, modificado o eliminado."""
+    if not _cambio_publico(obj, cambio):
+        return []
+
+    if isinstance(obj, Tour):
+        return [("tour", obj.id)]
+
+    if isinstance(obj, _HIJOS_DE_TOUR):
+        # Incluir el tour anterior si el hijo se movió de tour
+        historial = inspect(obj).attrs.tour_id.history
+        ids = {obj.tour_id, *(historial.deleted or ())}
+        return [("tour", t) for t in ids if t is not None]
+
+    if isinstance(obj, Guia):
+        return [("guia", obj.id)]
+    if isinstance(obj, Categoria):
+        return [("categoria", obj.id)]
+    if isinstance(obj, Usuario):
+        return [("usuario", obj.id)]
+
+    return []
+
+
+@event.listens_for(db.session, "after_flush")
+def _registrar_cambios(session, flush_context):
+    marcas = session.info.setdefault(_CLAVE_MARCAS, set())
+
+    for obj in session.new:
+        marcas.update(_marcas_de_objeto(obj, "nuevo"))
+    for obj in session.deleted:
+        marcas.update(_marcas_de_objeto(obj, "borrado"))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            marcas.update(_marcas_de_objeto(obj, "modificado"))
+
+
+def _resolver_tours(marcas):
+    """Convierte las marcas acumuladas en el conjunto de tour_ids afectados."""
+    tour_ids = {i for tipo, i in marcas if tipo == "tour"}
+    guia_ids = {i for tipo, i in marcas if tipo == "guia"}
+    categoria_ids = {i for tipo, i in marcas if tipo == "categoria"}
+    usuario_ids = {i for tipo, i in marcas if tipo == "usuario"}
+
+    if guia_ids:
+        tour_ids.update(
+            t for (t,) in db.session.query(Tour.id).filter(
+                or_(
+                    Tour.guia_principal_id.in_(guia_ids),
+                    Tour.id.in_(
+                        db.session.query(TourGuia.tour_id)
+                        .filter(TourGuia.guia_id.in_(guia_ids))
+                    ),
+                )
+            )
+        )
+
+    if categoria_ids:
+        tour_ids.update(
+            t for (t,) in db.session.query(Tour.id).filter(Tour.categoria_id.in_(categoria_ids))
+        )
+
+    if usuario_ids:
+        # El documento muestra el nombre del autor de cada comentario aprobado
+        tour_ids.update(
+            t for (t,) in db.session.query(Comentario.tour_id).filter(
+                Comentario.usuario_id.in_(usuario_ids),
+                Comentario.estado == ComentarioEstado.APROBADO,
+            ).distinct()
+        )
+
+    return tour_ids
+
+
+@event.listens_for(db.session, "before_commit")
+def _reconstruir_antes_de_commit(session):
+    # before_commit se dispara antes del flush final: vaciar primero lo pendiente
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+
+    marcas = session.info.pop(_CLAVE_MARCAS, None)
+    if not marcas:
+        return
+
+    tour_ids = _resolver_tours(marcas)
+    session.info.setdefault(CLAVE_TOURS_MODIFICADOS, set()).update(tour_ids)
+    reconstruir_documentos(tour_ids)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _descartar_marcas(session, previous_transaction):
+    session.info.pop(_CLAVE_MARCAS, None)
+    session.info.pop(CLAVE_TOURS_MODIFICADOS, None)
+
+
+# =====================================================
+# CLI
+# =====================================================
+
+def init_app(app):
+    @app.cli.command("reconstruir-documentos")
+    def reconstruir_documentos_command():
+        """Regenera los documentos precalculados de todos los tours."""
+        total = reconstruir_todos()
+        click.echo(f"Documentos regenerados para {total} tours")
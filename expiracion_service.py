@@ -0,0 +1,160 @@
+# expiracion_service.py
+"""
+Expiración automática de pre-reservas sin confirmar.
+
+Una PRE_RESERVA más antigua que RESERVAS_EXPIRACION_HORAS pasa a
+CANCELADA_OPERADOR con su motivo y devuelve sus cupos. Se procesa por lotes,
+cada uno en su propia transacción:
+
+    SELECT id FROM travel.reservas
+     WHERE estado_reserva = 'pre_reserva' AND created_at < :corte
+     ORDER BY id LIMIT :lote FOR UPDATE SKIP LOCKED
+
+    UPDATE travel.reservas SET estado_reserva = 'cancelada_operador', ...
+     WHERE id IN (...) RETURNING fecha_tour_id, numero_personas
+
+y después una sentencia por salida para liberar los cupos (cupos_service).
+SKIP LOCKED salta las filas que otra transacción tiene bloqueadas con
+reserva_service.bloquear() (una cancelación o una confirmación del admin en
+curso): quedan para la siguiente pasada. A la inversa, si el barrido bloquea
+primero, la confirmación espera, lee CANCELADA_OPERADOR y responde 409.
+
+Barrido:
+- Un hilo daemon por worker de gunicorn, fuera de los hilos que atienden
+  requests, despierta cada RESERVAS_EXPIRACION_INTERVALO segundos. Lo
+  arranca iniciar_barrido(), que llama el hook post_worker_init de
+  gunicorn.conf.py (y `python app.py`); crear la app no lo arranca, así que
+  los comandos `flask ...` y los tests no tienen hilo. RESERVAS_EXPIRACION_HILO=0
+  lo desactiva (p. ej. si se usa un cron).
+- pg_try_advisory_xact_lock en cada lote: si otro worker ya está barriendo,
+  este se salta la pasada en vez de esperar.
+- También a mano: flask --app app expirar-pre-reservas
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import click
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+import cupos_service
+import reportes_service
+from extensions import db
+from models import Reserva, ReservaEstado
+
+# Primer argumento de pg_try_advisory_xact_lock(int, int) para el barrido
+_LOCK_BARRIDO = 21023
+
+
+def expirar_pre_reservas(horas, lote=500):
+    """
+    Cancela las pre-reservas creadas hace más de `horas` horas, por lotes de
+    `lote`, y libera sus cupos. Devuelve cuántas expiró (0 si otro proceso
+    tenía el barrido).
+    """
+    # Con zona: created_at es TIMESTAMPTZ y un datetime ingenuo se
+    # interpretaría en la zona horaria de la sesión de Postgres
+    corte = datetime.now(timezone.utc) - timedelta(hours=horas)
+    motivo = f"Pre-reserva expirada automáticamente: sin confirmar en {horas} h"
+    total = 0
+
+    while True:
+        libre = db.session.scalar(select(func.pg_try_advisory_xact_lock(_LOCK_BARRIDO, 0)))
+        if not libre:
+            db.session.rollback()
+            return total
+
+        vencidas = (
+            select(Reserva.id)
+            .where(
+                Reserva.estado_reserva == ReservaEstado.PRE_RESERVA,
+                Reserva.created_at < corte,
+            )
+            .order_by(Reserva.id)
+            .limit(lote)
+            .with_for_update(skip_locked=True)
+        )
+        ids = db.session.scalars(vencidas).all()
+        if not ids:
+            db.session.rollback()
+            return total
+
+        # UPDATE masivo: los rollups se ajustan a mano antes y después
+        lote_query = Reserva.query.filter(Reserva.id.in_(ids))
+        reportes_service.quitar_reservas(lote_query)
+        filas = db.session.execute(
+            update(Reserva)
+            .where(Reserva.id.in_(ids), Reserva.estado_reserva == ReservaEstado.PRE_RESERVA)
+            .values(
+                estado_reserva=ReservaEstado.CANCELADA_OPERADOR,
+                motivo_cancelacion=motivo,
+                fecha_cancelacion=date.today(),
+            )
+            .returning(Reserva.fecha_tour_id, Reserva.numero_personas),
+            execution_options={"synchronize_session": False},
+        ).all()
+        reportes_service.agregar_reservas(lote_query)
+
+        personas_por_fecha = defaultdict(int)
+        for fecha_tour_id, personas in filas:
+            personas_por_fecha[fecha_tour_id] += personas or 0
+        cupos_service.liberar_salidas(personas_por_fecha)
+
+        db.session.commit()
+        total += len(filas)
+        if len(ids) < lote:
+            return total
+
+
+# =====================================================
+# HILO DE BARRIDO
+# =====================================================
+
+def _barrer(app):
+    horas = app.config["RESERVAS_EXPIRACION_HORAS"]
+    intervalo = app.config.get("RESERVAS_EXPIRACION_INTERVALO", 300)
+    lote = app.config.get("RESERVAS_EXPIRACION_LOTE", 500)
+
+    while True:
+        # Desfase aleatorio para que los workers no despierten a la vez
+        time.sleep(intervalo * random.uniform(0.8, 1.2))
+        with app.app_context():
+            try:
+                total = expirar_pre_reservas(horas, lote)
+                if total:
+                    app.logger.info(f"Pre-reservas expiradas: {total}")
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                app.logger.warning(f"No se pudieron expirar pre-reservas: {e}")
+            except Exception:
+                # Cualquier otro error no debe matar el hilo
+                db.session.rollback()
+                app.logger.exception("Error en el barrido de pre-reservas")
+            finally:
+                db.session.remove()
+
+
+def iniciar_barrido(app):
+    """
+    Arranca el hilo de barrido en este proceso si la configuración lo pide.
+    Llamarla en cada worker, después del fork (ver gunicorn.conf.py).
+    """
+    if not (app.config.get("RESERVAS_EXPIRACION_HORAS") and app.config.get("RESERVAS_EXPIRACION_HILO")):
+        return None
+    hilo = threading.Thread(target=_barrer, args=(app,), name="expiracion-pre-reservas", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def init_app(app):
+    @app.cli.command("expirar-pre-reservas")
+    @click.option("--horas", type=int, default=None, help="Antigüedad mínima (por defecto la configurada)")
+    def expirar_pre_reservas_command(horas):
+        """Cancela las pre-reservas vencidas y libera sus cupos."""
+        horas = horas or app.config["RESERVAS_EXPIRACION_HORAS"] or 48
+        total = expirar_pre_reservas(horas, app.config.get("RESERVAS_EXPIRACION_LOTE", 500))
+        click.echo(f"Pre-reservas expiradas: {total}")
+
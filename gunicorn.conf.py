@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+"""
+Hooks de gunicorn (Procfile / railway.json: gunicorn --config gunicorn.conf.py).
+"""
+
+
+def post_worker_init(worker):
+    """Cada worker, con la app ya cargada, arranca su hilo de barrido de pre-reservas."""
+    import expiracion_service
+    from app import app
+
+    expiracion_service.iniciar_barrido(app)
@@ -0,0 +1,203 @@
+# idempotencia_service.py
+"""
+Soporte de la cabecera Idempotency-Key en POST que crean recursos.
+
+Un cliente móvil que reintenta POST /tours/<id>/reservas con la misma clave
+recibe la respuesta original en vez de crear otra reserva (y ocupar más
+cupos y mandar más correos).
+
+- La clave se reclama con INSERT ... ON CONFLICT en una transacción propia,
+  confirmada antes de ejecutar la vista: el UNIQUE (alcance, clave) hace que
+  de dos duplicados concurrentes solo uno gane, sin locks de aplicación.
+- La vista que crea el recurso llama a anotar_respuesta() justo antes de su
+  commit: la respuesta queda en la clave en la misma transacción que el
+  recurso. Si después falla algo (o el worker muere), un reintento recibe
+  esa respuesta y no crea otro recurso.
+- Para las respuestas que no crean nada (errores 4xx) la respuesta se guarda
+  al terminar, en otra transacción; si eso falla, el reintento solo vuelve a
+  ejecutar la vista.
+- Los duplicados dentro de IDEMPOTENCIA_TTL reciben la respuesta guardada
+  tal cual (cabecera Idempotent-Replayed: true).
+- Un duplicado que llega mientras el original sigue en curso recibe 409.
+- Misma clave con otro cuerpo: 422.
+- Errores 5xx o excepciones liberan la clave para poder reintentar, salvo
+  que la respuesta ya se haya anotado (el recurso existe).
+
+El alcance es endpoint + ruta + usuario del JWT (la misma clave en
+/tours/1/reservas y /tours/2/reservas son dos operaciones distintas), así
+que la vista debe ir debajo de @jwt_required():
+
+    @tour_bp.post("/tours/<int:tour_id>/reservas")
+    @jwt_required()
+    @idempotente
+    def crear_reserva_pre_reserva(tour_id): ...
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import click
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import ClaveIdempotencia
+
+CABECERA = "Idempotency-Key"
+
+# Una clave en curso más antigua que esto se da por abandonada (el worker
+# murió o superó el timeout de gunicorn) y se puede volver a reclamar
+_ABANDONO = timedelta(seconds=150)
+
+_tabla = ClaveIdempotencia.__table__
+
+
+def _reclamar(alcance, clave, huella):
+    """id de la fila si este request se quedó con la clave, si no None."""
+    # Con zona: las columnas son TIMESTAMPTZ y un datetime ingenuo se
+    # interpretaría en la zona horaria de la sesión de Postgres
+    ahora = datetime.now(timezone.utc)
+    ttl = timedelta(seconds=current_app.config.get("IDEMPOTENCIA_TTL", 86400))
+
+    stmt = pg_insert(_tabla).values(
+        alcance=alcance,
+        clave=clave,
+        huella=huella,
+        created_at=ahora,
+        expira_en=ahora + ttl,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["alcance", "clave"],
+        # Solo se pisa una clave vencida o abandonada
+        set_={
+            "huella": stmt.excluded.huella,
+            "estado_http": None,
+            "respuesta": None,
+            "mimetype": None,
+            "created_at": stmt.excluded.created_at,
+            "expira_en": stmt.excluded.expira_en,
+        },
+        where=or_(
+            _tabla.c.expira_en < ahora,
+            and_(_tabla.c.estado_http.is_(None), _tabla.c.created_at < ahora - _ABANDONO),
+        ),
+    ).returning(_tabla.c.id)
+
+    with db.engine.begin() as conexion:
+        return conexion.execute(stmt).scalar()
+
+
+def _valores(respuesta):
+    return {
+        "estado_http": respuesta.status_code,
+        "respuesta": respuesta.get_data(),
+        "mimetype": respuesta.mimetype,
+    }
+
+
+def _guardar(id_, respuesta):
+    # Si la vista ya la anotó, esa es la que vale
+    with db.engine.begin() as conexion:
+        conexion.execute(
+            update(_tabla)
+            .where(_tabla.c.id == id_, _tabla.c.estado_http.is_(None))
+            .values(**_valores(respuesta))
+        )
+
+
+def _liberar(id_):
+    # Una clave con la respuesta anotada corresponde a un recurso ya creado
+    with db.engine.begin() as conexion:
+        conexion.execute(delete(_tabla).where(_tabla.c.id == id_, _tabla.c.estado_http.is_(None)))
+
+
+def anotar_respuesta(cuerpo, estado):
+    """
+    Anota (cuerpo, estado) como la respuesta de la Idempotency-Key de este
+    request, en la transacción de db.session: llamarla justo antes del
+    commit que crea el recurso. Sin clave no hace nada.
+    """
+    id_ = g.get("idempotencia_id")
+    if id_ is None:
+        return
+    respuesta = current_app.make_response((cuerpo, estado))
+    db.session.execute(update(_tabla).where(_tabla.c.id == id_).values(**_valores(respuesta)))
+
+
+def _repetir(alcance, clave, huella):
+    """Respuesta para un duplicado: la original, 409 o 422."""
+    fila = db.session.execute(
+        select(_tabla.c.huella, _tabla.c.estado_http, _tabla.c.respuesta, _tabla.c.mimetype)
+        .where(_tabla.c.alcance == alcance, _tabla.c.clave == clave)
+    ).first()
+
+    if fila is None or fila.estado_http is None:
+        respuesta = jsonify({"message": "Hay una solicitud con esta Idempotency-Key en curso"})
+        respuesta.status_code = 409
+        respuesta.headers["Retry-After"] = "1"
+        return respuesta
+
+    if fila.huella != huella:
+        return jsonify({"message": "Esta Idempotency-Key ya se usó con otros datos"}), 422
+
+    respuesta = current_app.response_class(fila.respuesta, status=fila.estado_http, mimetype=fila.mimetype)
+    respuesta.headers["Idempotent-Replayed"] = "true"
+    return respuesta
+
+
+def idempotente(vista):
+    """Hace idempotente un POST cuando el cliente envía Idempotency-Key."""
+
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        clave = (request.headers.get(CABECERA) or "").strip()
+        if not clave:
+            return vista(*args, **kwargs)
+        if len(clave) > 255:
+            return jsonify({"message": f"{CABECERA} no puede superar 255 caracteres"}), 400
+
+        alcance = f"{request.endpoint}:{request.path}:{get_jwt_identity()}"
+        huella = hashlib.sha256(request.get_data()).hexdigest()
+
+        id_ = _reclamar(alcance, clave, huella)
+        if id_ is None:
+            return _repetir(alcance, clave, huella)
+
+        g.idempotencia_id = id_
+        try:
+            respuesta = current_app.make_response(vista(*args, **kwargs))
+        except BaseException:
+            # Primero soltar la transacción de la vista: puede tener la fila
+            # de la clave bloqueada por anotar_respuesta()
+            db.session.rollback()
+            _liberar(id_)
+            raise
+
+        if respuesta.status_code >= 500:
+            db.session.rollback()
+            _liberar(id_)
+            return respuesta
+        try:
+            _guardar(id_, respuesta)
+        except Exception as e:
+            # Lo hecho ya está confirmado: no convertirlo en un 500
+            current_app.logger.warning(f"No se pudo guardar la respuesta de {CABECERA}: {e}")
+        return respuesta
+
+    return envoltura
+
+
+def purgar():
+    """Borra las claves vencidas. Devuelve cuántas borró."""
+    resultado = db.session.execute(delete(_tabla).where(_tabla.c.expira_en < datetime.now(timezone.utc)))
+    db.session.commit()
+    return resultado.rowcount
+
+
+def init_app(app):
+    @app.cli.command("purgar-idempotencia")
+    def purgar_idempotencia_command():
+        """Borra las Idempotency-Key vencidas."""
+        click.echo(f"Claves borradas: {purgar()}")
@@ -0,0 +1,79 @@
+# json_provider.py
+"""
+Proveedor JSON de la app (app.json): usa orjson si está instalado y, si no,
+el json de la librería estándar con el mismo tratamiento de tipos.
+
+Tipos que se codifican sin conversión previa en los to_dict:
+- Decimal  -> número (float); el proveedor por defecto de Flask daba un string
+- date / datetime -> fecha HTTP ("Fri, 02 Jan 2026 00:00:00 GMT"), igual que
+  el proveedor por defecto de Flask. Los to_dict siguen mandando .isoformat()
+- Enum (ReservaEstado, PagoEstado, ...) -> su .value
+
+jsonify() pasa por DefaultJSONProvider.response(), que llama a dumps() con
+separadores compactos (o con indent en modo debug): la salida compacta se
+codifica con orjson y el resto se delega en la librería estándar.
+"""
+import dataclasses
+import decimal
+import enum
+import uuid
+from datetime import date, time
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+_COMPACTO = (",", ":")
+
+
+def _por_defecto(o):
+    """Tipos que ni orjson ni json saben codificar solos."""
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    if isinstance(o, enum.Enum):
+        return o.value
+    if isinstance(o, date):  # también datetime
+        return http_date(o)
+    if isinstance(o, time):
+        return o.isoformat()
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class RapidoJSONProvider(DefaultJSONProvider):
+    """
+    Igual que el proveedor por defecto de Flask (claves ordenadas, salida
+    compacta en producción) pero codificando con orjson.
+    """
+
+    default = staticmethod(_por_defecto)
+
+    # Las fechas pasan por _por_defecto para conservar el formato de Flask
+    _OPCIONES = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    ) if orjson else 0
+
+    def _usar_orjson(self, kwargs):
+        # Solo salida compacta; indent u otras opciones de json.dumps van a la
+        # librería estándar
+        return orjson is not None and set(kwargs) <= {"separators"} \
+            and tuple(kwargs.get("separators", _COMPACTO)) == _COMPACTO
+
+    def dumps(self, obj, **kwargs):
+        if self._usar_orjson(kwargs):
+            return orjson.dumps(obj, default=_por_defecto, option=self._OPCIONES).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
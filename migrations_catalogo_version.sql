@@ -0,0 +1,22 @@
+-- =====================================================
+-- Versiones de las tablas del catálogo público + ETag de documentos de tour
+-- (ETag / If-None-Match en tour_bp). Ver cache_service.py
+-- =====================================================
+
+-- Una fila por tabla: la clave de cada respuesta cacheada combina solo las
+-- versiones de las tablas de las que depende. cache_service crea las filas
+-- al primer commit que toca cada tabla.
+CREATE TABLE IF NOT EXISTS travel.catalogo_versiones (
+    tabla       VARCHAR(64) PRIMARY KEY,
+    version     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ DEFAULT now()
+);
+
+-- Contador global anterior (una sola fila), reemplazado por el de arriba
+DROP TABLE IF EXISTS travel.catalogo_version;
+
+ALTER TABLE travel.tour_documentos
+    ADD COLUMN IF NOT EXISTS etag VARCHAR(64);
+
+-- Los documentos existentes obtienen su etag al regenerarse:
+--   flask --app app reconstruir-documentos
@@ -0,0 +1,20 @@
+-- =====================================================
+-- Plazas por salida (ver cupos_service.py, CUPOS_MODO=plazas)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS travel.cupos_plazas (
+    id             BIGSERIAL PRIMARY KEY,
+    fecha_tour_id  BIGINT NOT NULL REFERENCES travel.fechas_tour(id) ON DELETE CASCADE,
+    numero         INTEGER NOT NULL,                -- 1..cupos_totales
+    ocupada        BOOLEAN NOT NULL DEFAULT FALSE,
+    CONSTRAINT uq_cupos_plazas_fecha_numero UNIQUE (fecha_tour_id, numero)
+);
+
+-- Las plazas se crean solas la primera vez que una salida las necesita,
+-- ocupando tantas como diga fechas_tour.cupos_ocupados.
+
+-- Reemplaza al libro de movimientos (CUPOS_MODO=libro). Si se usó ese modo,
+-- correr flask --app app cupos-compactar con la versión anterior antes de
+-- aplicar esta migración: la columna cupos_ocupados debe quedar al día.
+DROP TABLE IF EXISTS travel.cupos_saldos;
+DROP TABLE IF EXISTS travel.cupos_movimientos;
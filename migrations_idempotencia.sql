@@ -0,0 +1,20 @@
+-- =====================================================
+-- Idempotency-Key de la creación de reservas (ver idempotencia_service.py)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS travel.claves_idempotencia (
+    id           BIGSERIAL PRIMARY KEY,
+    alcance      VARCHAR(255) NOT NULL,   -- endpoint:ruta:usuario_id
+    clave        VARCHAR(255) NOT NULL,
+    huella       VARCHAR(64) NOT NULL,    -- sha256 del cuerpo del request
+    estado_http  INTEGER,                 -- NULL mientras se procesa
+    respuesta    BYTEA,
+    mimetype     VARCHAR(100),
+    created_at   TIMESTAMPTZ DEFAULT NOW(),
+    expira_en    TIMESTAMPTZ NOT NULL,
+    CONSTRAINT uq_claves_idempotencia_alcance_clave UNIQUE (alcance, clave)
+);
+
+-- Purga de claves vencidas (flask --app app purgar-idempotencia)
+CREATE INDEX IF NOT EXISTS ix_claves_idempotencia_expira_en
+    ON travel.claves_idempotencia (expira_en);
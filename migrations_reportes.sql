@@ -0,0 +1,51 @@
+-- =====================================================
+-- Rollups de reportes de reservas (ver reportes_service.py)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS travel.reporte_ingresos_mensual (
+    mes                   DATE NOT NULL,          -- primer día del mes de creación
+    tour_id               BIGINT NOT NULL,
+    moneda                VARCHAR(10) NOT NULL,
+    reservas              INTEGER NOT NULL DEFAULT 0,
+    reservas_confirmadas  INTEGER NOT NULL DEFAULT 0,
+    reservas_canceladas   INTEGER NOT NULL DEFAULT 0,
+    personas              INTEGER NOT NULL DEFAULT 0,       -- sin canceladas
+    monto_reservado       NUMERIC(14, 2) NOT NULL DEFAULT 0, -- sin canceladas
+    monto_pagado          NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (mes, tour_id, moneda)
+);
+
+CREATE TABLE IF NOT EXISTS travel.reporte_salidas (
+    fecha_tour_id         BIGINT PRIMARY KEY,
+    tour_id               BIGINT NOT NULL,
+    reservas              INTEGER NOT NULL DEFAULT 0,
+    reservas_confirmadas  INTEGER NOT NULL DEFAULT 0,
+    reservas_canceladas   INTEGER NOT NULL DEFAULT 0,
+    personas              INTEGER NOT NULL DEFAULT 0,       -- sin canceladas
+    personas_confirmadas  INTEGER NOT NULL DEFAULT 0,
+    monto_reservado       NUMERIC(14, 2) NOT NULL DEFAULT 0  -- sin canceladas
+);
+
+CREATE INDEX IF NOT EXISTS ix_reporte_salidas_tour_id
+    ON travel.reporte_salidas (tour_id);
+
+-- Carga inicial a partir de las reservas existentes:
+--   flask --app app reconstruir-reportes
+
+-- Deltas sin plegar (solo en modo plazas, CUPOS_MODO=plazas). Los pliega
+--   flask --app app cupos-compactar
+CREATE TABLE IF NOT EXISTS travel.reporte_pendientes (
+    id                    BIGSERIAL PRIMARY KEY,
+    tipo                  VARCHAR(10) NOT NULL,   -- mensual | salida
+    mes                   DATE,
+    tour_id               BIGINT NOT NULL,
+    moneda                VARCHAR(10),
+    fecha_tour_id         BIGINT,
+    reservas              INTEGER NOT NULL DEFAULT 0,
+    reservas_confirmadas  INTEGER NOT NULL DEFAULT 0,
+    reservas_canceladas   INTEGER NOT NULL DEFAULT 0,
+    personas              INTEGER NOT NULL DEFAULT 0,
+    personas_confirmadas  INTEGER NOT NULL DEFAULT 0,
+    monto_reservado       NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    monto_pagado          NUMERIC(14, 2) NOT NULL DEFAULT 0
+);
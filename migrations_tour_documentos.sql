@@ -0,0 +1,26 @@
+-- =====================================================
+-- Documentos precalculados del detalle público de tours
+-- (GET /tours/<slug>). Ver documento_service.py
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS travel.tour_documentos (
+    tour_id     BIGINT PRIMARY KEY REFERENCES travel.tours(id) ON DELETE CASCADE,
+    slug        VARCHAR(255) NOT NULL,
+    documento   BYTEA NOT NULL,
+    updated_at  TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_tour_documentos_slug
+    ON travel.tour_documentos (slug);
+
+-- Después de ejecutar este script:
+--   flask --app app reconstruir-documentos
+
+-- El endpoint busca el documento por slug: único, como travel.tours.slug
+DROP INDEX IF EXISTS travel.ix_tour_documentos_slug;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_tour_documentos_slug
+    ON travel.tour_documentos (slug);
+
+-- Los documentos llevan la marca de cupos de cada salida y GET /tours/<slug>
+-- ya no los genera: regenerarlos tras desplegar (obligatorio)
+--   flask --app app reconstruir-documentos
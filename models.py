@@ -4,8 +4,17 @@ from enum import Enum
 import enum
 
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Enum as PgEnum, Numeric
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Enum as PgEnum, Numeric, and_
+from sqlalchemy.orm import (
+    relationship,
+    backref,
+    joinedload,
+    selectinload,
+    load_only,
+    deferred,
+    undefer_group,
+    Bundle,
+)
 
 from extensions import db
 
@@ -107,23 +116,62 @@ class Categoria(db.Model):
             "activo": self.activo,
         }
 
+    @staticmethod
+    def _resumen_tour(t):
+        return {
+            "id": t.id,
+            "nombre": t.nombre,
+            "slug": t.slug,
+            "foto_portada": t.foto_portada,
+            "precio_pp": float(t.precio_pp) if t.precio_pp else None,
+            "duracion_dias": t.duracion_dias,
+        }
+
     def to_dict_with_tours(self):
+        tours = [self._resumen_tour(t) for t in self.tours if t.activo]
         return {
             **self.to_dict(),
-            "tours": [
-                {
-                    "id": t.id,
-                    "nombre": t.nombre,
-                    "slug": t.slug,
-                    "foto_portada": t.foto_portada,
-                    "precio_pp": float(t.precio_pp) if t.precio_pp else None,
-                    "duracion_dias": t.duracion_dias,
-                }
-                for t in self.tours if t.activo
-            ],
-            "total_tours": len([t for t in self.tours if t.activo])
+            "tours": tours,
+            "total_tours": len(tours),
         }
 
+    @classmethod
+    def menu(cls, slug=None):
+        """
+        Categorías activas con el resumen de sus tours activos, en una sola
+        consulta (LEFT JOIN, solo las columnas del resumen). Misma forma que
+        to_dict_with_tours(). Con slug devuelve solo esa categoría.
+        """
+        q = (
+            db.session.query(
+                cls,
+                Bundle(
+                    "tour",
+                    Tour.id,
+                    Tour.nombre,
+                    Tour.slug,
+                    Tour.foto_portada,
+                    Tour.precio_pp,
+                    Tour.duracion_dias,
+                ),
+            )
+            .outerjoin(Tour, and_(Tour.categoria_id == cls.id, Tour.activo == True))
+            .filter(cls.activo == True)
+            .order_by(cls.orden, cls.id, Tour.orden_destacado.asc().nullslast(), Tour.id)
+        )
+        if slug is not None:
+            q = q.filter(cls.slug == slug)
+
+        menu = {}
+        for categoria, tour in q.all():
+            item = menu.get(categoria.id)
+            if item is None:
+                item = menu[categoria.id] = {**categoria.to_dict(), "tours": [], "total_tours": 0}
+            if tour.id is not None:
+                item["tours"].append(cls._resumen_tour(tour))
+                item["total_tours"] += 1
+        return list(menu.values())
+
 
 class Usuario(db.Model):
     __tablename__ = "usuarios"
@@ -207,9 +255,10 @@ class Tour(db.Model):
     precio_pp = db.Column(Numeric(10, 2))
     moneda = db.Column(db.String(10), default="USD")
     banner_url = db.Column(db.Text)
-    descripcion_corta = db.Column(db.Text)
-    descripcion_larga = db.Column(db.Text)
-    ruta_resumida = db.Column(db.Text)
+    # Textos largos: solo los necesita el detalle (undefer_group("textos"))
+    descripcion_corta = deferred(db.Column(db.Text), group="textos")
+    descripcion_larga = deferred(db.Column(db.Text), group="textos")
+    ruta_resumida = deferred(db.Column(db.Text), group="textos")
     guia_principal_id = db.Column(db.BigInteger, db.ForeignKey("travel.guias.id"))
     guia_principal = relationship("Guia", foreign_keys=[guia_principal_id])
     foto_portada = db.Column(db.Text)
@@ -252,19 +301,48 @@ class Tour(db.Model):
             } if self.categoria else None,
         }
 
-    def to_detail_dict(self):
+    # Campos que to_detail_dict() agrega sobre to_card_dict()
+    CAMPOS_DETALLE = (
+        "descripcion_corta",
+        "descripcion_larga",
+        "ruta_resumida",
+        "fechas",
+        "itinerarios",
+        "galeria",
+        "secciones",
+        "incluye",
+        "guia_principal",
+        "guias_equipo",
+        "banners",
+        "ubicaciones",
+    )
+
+    def to_summary_dict(self):
+        """Fila del listado del admin: la card más estado y fechas de edición."""
         return {
             **self.to_card_dict(),
-            "descripcion_corta": self.descripcion_corta,
-            "descripcion_larga": self.descripcion_larga,
-            "ruta_resumida": self.ruta_resumida,
-            "fechas": [f.to_dict() for f in self.fechas],
-            "itinerarios": [i.to_dict() for i in self.itinerarios],
-            "galeria": [g.to_dict() for g in self.galerias],
-            "secciones": [s.to_dict() for s in self.secciones],
-            "incluye": [i.to_dict() for i in self.incluye_items],
-
-            "guia_principal": {
+            "activo": self.activo,
+            "orden_destacado": self.orden_destacado,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def to_detail_dict(self, campos=None):
+        """
+        Card + detalle. Con campos (subconjunto de CAMPOS_DETALLE) solo se
+        serializan esos, así no se tocan las relaciones que no se pidieron.
+        """
+        detalle = {
+            "descripcion_corta": lambda: self.descripcion_corta,
+            "descripcion_larga": lambda: self.descripcion_larga,
+            "ruta_resumida": lambda: self.ruta_resumida,
+            "fechas": lambda: [f.to_dict() for f in self.fechas],
+            "itinerarios": lambda: [i.to_dict() for i in self.itinerarios],
+            "galeria": lambda: [g.to_dict() for g in self.galerias],
+            "secciones": lambda: [s.to_dict() for s in self.secciones],
+            "incluye": lambda: [i.to_dict() for i in self.incluye_items],
+
+            "guia_principal": lambda: {
                 "id": self.guia_principal.id,
                 "nombre": self.guia_principal.nombre,
                 "foto": self.guia_principal.foto_url,
@@ -274,7 +352,7 @@ class Tour(db.Model):
                 "pais_base": self.guia_principal.pais_base
             } if self.guia_principal else None,
 
-            "guias_equipo": [
+            "guias_equipo": lambda: [
                 {
                     "guia_id": tg.guia.id,
                     "nombre": tg.guia.nombre,
@@ -284,15 +362,24 @@ class Tour(db.Model):
                 } for tg in self.guias_extra
             ],
 
-            "banners": [b.to_dict() for b in self.banners.filter_by(activo=True).order_by(TourBanner.orden).all()],
+            "banners": lambda: [b.to_dict() for b in self.banners if b.activo],
 
             # Ubicaciones para el mapa
-            "ubicaciones": sorted(
+            "ubicaciones": lambda: sorted(
                 [u.to_dict() for u in self.ubicaciones if u.activo],
                 key=lambda x: x["orden"] or 0
             ),
         }
 
+        return {
+            **self.to_card_dict(),
+            **{
+                campo: serializar()
+                for campo, serializar in detalle.items()
+                if campos is None or campo in campos
+            },
+        }
+
 
 
 class TourGuia(db.Model):
@@ -370,7 +457,7 @@ class Itinerario(db.Model):
     )
     orden_dia = db.Column(db.Integer, nullable=False)
     titulo_dia = db.Column(db.String(255), nullable=False)
-    descripcion_dia = db.Column(db.Text, nullable=False)
+    descripcion_dia = deferred(db.Column(db.Text, nullable=False), group="textos")
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime(timezone=True),
@@ -435,7 +522,7 @@ class TourSeccion(db.Model):
     # -----------------------------
 
     titulo = db.Column(db.String(255), nullable=False)
-    contenido = db.Column(db.Text, nullable=False)
+    contenido = deferred(db.Column(db.Text, nullable=False), group="textos")
     orden = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(
@@ -742,7 +829,16 @@ class TourBanner(db.Model):
     updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relación
-    tour = db.relationship("Tour", backref=db.backref("banners", lazy="dynamic", cascade="all, delete-orphan"))
+    # lazy="select" (y no "dynamic") para poder precargarlos con tour_detail_options()
+    tour = db.relationship(
+        "Tour",
+        backref=db.backref(
+            "banners",
+            lazy="select",
+            cascade="all, delete-orphan",
+            order_by="TourBanner.orden",
+        ),
+    )
 
     def to_dict(self):
         return {
@@ -795,58 +891,244 @@ class PortadaHome(db.Model):
         }
 
 
+class TourDocumento(db.Model):
+    """
+    Respuesta ya serializada de GET /tours/<slug> (tour + comentarios aprobados).
+    La mantiene documento_service: se regenera en el mismo commit que modifica
+    el tour o cualquiera de sus hijos, y solo existe para tours activos.
+    """
+    __tablename__ = "tour_documentos"
+    __table_args__ = {"schema": "travel"}
 
+    tour_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey("travel.tours.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    slug = db.Column(db.String(255), nullable=False, unique=True)
+    documento = db.Column(db.LargeBinary, nullable=False)  # JSON en bytes
+    etag = db.Column(db.String(64))  # hash del documento, para If-None-Match
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
 
 
+class CatalogoVersion(db.Model):
+    """
+    Versión de cada tabla del catálogo público (una fila por tabla).
+    cache_service la incrementa en cada commit que toca la tabla y la usa
+    para los ETag y para las claves de la caché de respuestas.
+    """
+    __tablename__ = "catalogo_versiones"
+    __table_args__ = {"schema": "travel"}
 
+    tabla = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
 
 
+class ReporteIngresoMensual(db.Model):
+    """
+    Rollup de reservas por mes de creación, tour y moneda.
+    Lo mantiene reportes_service con deltas en cada flush de Reserva.
+    """
+    __tablename__ = "reporte_ingresos_mensual"
+    __table_args__ = {"schema": "travel"}
 
+    mes = db.Column(db.Date, primary_key=True)  # primer día del mes
+    tour_id = db.Column(db.BigInteger, primary_key=True)
+    moneda = db.Column(db.String(10), primary_key=True)
+    reservas = db.Column(db.Integer, nullable=False, default=0)
+    reservas_confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    reservas_canceladas = db.Column(db.Integer, nullable=False, default=0)
+    personas = db.Column(db.Integer, nullable=False, default=0)  # sin canceladas
+    monto_reservado = db.Column(Numeric(14, 2), nullable=False, default=0)  # sin canceladas
+    monto_pagado = db.Column(Numeric(14, 2), nullable=False, default=0)
 
+    def to_dict(self):
+        return {
+            "mes": self.mes.strftime("%Y-%m"),
+            "tour_id": self.tour_id,
+            "moneda": self.moneda,
+            "reservas": self.reservas,
+            "reservas_confirmadas": self.reservas_confirmadas,
+            "reservas_canceladas": self.reservas_canceladas,
+            "personas": self.personas,
+            "monto_reservado": float(self.monto_reservado or 0),
+            "monto_pagado": float(self.monto_pagado or 0),
+        }
 
 
+class ReporteSalida(db.Model):
+    """
+    Rollup de reservas por fecha de salida (ocupación).
+    Lo mantiene reportes_service con deltas en cada flush de Reserva.
+    """
+    __tablename__ = "reporte_salidas"
+    __table_args__ = {"schema": "travel"}
 
+    fecha_tour_id = db.Column(db.BigInteger, primary_key=True)
+    tour_id = db.Column(db.BigInteger, nullable=False, index=True)
+    reservas = db.Column(db.Integer, nullable=False, default=0)
+    reservas_confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    reservas_canceladas = db.Column(db.Integer, nullable=False, default=0)
+    personas = db.Column(db.Integer, nullable=False, default=0)  # sin canceladas
+    personas_confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    monto_reservado = db.Column(Numeric(14, 2), nullable=False, default=0)  # sin canceladas
 
+    def to_dict(self):
+        return {
+            "fecha_tour_id": self.fecha_tour_id,
+            "tour_id": self.tour_id,
+            "reservas": self.reservas,
+            "reservas_confirmadas": self.reservas_confirmadas,
+            "reservas_canceladas": self.reservas_canceladas,
+            "personas": self.personas,
+            "personas_confirmadas": self.personas_confirmadas,
+            "monto_reservado": float(self.monto_reservado or 0),
+        }
 
 
+class ReportePendiente(db.Model):
+    """
+    Deltas de los rollups todavía sin plegar (solo inserciones). En modo
+    plazas (CUPOS_MODO=plazas) cada flush de Reserva anota aquí en vez de
+    actualizar reporte_salidas / reporte_ingresos_mensual; los pliega
+    reportes_service.plegar_pendientes().
+    """
+    __tablename__ = "reporte_pendientes"
+    __table_args__ = {"schema": "travel"}
 
+    id = db.Column(db.BigInteger, primary_key=True)
+    tipo = db.Column(db.String(10), nullable=False)  # mensual | salida
+    mes = db.Column(db.Date)
+    tour_id = db.Column(db.BigInteger, nullable=False)
+    moneda = db.Column(db.String(10))
+    fecha_tour_id = db.Column(db.BigInteger)
+    reservas = db.Column(db.Integer, nullable=False, default=0)
+    reservas_confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    reservas_canceladas = db.Column(db.Integer, nullable=False, default=0)
+    personas = db.Column(db.Integer, nullable=False, default=0)
+    personas_confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    monto_reservado = db.Column(Numeric(14, 2), nullable=False, default=0)
+    monto_pagado = db.Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class CupoPlaza(db.Model):
+    """
+    Una plaza de una salida (modo plazas, CUPOS_MODO=plazas): reservar es
+    marcar plazas libres con FOR UPDATE SKIP LOCKED. Ver cupos_service.
+    """
+    __tablename__ = "cupos_plazas"
+    __table_args__ = (
+        db.UniqueConstraint("fecha_tour_id", "numero", name="uq_cupos_plazas_fecha_numero"),
+        {"schema": "travel"},
+    )
 
+    id = db.Column(db.BigInteger, primary_key=True)
+    fecha_tour_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey("travel.fechas_tour.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    numero = db.Column(db.Integer, nullable=False)  # 1..cupos_totales
+    ocupada = db.Column(db.Boolean, nullable=False, default=False)
 
 
+class ClaveIdempotencia(db.Model):
+    """
+    Idempotency-Key de un POST y la respuesta que dio, para repetirla ante
+    reintentos. El UNIQUE (alcance, clave) deduplica los concurrentes.
+    Ver idempotencia_service.
+    """
+    __tablename__ = "claves_idempotencia"
+    __table_args__ = (
+        db.UniqueConstraint("alcance", "clave", name="uq_claves_idempotencia_alcance_clave"),
+        {"schema": "travel"},
+    )
 
+    id = db.Column(db.BigInteger, primary_key=True)
+    alcance = db.Column(db.String(255), nullable=False)  # endpoint:ruta:usuario_id
+    clave = db.Column(db.String(255), nullable=False)
+    huella = db.Column(db.String(64), nullable=False)  # sha256 del cuerpo
+    estado_http = db.Column(db.Integer)  # NULL mientras se procesa
+    respuesta = db.Column(db.LargeBinary)
+    mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+    expira_en = db.Column(db.DateTime(timezone=True), nullable=False)
 
 
+# -----------------------
+# OPCIONES DE CARGA
+# -----------------------
 
+def tour_detail_options(campos=None):
+    """
+    Opciones de carga para serializar un tour con to_detail_dict().
 
+    categoria y guia_principal van en el mismo SELECT del tour (joined) y
+    cada colección se trae con un SELECT ... WHERE tour_id IN (...) (selectin),
+    así el detalle cuesta un número fijo de consultas sin importar cuántas
+    fechas, fotos o ubicaciones tenga el tour (o cuántos tours se carguen).
+    Los textos largos (grupo "textos", diferido por defecto) se cargan aquí.
 
+    Con campos (ver Tour.CAMPOS_DETALLE) solo se cargan las relaciones de
+    esos campos, igual que to_detail_dict(campos).
 
+    Uso: Tour.query.options(*tour_detail_options()).filter_by(slug=slug)
+    """
+    textos = undefer_group("textos")
+    por_campo = {
+        "descripcion_corta": textos,
+        "descripcion_larga": textos,
+        "ruta_resumida": textos,
+        "fechas": selectinload(Tour.fechas),
+        "itinerarios": selectinload(Tour.itinerarios).undefer_group("textos"),
+        "galeria": selectinload(Tour.galerias),
+        "secciones": selectinload(Tour.secciones).undefer_group("textos"),
+        "incluye": selectinload(Tour.incluye_items),
+        "guia_principal": joinedload(Tour.guia_principal),
+        "guias_equipo": selectinload(Tour.guias_extra).joinedload(TourGuia.guia),
+        "banners": selectinload(Tour.banners),
+        "ubicaciones": selectinload(Tour.ubicaciones),
+    }
+
+    opciones = [joinedload(Tour.categoria)]
+    for campo, opcion in por_campo.items():
+        if (campos is None or campo in campos) and not any(o is opcion for o in opciones):
+            opciones.append(opcion)
+    return opciones
+
+
+def tour_card_options():
+    """
+    Opciones de carga para listados que solo usan to_card_dict(): trae
+    únicamente esas columnas del tour y de su categoría (en el mismo SELECT).
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    Uso: Tour.query.options(*tour_card_options()).filter_by(activo=True)
+    """
+    return [
+        load_only(
+            Tour.id,
+            Tour.nombre,
+            Tour.slug,
+            Tour.pais,
+            Tour.categoria_id,
+            Tour.duracion_dias,
+            Tour.nivel_actividad,
+            Tour.precio_pp,
+            Tour.moneda,
+            Tour.banner_url,
+            Tour.foto_portada,
+            Tour.posicion_portada,
+            Tour.activo,
+            Tour.orden_destacado,
+        ),
+        joinedload(Tour.categoria).load_only(Categoria.id, Categoria.nombre, Categoria.slug),
+    ]
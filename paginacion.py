@@ -0,0 +1,88 @@
+# paginacion.py
+"""
+Utilidades de paginación para los listados.
+
+Los cursores son opacos para el cliente: una lista JSON con los valores de la
+última fila de la página (las columnas del ORDER BY), codificada en base64 url-safe.
+"""
+import base64
+import json
+from datetime import datetime
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps(list(valores), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, *tipos):
+    """
+    Devuelve los valores del cursor, uno por columna del ORDER BY, pasados por
+    su conversor (entero, fecha_hora, opcional(...)). Lanza ValueError si el
+    cursor no es válido: un valor manipulado no debe llegar al SQL.
+
+        creado, ultimo_id = decodificar_cursor(cursor, fecha_hora, entero)
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+
+    if not isinstance(valores, list) or len(valores) != len(tipos):
+        raise ValueError("Cursor inválido")
+    try:
+        return [convertir(valor) for convertir, valor in zip(tipos, valores)]
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+
+
+# =====================================================
+# CONVERSORES DE VALORES DEL CURSOR
+# =====================================================
+
+def entero(valor):
+    # bool es subclase de int: true/false no son ids
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise TypeError(valor)
+    return valor
+
+
+def fecha_hora(valor):
+    if not isinstance(valor, str):
+        raise TypeError(valor)
+    return datetime.fromisoformat(valor)
+
+
+def opcional(convertir):
+    """Conversor que además acepta null (columnas con NULLS LAST)."""
+    return lambda valor: None if valor is None else convertir(valor)
+
+
+def leer_limite(valor, maximo=100):
+    """Convierte ?limit= a entero en [1, maximo]; lanza ValueError si no es un número."""
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("limit debe ser un número entero")
+    return max(1, min(limite, maximo))
+
+
+def paginar(q, args, por_pagina=50, maximo=200):
+    """
+    Página ?page=&per_page= de una consulta (limit/offset). Devuelve la
+    consulta de la página y el sobre {total, page, per_page, pages};
+    per_page queda en [1, maximo].
+
+        q, paginacion = paginar(q, request.args)
+        return jsonify({"items": [...q.all()], **paginacion})
+    """
+    page = max(args.get("page", 1, type=int), 1)
+    per_page = min(max(args.get("per_page", por_pagina, type=int), 1), maximo)
+    total = q.order_by(None).count()
+    return q.limit(per_page).offset((page - 1) * per_page), {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": (total + per_page - 1) // per_page,
+    }
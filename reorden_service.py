@@ -0,0 +1,148 @@
+# reorden_service.py
+"""
+Reordenamiento de entidades con columna de orden en una sola sentencia.
+
+En vez de un UPDATE por id:
+
+    UPDATE travel.galerias AS g
+       SET orden = nuevo_orden.orden
+      FROM (VALUES (31, 1), (17, 2), (40, 3)) AS nuevo_orden (id, orden)
+     WHERE g.id = nuevo_orden.id
+    RETURNING g.id
+
+La lista tiene que ser el orden completo del grupo (todas las fotos de un
+tour, todas las categorías, ...) y solo de ese grupo; si no, ValueError. Las
+rutas antiguas (/banners/reorder, /ubicaciones/reorder) aceptan una parte:
+esas filas van primero y el resto conserva su orden relativo (parcial=True).
+
+Todo va dentro de la transacción del request (la ruta hace el commit) y los
+tours afectados se marcan para regenerar su documento público.
+"""
+from collections import namedtuple
+
+from sqlalchemy import BigInteger, Integer, column, select, update, values
+
+import documento_service
+from extensions import db
+from models import (
+    Categoria,
+    Galeria,
+    Itinerario,
+    PortadaHome,
+    TourBanner,
+    TourIncluye,
+    TourSeccion,
+    TourUbicacion,
+)
+
+# modelo, columna de orden, columna que agrupa (o None) y primer valor
+Ordenable = namedtuple("Ordenable", "modelo columna grupo inicio")
+
+ENTIDADES = {
+    "banners": Ordenable(TourBanner, "orden", "tour_id", 0),
+    "ubicaciones": Ordenable(TourUbicacion, "orden", "tour_id", 1),
+    "galeria": Ordenable(Galeria, "orden", "tour_id", 1),
+    "itinerarios": Ordenable(Itinerario, "orden_dia", "tour_id", 1),
+    "secciones": Ordenable(TourSeccion, "orden", "tour_id", 1),
+    "incluye": Ordenable(TourIncluye, "orden", "tour_id", 1),
+    "portadas": Ordenable(PortadaHome, "orden", "seccion", 0),
+    "categorias": Ordenable(Categoria, "orden", None, 0),
+}
+
+MAX_IDS = 5000
+
+
+def leer_ids(crudos):
+    """Lista de ids enteros, sin repetidos. ValueError si no es válida."""
+    if not isinstance(crudos, list) or not crudos:
+        raise ValueError("Debe proporcionar lista de IDs")
+    if len(crudos) > MAX_IDS:
+        raise ValueError(f"Máximo {MAX_IDS} IDs por reordenamiento")
+    try:
+        ids = [int(i) for i in crudos]
+    except (TypeError, ValueError):
+        raise ValueError("Los IDs deben ser números")
+    if len(set(ids)) != len(ids):
+        raise ValueError("La lista de IDs tiene repetidos")
+    return ids
+
+
+def _grupo_de(config, ids):
+    """Grupo común de los ids. ValueError si no existen o son de varios grupos."""
+    columna = getattr(config.modelo, config.grupo)
+    grupos = db.session.execute(
+        select(columna).where(config.modelo.id.in_(ids)).distinct()
+    ).scalars().all()
+    if len(grupos) != 1:
+        raise ValueError(f"Los IDs deben pertenecer a un mismo {config.grupo}")
+    return grupos[0]
+
+
+def reordenar(entidad, ids, grupo=None, parcial=False):
+    """
+    Asigna la posición de cada id según su lugar en la lista (desde el valor
+    inicial de la entidad). No hace commit.
+
+    La lista debe traer exactamente todas las filas del grupo (p. ej. todas
+    las fotos del tour, o todas las categorías): un id de otro grupo, uno que
+    no existe o un hermano que falta es ValueError, así nunca quedan dos filas
+    con la misma posición. Si no se indica el grupo se toma el de los ids.
+
+    Con parcial=True los ids que no son del grupo se ignoran y los hermanos
+    que faltan se ponen detrás, en su orden actual.
+
+    Devuelve los ids actualizados, en el orden final.
+    """
+    config = ENTIDADES.get(entidad)
+    if config is None:
+        raise ValueError(f"Entidad no reordenable: {entidad}")
+
+    modelo = config.modelo
+    hermanos = select(modelo.id).order_by(getattr(modelo, config.columna).asc().nulls_last(), modelo.id)
+    if config.grupo:
+        if grupo is None:
+            grupo = _grupo_de(config, ids)
+        elif config.grupo == "tour_id":
+            try:
+                grupo = int(grupo)
+            except (TypeError, ValueError):
+                raise ValueError("tour_id debe ser un número")
+        hermanos = hermanos.where(getattr(modelo, config.grupo) == grupo)
+    en_orden = db.session.execute(hermanos).scalars().all()
+    hermanos = set(en_orden)
+
+    if parcial:
+        ids = [i for i in ids if i in hermanos]
+        enviados = set(ids)
+        ids += [i for i in en_orden if i not in enviados]
+
+    ajenos = [i for i in ids if i not in hermanos]
+    if ajenos:
+        raise ValueError(f"IDs inexistentes o de otro grupo: {ajenos[:20]}")
+    if len(ids) != len(hermanos):
+        faltan = sorted(hermanos.difference(ids))
+        raise ValueError(f"Debe enviar el orden completo del grupo, faltan: {faltan[:20]}")
+
+    nuevo_orden = values(
+        column("id", BigInteger),
+        column("orden", Integer),
+        name="nuevo_orden",
+    ).data([(id_, posicion) for posicion, id_ in enumerate(ids, start=config.inicio)])
+
+    stmt = (
+        update(modelo)
+        .where(modelo.id == nuevo_orden.c.id)
+        .values({getattr(modelo, config.columna): nuevo_orden.c.orden})
+    )
+
+    filas = db.session.execute(
+        stmt.returning(modelo.id),
+        execution_options={"synchronize_session": "fetch"},
+    ).all()
+
+    if config.grupo == "tour_id":
+        # UPDATE masivo: avisar qué documento de tour hay que regenerar
+        documento_service.marcar_tours({grupo})
+
+    actualizados = {fila.id for fila in filas}
+    return [i for i in ids if i in actualizados]
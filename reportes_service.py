@@ -0,0 +1,323 @@
+# reportes_service.py
+"""
+Rollups de reportes de reservas (ocupación e ingresos).
+
+travel.reporte_ingresos_mensual  -> por mes de creación, tour y moneda
+travel.reporte_salidas           -> por fecha de salida
+
+Se mantienen por deltas en la misma transacción que cambia la reserva:
+- before_flush lee de la BD el estado anterior de las reservas modificadas
+  o eliminadas (no depende de que los atributos estuvieran cargados).
+- after_flush calcula aporte(nuevo) - aporte(anterior) de cada reserva y lo
+  suma a los rollups con INSERT ... ON CONFLICT DO UPDATE.
+
+Así quedan cubiertos crear_pre_reserva, admin_create_reserva,
+confirmar_reserva, admin_update_reserva, cancelar_mi_reserva y cualquier otra
+escritura por el ORM. Los DELETE masivos de reservas no pasan por el flush:
+esas rutas deben llamar antes a quitar_reservas(query). Un UPDATE masivo
+llama a quitar_reservas(query) antes y a agregar_reservas(query) después.
+
+En modo plazas (CUPOS_MODO=plazas, ver cupos_service) cada reserva tocaría
+las mismas filas de reporte_salidas y del mes en curso: los deltas se anotan
+en travel.reporte_pendientes (solo INSERT) y flask --app app cupos-compactar
+los pliega en los rollups, que van atrasados hasta esa pasada.
+
+Si alguna vez se desalinean: flask --app app reconstruir-reportes
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+import click
+from flask import current_app
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from extensions import db
+from models import (
+    Reserva,
+    ReservaEstado,
+    PagoEstado,
+    ReporteIngresoMensual,
+    ReportePendiente,
+    ReporteSalida,
+)
+
+# Clave en session.info con el estado anterior de las reservas del flush
+_CLAVE_PREVIOS = "reportes_reservas_previas"
+
+CANCELADAS = (ReservaEstado.CANCELADA_CLIENTE, ReservaEstado.CANCELADA_OPERADOR)
+
+# Columnas de Reserva que afectan a los rollups
+_COLUMNAS = (
+    "tour_id",
+    "fecha_tour_id",
+    "numero_personas",
+    "estado_reserva",
+    "estado_pago",
+    "monto_total",
+    "moneda",
+    "created_at",
+)
+
+_METRICAS_MENSUAL = (
+    "reservas",
+    "reservas_confirmadas",
+    "reservas_canceladas",
+    "personas",
+    "monto_reservado",
+    "monto_pagado",
+)
+
+_METRICAS_SALIDA = (
+    "reservas",
+    "reservas_confirmadas",
+    "reservas_canceladas",
+    "personas",
+    "personas_confirmadas",
+    "monto_reservado",
+)
+
+_METRICAS_PENDIENTES = tuple(dict.fromkeys(_METRICAS_MENSUAL + _METRICAS_SALIDA))
+
+
+# =====================================================
+# DELTAS
+# =====================================================
+
+def _nuevos_deltas():
+    return {"mensual": defaultdict(lambda: defaultdict(int)), "salida": defaultdict(lambda: defaultdict(int))}
+
+
+def _sumar_aporte(deltas, valores, signo):
+    """Suma (signo=1) o resta (signo=-1) lo que una reserva aporta a cada rollup."""
+    cancelada = valores["estado_reserva"] in CANCELADAS
+    confirmada = valores["estado_reserva"] == ReservaEstado.CONFIRMADA
+    pagada = valores["estado_pago"] == PagoEstado.PAGADO
+    # Desde el objeto pueden llegar tal cual vinieron en el JSON (str, float)
+    personas = int(valores["numero_personas"] or 0)
+    monto = Decimal(str(valores["monto_total"] or 0))
+
+    creada = valores["created_at"]
+    if creada is not None:
+        clave = (date(creada.year, creada.month, 1), valores["tour_id"], valores["moneda"] or "USD")
+        fila = deltas["mensual"][clave]
+        fila["reservas"] += signo
+        fila["reservas_confirmadas"] += signo * confirmada
+        fila["reservas_canceladas"] += signo * cancelada
+        fila["personas"] += 0 if cancelada else signo * personas
+        fila["monto_reservado"] += 0 if cancelada else signo * monto
+        fila["monto_pagado"] += signo * monto if pagada else 0
+
+    if valores["fecha_tour_id"] is not None:
+        fila = deltas["salida"][(valores["fecha_tour_id"], valores["tour_id"])]
+        fila["reservas"] += signo
+        fila["reservas_confirmadas"] += signo * confirmada
+        fila["reservas_canceladas"] += signo * cancelada
+        fila["personas"] += 0 if cancelada else signo * personas
+        fila["personas_confirmadas"] += signo * personas if confirmada else 0
+        fila["monto_reservado"] += 0 if cancelada else signo * monto
+
+
+def _filas(deltas):
+    """Filas (mensual, salidas) con los deltas distintos de cero."""
+    mensual = [
+        {"mes": mes, "tour_id": tour_id, "moneda": moneda, **{m: fila[m] for m in _METRICAS_MENSUAL}}
+        for (mes, tour_id, moneda), fila in deltas["mensual"].items()
+        if any(fila.values())
+    ]
+    salidas = [
+        {"fecha_tour_id": fecha_tour_id, "tour_id": tour_id, **{m: fila[m] for m in _METRICAS_SALIDA}}
+        for (fecha_tour_id, tour_id), fila in deltas["salida"].items()
+        if any(fila.values())
+    ]
+    return mensual, salidas
+
+
+def _sumar_en_rollups(conexion, mensual, salidas):
+    """Upsert de los deltas: columna = columna + delta."""
+    if mensual:
+        tabla = ReporteIngresoMensual.__table__
+        stmt = pg_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["mes", "tour_id", "moneda"],
+            set_={m: tabla.c[m] + stmt.excluded[m] for m in _METRICAS_MENSUAL},
+        )
+        conexion.execute(stmt, mensual)
+
+    if salidas:
+        tabla = ReporteSalida.__table__
+        stmt = pg_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["fecha_tour_id"],
+            set_={
+                "tour_id": stmt.excluded.tour_id,
+                **{m: tabla.c[m] + stmt.excluded[m] for m in _METRICAS_SALIDA},
+            },
+        )
+        conexion.execute(stmt, salidas)
+
+
+def _modo_plazas():
+    # Mismo interruptor que cupos_service: en modo plazas una reserva no
+    # escribe sobre filas compartidas con otras reservas
+    return current_app.config.get("CUPOS_MODO", "fila") == "plazas"
+
+
+def _aplicar(conexion, deltas):
+    """Suma los deltas a los rollups o, en modo plazas, los deja pendientes."""
+    mensual, salidas = _filas(deltas)
+    if not _modo_plazas():
+        _sumar_en_rollups(conexion, mensual, salidas)
+        return
+
+    # Todas las filas con las mismas columnas (un solo INSERT multi-fila)
+    vacia = {"mes": None, "moneda": None, "fecha_tour_id": None, **{m: 0 for m in _METRICAS_PENDIENTES}}
+    pendientes = [{**vacia, **fila, "tipo": "mensual"} for fila in mensual] + [
+        {**vacia, **fila, "tipo": "salida"} for fila in salidas
+    ]
+    if pendientes:
+        conexion.execute(ReportePendiente.__table__.insert(), pendientes)
+
+
+def _leer_valores(conexion, condicion):
+    """{reserva_id: valores} leídos directamente de la BD (sin autoflush)."""
+    columnas = [getattr(Reserva, c) for c in _COLUMNAS]
+    filas = conexion.execute(select(Reserva.id, *columnas).where(condicion))
+    return {fila.id: {c: getattr(fila, c) for c in _COLUMNAS} for fila in filas}
+
+
+def _aportar_reservas(query, signo):
+    ids = query.with_entities(Reserva.id).subquery()
+    conexion = db.session.connection()
+    deltas = _nuevos_deltas()
+    for valores in _leer_valores(conexion, Reserva.id.in_(select(ids.c.id))).values():
+        _sumar_aporte(deltas, valores, signo)
+    _aplicar(conexion, deltas)
+
+
+def quitar_reservas(query):
+    """
+    Descuenta de los rollups las reservas de query. Llamar justo antes de un
+    DELETE masivo: Reserva.query.filter_by(tour_id=...).delete()
+    """
+    _aportar_reservas(query, -1)
+
+
+def agregar_reservas(query):
+    """Suma a los rollups las reservas de query (tras un UPDATE masivo)."""
+    _aportar_reservas(query, 1)
+
+
+# =====================================================
+# LISTENERS DE LA SESIÓN
+# =====================================================
+
+def _cambio_relevante(obj):
+    estado = inspect(obj)
+    return any(estado.attrs[c].history.has_changes() for c in _COLUMNAS)
+
+
+@event.listens_for(db.session, "before_flush")
+def _leer_estado_anterior(session, flush_context, instances):
+    ids = [
+        obj.id for obj in session.deleted
+        if isinstance(obj, Reserva) and obj.id is not None
+    ] + [
+        obj.id for obj in session.dirty
+        if isinstance(obj, Reserva) and obj.id is not None and _cambio_relevante(obj)
+    ]
+    session.info[_CLAVE_PREVIOS] = (
+        _leer_valores(session.connection(), Reserva.id.in_(ids)) if ids else {}
+    )
+
+
+@event.listens_for(db.session, "after_flush")
+def _actualizar_rollups(session, flush_context):
+    previos = session.info.pop(_CLAVE_PREVIOS, None) or {}
+    deltas = _nuevos_deltas()
+
+    for obj in session.new:
+        if isinstance(obj, Reserva):
+            _sumar_aporte(deltas, {c: getattr(obj, c) for c in _COLUMNAS}, 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Reserva) and obj.id in previos:
+            _sumar_aporte(deltas, previos[obj.id], -1)
+            _sumar_aporte(deltas, {c: getattr(obj, c) for c in _COLUMNAS}, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Reserva) and obj.id in previos:
+            _sumar_aporte(deltas, previos[obj.id], -1)
+
+    _aplicar(session.connection(), deltas)
+
+
+# =====================================================
+# MODO LIBRO: PLEGAR PENDIENTES
+# =====================================================
+
+def plegar_pendientes(lote=5000):
+    """
+    Suma a los rollups los deltas pendientes, por lotes, un commit por lote.
+    Cada lote se borra y se lee en la misma sentencia (DELETE ... RETURNING):
+    un delta que se confirma mientras tanto queda para la siguiente pasada y
+    dos procesos plegando a la vez nunca suman el mismo delta. Devuelve
+    cuántos deltas plegó.
+    """
+    tabla = ReportePendiente.__table__
+    total = 0
+    while True:
+        siguientes = select(tabla.c.id).order_by(tabla.c.id).limit(lote).scalar_subquery()
+        filas = db.session.execute(
+            delete(tabla).where(tabla.c.id.in_(siguientes)).returning(*tabla.c)
+        ).all()
+
+        deltas = _nuevos_deltas()
+        for fila in filas:
+            if fila.tipo == "mensual":
+                destino = deltas["mensual"][(fila.mes, fila.tour_id, fila.moneda)]
+                metricas = _METRICAS_MENSUAL
+            else:
+                destino = deltas["salida"][(fila.fecha_tour_id, fila.tour_id)]
+                metricas = _METRICAS_SALIDA
+            for m in metricas:
+                destino[m] += getattr(fila, m)
+        _sumar_en_rollups(db.session.connection(), *_filas(deltas))
+        db.session.commit()
+
+        total += len(filas)
+        if len(filas) < lote:
+            return total
+
+
+# =====================================================
+# RECONSTRUCCIÓN
+# =====================================================
+
+def reconstruir_reportes():
+    """Recalcula ambos rollups desde cero a partir de travel.reservas."""
+    conexion = db.session.connection()
+    conexion.execute(ReporteIngresoMensual.__table__.delete())
+    conexion.execute(ReporteSalida.__table__.delete())
+    conexion.execute(ReportePendiente.__table__.delete())
+
+    deltas = _nuevos_deltas()
+    columnas = [getattr(Reserva, c) for c in _COLUMNAS]
+    filas = conexion.execution_options(yield_per=1000).execute(select(*columnas))
+    total = 0
+    for fila in filas:
+        _sumar_aporte(deltas, {c: getattr(fila, c) for c in _COLUMNAS}, 1)
+        total += 1
+
+    _sumar_en_rollups(conexion, *_filas(deltas))
+    db.session.commit()
+    return total
+
+
+def init_app(app):
+    @app.cli.command("reconstruir-reportes")
+    def reconstruir_reportes_command():
+        """Recalcula los rollups de reportes de reservas."""
+        total = reconstruir_reportes()
+        click.echo(f"Reportes reconstruidos a partir de {total} reservas")
@@ -0,0 +1,516 @@
+# reserva_service.py
+"""
+Creación y consulta de reservas del cliente, compartida por tour_bp y
+reservation_bp (ambos registran POST /tours/<id>/reservas y
+GET /tours/mis-reservas; con una sola implementación da igual cuál gane).
+
+crear_pre_reserva:
+1. Valida usuario, tour activo, fecha del tour y número de personas.
+2. Ocupa los cupos (cupos_service) y crea la Reserva en una sola transacción:
+   si algo falla antes del commit no queda ni la reserva ni los cupos.
+3. El monto se calcula aquí (precio_pp × personas); el monto_total que
+   mande el cliente se ignora.
+4. Tras el commit, y solo si el commit fue bien, encarga los correos al
+   cliente y al admin (Resend) a un hilo aparte y responde sin esperarlos
+   (RESERVAS_CORREOS_EN_FONDO). Un fallo de correo no deshace la reserva.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+
+import cupos_service
+import idempotencia_service
+from cargador import cargador
+from email_service import enviar_email, ADMIN_EMAIL
+from extensions import db
+from models import (
+    Usuario,
+    Tour,
+    FechaTour,
+    Reserva,
+    ReservaEstado,
+    PagoEstado,
+)
+
+
+class ErrorReserva(Exception):
+    """Error de validación con el mensaje y el código HTTP para el cliente."""
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.estado = estado
+
+
+# =====================================================
+# CREAR PRE-RESERVA
+# =====================================================
+
+def _leer_entero(data, campo, minimo=None):
+    try:
+        valor = int(data[campo])
+    except (ValueError, TypeError):
+        raise ErrorReserva("fecha_tour_id y numero_personas deben ser enteros")
+    if minimo is not None and valor < minimo:
+        raise ErrorReserva(f"{campo} debe ser al menos {minimo}")
+    return valor
+
+
+def crear_pre_reserva(usuario_id, tour_id, data):
+    """
+    Crea una PRE_RESERVA y ocupa sus cupos. Hace commit y después notifica.
+    Devuelve el cuerpo de la respuesta. Lanza ErrorReserva si no es válida.
+    """
+    usuario = Usuario.query.get(usuario_id)
+    if not usuario:
+        raise ErrorReserva("Usuario no encontrado", 404)
+
+    tour = Tour.query.get(tour_id)
+    if not tour or not tour.activo:
+        raise ErrorReserva("Tour no encontrado o inactivo", 404)
+
+    if not all(campo in data for campo in ("fecha_tour_id", "numero_personas")):
+        raise ErrorReserva("Faltan campos obligatorios")
+
+    fecha_tour_id = _leer_entero(data, "fecha_tour_id")
+    numero_personas = _leer_entero(data, "numero_personas", minimo=1)
+
+    fecha = FechaTour.query.filter_by(id=fecha_tour_id, tour_id=tour.id).first()
+    if not fecha:
+        raise ErrorReserva("La fecha seleccionada no pertenece a este tour")
+
+    # Ocupar los cupos en un solo UPDATE condicional (sin sobreventa)
+    try:
+        cupos_service.reservar(fecha, numero_personas)
+    except cupos_service.CuposInsuficientes as e:
+        db.session.rollback()
+        raise ErrorReserva(f"No hay cupos suficientes. Disponibles: {e.disponibles}")
+
+    monto_total = (tour.precio_pp or 0) * numero_personas
+
+    # Datos de contacto del formulario (si no vienen, los del usuario)
+    contacto = data.get("datos_contacto") or {}
+    if not isinstance(contacto, dict):
+        contacto = {}
+
+    reserva = Reserva(
+        usuario_id=usuario.id,
+        tour_id=tour.id,
+        fecha_tour_id=fecha.id,
+        numero_personas=numero_personas,
+        estado_reserva=ReservaEstado.PRE_RESERVA,
+        estado_pago=PagoEstado.PENDIENTE,
+        monto_total=monto_total,
+        moneda=tour.moneda or "USD",
+        comentarios_cliente=data.get("comentarios_cliente"),
+    )
+    db.session.add(reserva)
+    db.session.flush()
+
+    # Serializar antes del commit: después las instancias quedan expiradas
+    resumen = {
+        "id": reserva.id,
+        "tour_nombre": tour.nombre,
+        "fecha_inicio": fecha.fecha_inicio.isoformat() if fecha.fecha_inicio else None,
+        "fecha_fin": fecha.fecha_fin.isoformat() if fecha.fecha_fin else None,
+        "numero_personas": reserva.numero_personas,
+        "monto_total": float(reserva.monto_total) if reserva.monto_total else 0,
+        "moneda": reserva.moneda,
+        "estado_reserva": reserva.estado_reserva.value,
+        "estado_pago": reserva.estado_pago.value,
+    }
+    aviso = _preparar_aviso(reserva, usuario, tour, fecha, contacto)
+    cuerpo = {
+        "message": "Pre-reserva creada exitosamente. Te enviaremos un correo de confirmación.",
+        "reserva": resumen,
+    }
+    # Con Idempotency-Key, la respuesta se confirma junto con la reserva
+    idempotencia_service.anotar_respuesta(cuerpo, 201)
+
+    db.session.commit()
+
+    programar_aviso(aviso)
+    return cuerpo
+
+
+# =====================================================
+# CAMBIOS DE ESTADO Y CUPOS
+# =====================================================
+
+def bloquear(reserva_id):
+    """
+    La reserva con su fila bloqueada (FOR UPDATE) hasta el commit, o None.
+    Dos cancelaciones concurrentes (o una y el barrido de expiración) se
+    esperan: la segunda lee el estado ya confirmado por la primera y no
+    vuelve a liberar los cupos.
+    """
+    return db.session.get(Reserva, reserva_id, with_for_update=True, populate_existing=True)
+
+
+def cupos_tomados(reserva):
+    """(fecha_tour_id, personas) que la reserva ocupa, o None si está cancelada."""
+    if reserva.estado_reserva in cupos_service.CANCELADAS:
+        return None
+    return reserva.fecha_tour_id, reserva.numero_personas
+
+
+def mover_cupos(antes, despues):
+    """
+    Devuelve los cupos de `antes` y ocupa los de `despues` (valores de
+    cupos_tomados). Lanza CuposInsuficientes si no alcanzan. No hace commit.
+    """
+    if antes == despues:
+        return
+    if antes:
+        fecha = db.session.get(FechaTour, antes[0])
+        if fecha:
+            cupos_service.liberar(fecha, antes[1])
+    if despues:
+        fecha = db.session.get(FechaTour, despues[0])
+        if fecha:
+            cupos_service.reservar(fecha, despues[1])
+
+
+# =====================================================
+# NOTIFICACIÓN POST-COMMIT
+# =====================================================
+
+def _foto(obj, *campos):
+    return SimpleNamespace(**{campo: getattr(obj, campo, None) for campo in campos})
+
+
+def _preparar_aviso(reserva, usuario, tour, fecha, contacto):
+    """
+    Copia de lo que usan los correos, tomada antes del commit: después las
+    instancias quedan expiradas y leerlas costaría cuatro consultas más.
+    """
+    return {
+        "reserva": _foto(reserva, "id", "numero_personas", "monto_total", "moneda", "comentarios_cliente"),
+        "usuario": _foto(usuario, "nombre", "apellido", "email"),
+        "tour": _foto(tour, "nombre", "pais", "duracion_dias"),
+        "fecha": _foto(fecha, "fecha_inicio", "fecha_fin"),
+        "email_destino": contacto.get("email") or usuario.email,
+        "nombre_contacto": contacto.get("nombre") or usuario.nombre,
+        "telefono_contacto": contacto.get("telefono") or getattr(usuario, "telefono", None),
+    }
+
+
+def notificar_pre_reserva(aviso):
+    """
+    Envía los correos de una pre-reserva ya confirmada en la BD.
+    Devuelve True si el del cliente salió.
+    """
+    try:
+        enviado = enviar_correo_cliente(
+            aviso["reserva"], aviso["usuario"], aviso["tour"], aviso["fecha"],
+            aviso["email_destino"], aviso["nombre_contacto"],
+        ) is not None
+        enviar_correo_admin(
+            aviso["reserva"], aviso["usuario"], aviso["tour"], aviso["fecha"],
+            aviso["telefono_contacto"],
+        )
+        return enviado
+    except Exception as e:
+        current_app.logger.error(f"❌ Error enviando correo de la reserva #{aviso['reserva'].id}: {e}")
+        return False
+
+
+# Un hilo basta: Resend tarda cientos de ms por correo, pero son pocos por
+# minuto. Al salir el proceso, concurrent.futures espera los pendientes.
+_avisos = None
+_avisos_lock = threading.Lock()
+
+
+def _ejecutor_avisos():
+    global _avisos
+    with _avisos_lock:
+        if _avisos is None:
+            _avisos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="correos-reservas")
+        return _avisos
+
+
+def _notificar_en_fondo(app, aviso):
+    with app.app_context():
+        notificar_pre_reserva(aviso)
+
+
+def programar_aviso(aviso):
+    """
+    Encarga los correos de la pre-reserva a un hilo aparte (o los envía ya
+    si RESERVAS_CORREOS_EN_FONDO está apagado). Llamar después del commit.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get("RESERVAS_CORREOS_EN_FONDO", True):
+        notificar_pre_reserva(aviso)
+        return
+    _ejecutor_avisos().submit(_notificar_en_fondo, app, aviso)
+
+
+# =====================================================
+# MIS RESERVAS
+# =====================================================
+
+def listar_del_usuario(usuario_id):
+    """Reservas del usuario, más recientes primero, con tour y fechas de salida."""
+    reservas = (
+        Reserva.query
+        .filter_by(usuario_id=usuario_id)
+        .order_by(Reserva.created_at.desc())
+        .all()
+    )
+
+    tours = cargador(Tour).pedir(r.tour_id for r in reservas)
+    fechas = cargador(FechaTour).pedir(r.fecha_tour_id for r in reservas)
+
+    resultado = []
+    for r in reservas:
+        tour = tours.obtener(r.tour_id)
+        fecha = fechas.obtener(r.fecha_tour_id)
+        resultado.append({
+            **r.to_dict_public(),
+            "tour_nombre": tour.nombre if tour else None,
+            "tour_slug": tour.slug if tour else None,
+            "fecha_inicio": fecha.fecha_inicio.isoformat() if fecha and fecha.fecha_inicio else None,
+            "fecha_fin": fecha.fecha_fin.isoformat() if fecha and fecha.fecha_fin else None,
+        })
+    return resultado
+
+
+# =====================================================
+# CORREOS (Resend)
+# =====================================================
+
+def enviar_correo_cliente(reserva, usuario, tour, fecha, email_destino, nombre_contacto):
+    """Envía correo de confirmación de pre-reserva al cliente"""
+    
+    fecha_inicio_str = fecha.fecha_inicio.strftime('%d de %B, %Y') if fecha.fecha_inicio else 'Por confirmar'
+    fecha_fin_str = fecha.fecha_fin.strftime('%d de %B, %Y') if fecha.fecha_fin else 'Por confirmar'
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: 'Segoe UI', Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f5f5f5; }}
+            .container {{ max-width: 600px; margin: 0 auto; background: #fff; }}
+            .header {{ background: linear-gradient(135deg, #C1A919 0%, #a08915 100%); color: white; padding: 30px; text-align: center; }}
+            .header h1 {{ margin: 0; font-size: 24px; }}
+            .success-icon {{ font-size: 50px; margin-bottom: 10px; }}
+            .content {{ padding: 30px; }}
+            .info-box {{ background: #fffaf0; border: 1px solid #f0e6c8; border-radius: 10px; padding: 20px; margin: 20px 0; }}
+            .info-row {{ padding: 12px 0; border-bottom: 1px solid #f0f0f0; }}
+            .info-row:last-child {{ border-bottom: none; }}
+            .info-label {{ color: #666; font-size: 14px; }}
+            .info-value {{ font-weight: bold; color: #333; font-size: 16px; }}
+            .total {{ font-size: 28px; color: #C1A919; font-weight: bold; }}
+            .cta-button {{ display: inline-block; background: #25D366; color: white; padding: 15px 30px; text-decoration: none; border-radius: 30px; font-weight: bold; margin: 10px 5px; }}
+            .footer {{ background: #f9f9f9; padding: 20px; text-align: center; font-size: 12px; color: #888; }}
+            .next-steps {{ background: #e8f5e9; border-left: 4px solid #4CAF50; padding: 15px 20px; margin: 20px 0; border-radius: 0 10px 10px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <div class="success-icon">✈️</div>
+                <h1>¡Solicitud de Reserva Recibida!</h1>
+                <p style="margin: 10px 0 0; opacity: 0.9;">Reserva #{reserva.id}</p>
+            </div>
+            
+            <div class="content">
+                <p>Hola <strong>{nombre_contacto}</strong>,</p>
+                
+                <p>¡Gracias por elegirnos! Hemos recibido tu solicitud de reserva para <strong>{tour.nombre}</strong>.</p>
+                
+                <p>Nuestro equipo revisará tu solicitud y te contactará en las próximas <strong>24 horas</strong> para confirmar los detalles y coordinar el pago.</p>
+                
+                <div class="info-box">
+                    <h3 style="margin-top: 0; color: #C1A919; border-bottom: 2px solid #f0e6c8; padding-bottom: 10px;">📋 Resumen de tu solicitud</h3>
+                    
+                    <div class="info-row">
+                        <div class="info-label">Número de reserva</div>
+                        <div class="info-value">#{reserva.id}</div>
+                    </div>
+                    <div class="info-row">
+                        <div class="info-label">Tour</div>
+                        <div class="info-value">{tour.nombre}</div>
+                    </div>
+                    <div class="info-row">
+                        <div class="info-label">Destino</div>
+                        <div class="info-value">{tour.pais or 'Ecuador'}</div>
+                    </div>
+                    <div class="info-row">
+                        <div class="info-label">Fecha de salida</div>
+                        <div class="info-value">📅 {fecha_inicio_str}</div>
+                    </div>
+                    <div class="info-row">
+                        <div class="info-label">Fecha de regreso</div>
+                        <div class="info-value">📅 {fecha_fin_str}</div>
+                    </div>
+                    <div class="info-row">
+                        <div class="info-label">Duración</div>
+                        <div class="info-value">{tour.duracion_dias or 'N/A'} días</div>
+                    </div>
+                    <div class="info-row">
+                        <div class="info-label">Pasajeros</div>
+                        <div class="info-value">👥 {reserva.numero_personas} persona(s)</div>
+                    </div>
+                    <div class="info-row" style="background: #fffaf0; margin: 10px -20px -20px; padding: 20px; border-radius: 0 0 10px 10px;">
+                        <div class="info-label">Total estimado</div>
+                        <div class="total">${reserva.monto_total} {reserva.moneda}</div>
+                    </div>
+                </div>
+                
+                {"<div style='background: #f5f5f5; padding: 15px; border-radius: 10px; margin: 20px 0;'><strong>💬 Tus comentarios:</strong><p style='margin: 10px 0 0; color: #666;'>" + str(reserva.comentarios_cliente) + "</p></div>" if reserva.comentarios_cliente else ""}
+                
+                <div class="next-steps">
+                    <h4 style="margin-top: 0; color: #2e7d32;">📌 ¿Qué sigue?</h4>
+                    <p style="margin: 5px 0;">1️⃣ Revisaremos tu solicitud (máximo 24 horas)</p>
+                    <p style="margin: 5px 0;">2️⃣ Te contactaremos para confirmar disponibilidad</p>
+                    <p style="margin: 5px 0;">3️⃣ Coordinaremos la forma de pago</p>
+                    <p style="margin: 5px 0;">4️⃣ ¡Recibirás tu confirmación final!</p>
+                </div>
+                
+                <p style="text-align: center; margin-top: 30px;">
+                    <a href="https://wa.me/593985676029?text=Hola! Acabo de hacer una pre-reserva para {tour.nombre}. Mi número es %23{reserva.id}" class="cta-button">
+                        📱 Contactar por WhatsApp
+                    </a>
+                </p>
+                
+                <p style="text-align: center; color: #888; font-size: 14px; margin-top: 20px;">
+                    ¿Tienes preguntas? Responde a este correo o contáctanos por WhatsApp.
+                </p>
+            </div>
+            
+            <div class="footer">
+                <p style="font-size: 16px; margin-bottom: 5px;"><strong>Mirlo Tours</strong></p>
+                <p>🌍 Especialistas en turismo de naturaleza</p>
+                <p>📍 Ecuador | 📞 +593 98 567 6029</p>
+                <hr style="border: none; border-top: 1px solid #ddd; margin: 15px 0;">
+                <p style="font-size: 11px; color: #aaa;">
+                    Este correo fue enviado porque solicitaste una reserva en nuestro sitio web.
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return enviar_email(
+        [email_destino],
+        f"✈️ Solicitud de Reserva #{reserva.id} - {tour.nombre}",
+        html_content
+    )
+
+
+def enviar_correo_admin(reserva, usuario, tour, fecha, telefono_contacto):
+    """Envía notificación al admin sobre nueva pre-reserva"""
+
+    admin_email = ADMIN_EMAIL
+    
+    fecha_inicio_str = fecha.fecha_inicio.strftime('%d/%m/%Y') if fecha.fecha_inicio else 'Por confirmar'
+    fecha_fin_str = fecha.fecha_fin.strftime('%d/%m/%Y') if fecha.fecha_fin else 'Por confirmar'
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f5f5f5; }}
+            .container {{ max-width: 600px; margin: 0 auto; background: #fff; }}
+            .header {{ background: #C1A919; color: white; padding: 20px; text-align: center; }}
+            .content {{ padding: 25px; }}
+            .alert {{ background: #fff3cd; border: 1px solid #ffc107; padding: 15px; margin-bottom: 20px; border-radius: 8px; }}
+            .section {{ margin-bottom: 25px; }}
+            .section-title {{ font-size: 14px; color: #666; text-transform: uppercase; margin-bottom: 10px; border-bottom: 1px solid #eee; padding-bottom: 5px; }}
+            .info-table {{ width: 100%; border-collapse: collapse; }}
+            .info-table td {{ padding: 10px; border-bottom: 1px solid #f0f0f0; }}
+            .info-table td:first-child {{ font-weight: bold; width: 40%; color: #666; }}
+            .highlight {{ background: #fffaf0; padding: 15px; border-radius: 8px; text-align: center; margin: 20px 0; }}
+            .highlight .amount {{ font-size: 28px; color: #C1A919; font-weight: bold; }}
+            .btn {{ display: inline-block; background: #C1A919; color: white; padding: 12px 25px; text-decoration: none; border-radius: 25px; font-weight: bold; }}
+            .footer {{ background: #f9f9f9; padding: 15px; text-align: center; font-size: 12px; color: #888; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2 style="margin: 0;">🔔 Nueva Pre-Reserva #{reserva.id}</h2>
+            </div>
+            
+            <div class="content">
+                <div class="alert">
+                    <strong>⚠️ Acción requerida:</strong> Un cliente ha solicitado una reserva.
+                </div>
+                
+                <div class="section">
+                    <div class="section-title">👤 Datos del Cliente</div>
+                    <table class="info-table">
+                        <tr>
+                            <td>Nombre:</td>
+                            <td>{usuario.nombre} {getattr(usuario, 'apellido', '') or ''}</td>
+                        </tr>
+                        <tr>
+                            <td>Email:</td>
+                            <td><a href="mailto:{usuario.email}">{usuario.email}</a></td>
+                        </tr>
+                        <tr>
+                            <td>Teléfono:</td>
+                            <td>{telefono_contacto or 'No proporcionado'}</td>
+                        </tr>
+                    </table>
+                </div>
+                
+                <div class="section">
+                    <div class="section-title">🏔️ Datos de la Reserva</div>
+                    <table class="info-table">
+                        <tr>
+                            <td>Tour:</td>
+                            <td><strong>{tour.nombre}</strong></td>
+                        </tr>
+                        <tr>
+                            <td>Fecha:</td>
+                            <td>{fecha_inicio_str} → {fecha_fin_str}</td>
+                        </tr>
+                        <tr>
+                            <td>Pasajeros:</td>
+                            <td>{reserva.numero_personas} persona(s)</td>
+                        </tr>
+                        <tr>
+                            <td>Estado:</td>
+                            <td><span style="background: #fff3cd; padding: 3px 10px; border-radius: 15px; font-size: 12px;">⏳ PRE-RESERVA</span></td>
+                        </tr>
+                    </table>
+                </div>
+                
+                <div class="highlight">
+                    <div style="color: #666; font-size: 14px;">Monto Total</div>
+                    <div class="amount">${reserva.monto_total} {reserva.moneda}</div>
+                </div>
+                
+                {"<div class='section'><div class='section-title'>💬 Comentarios del Cliente</div><p style='background: #f5f5f5; padding: 15px; border-radius: 8px; margin: 0;'>" + str(reserva.comentarios_cliente) + "</p></div>" if reserva.comentarios_cliente else ""}
+                
+                <div style="text-align: center; margin-top: 25px;">
+                    <a href="https://www.mirlotoursec.com/admin/reservas/{reserva.id}" class="btn">
+                        👁️ Ver en Panel de Admin
+                    </a>
+                </div>
+            </div>
+            
+            <div class="footer">
+                <p>Reserva creada el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return enviar_email(
+        [admin_email],
+        f"🔔 Nueva Pre-Reserva #{reserva.id} - {tour.nombre} - {usuario.nombre}",
+        html_content
+    )
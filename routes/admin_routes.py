@@ -1,11 +1,24 @@
 # routes/admin_routes.py
+import csv
+import io
 import os
-from datetime import date
-from flask import Blueprint, request, jsonify, current_app
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 from flask import current_app # Para saber donde está la carpeta de tu app
+import cache_service
+import cupos_service
+import documento_service
+import idempotencia_service
+import reorden_service
+import reserva_service
+import reportes_service
+import ubicaciones_service
+from cargador import cargador
 from extensions import db
+from idempotencia_service import idempotente
+from paginacion import codificar_cursor, decodificar_cursor, entero, fecha_hora, leer_limite, paginar
 from models import (
     Usuario,
     Tour,
@@ -28,9 +41,14 @@ from models import (
     TourUbicacion,
     Categoria,
     ConsultaTour,
-    PortadaHome
+    PortadaHome,
+    ReporteIngresoMensual,
+    ReporteSalida,
+    tour_detail_options,
 )
 from sqlalchemy import func # <--- AGREGA ESTO AL INICIO DE admin_routes.py
+from sqlalchemy import and_, or_, delete, update
+from sqlalchemy.orm import joinedload, Bundle
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
 
@@ -108,11 +126,19 @@ def admin_list_categorias():
     if error:
         return error
 
-    categorias = Categoria.query.order_by(Categoria.orden).all()
-    return jsonify([{
-        **c.to_dict(),
-        "total_tours": len([t for t in c.tours if t.activo])
-    } for c in categorias])
+    total_tours = (
+        db.session.query(Tour.categoria_id, func.count(Tour.id).label("total"))
+        .filter(Tour.activo == True)
+        .group_by(Tour.categoria_id)
+        .subquery()
+    )
+    filas = (
+        db.session.query(Categoria, func.coalesce(total_tours.c.total, 0))
+        .outerjoin(total_tours, total_tours.c.categoria_id == Categoria.id)
+        .order_by(Categoria.orden)
+        .all()
+    )
+    return jsonify([{**c.to_dict(), "total_tours": total} for c, total in filas])
 
 
 @admin_bp.post("/categorias")
@@ -253,47 +279,227 @@ def admin_dashboard_resumen():
     _, error = _require_admin()
     if error: return error
 
-    # 1. TOTALES GENERALES (Fila superior)
-    tours_activos = Tour.query.filter_by(activo=True).count()
-    total_reservas = Reserva.query.count()
-    comentarios_pendientes = Comentario.query.filter_by(estado=ComentarioEstado.PENDIENTE).count()
-    pagos_pendientes = Reserva.query.filter_by(estado_pago=PagoEstado.PENDIENTE).count()
-
-    # 2. DESGLOSE DE RESERVAS (Para la tarjeta inferior izquierda)
-    reservas_estado = {
-        "pre_reserva": Reserva.query.filter_by(estado_reserva=ReservaEstado.PRE_RESERVA).count(),
-        "confirmada": Reserva.query.filter_by(estado_reserva=ReservaEstado.CONFIRMADA).count(),
-        "cancelada_cliente": Reserva.query.filter_by(estado_reserva=ReservaEstado.CANCELADA_CLIENTE).count(),
-        "cancelada_operador": Reserva.query.filter_by(estado_reserva=ReservaEstado.CANCELADA_OPERADOR).count(),
-    }
-
-    # 3. INGRESOS REALES (Opcional si quieres mantenerlo)
-    ingresos_totales = db.session.query(func.sum(Reserva.monto_total))\
-        .filter(Reserva.estado_pago == PagoEstado.PAGADO)\
-        .scalar() or 0
-
-    return jsonify({
+    # Foto compartida por todos los admins durante unos segundos: un tab
+    # abierto haciendo polling no vuelve a consultar la BD en cada refresco
+    resumen = cache_service.instantaneas.obtener("dashboard_resumen")
+    if resumen is None:
+        resumen = _calcular_dashboard_resumen()
+        cache_service.instantaneas.guardar(
+            "dashboard_resumen",
+            resumen,
+            tablas=(Tour.__tablename__, Reserva.__tablename__, Comentario.__tablename__),
+        )
+    return jsonify(resumen)
+
+
+def _calcular_dashboard_resumen():
+    """Una consulta de agregación condicional por tabla."""
+    tours_activos = db.session.query(
+        func.count(Tour.id).filter(Tour.activo == True)
+    ).scalar()
+
+    reservas = db.session.query(
+        func.count(Reserva.id),
+        func.count(Reserva.id).filter(Reserva.estado_pago == PagoEstado.PENDIENTE),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.PRE_RESERVA),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.CONFIRMADA),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.CANCELADA_CLIENTE),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.CANCELADA_OPERADOR),
+        func.sum(Reserva.monto_total).filter(Reserva.estado_pago == PagoEstado.PAGADO),
+    ).one()
+    (total_reservas, pagos_pendientes, pre_reserva, confirmada,
+     cancelada_cliente, cancelada_operador, ingresos_totales) = reservas
+
+    comentarios_pendientes = db.session.query(
+        func.count(Comentario.id).filter(Comentario.estado == ComentarioEstado.PENDIENTE)
+    ).scalar()
+
+    return {
         # FILA 1: TARJETAS SUPERIORES
         "tours_activos": tours_activos,
         "total_reservas": total_reservas,
         "comentarios_pendientes": comentarios_pendientes,
         "pagos_pendientes": pagos_pendientes,
-        "ingresos_totales": float(ingresos_totales),
+        "ingresos_totales": float(ingresos_totales or 0),
 
         # FILA 2: DETALLE DE ESTADOS
-        "reservas_estado": reservas_estado
-    })
+        "reservas_estado": {
+            "pre_reserva": pre_reserva,
+            "confirmada": confirmada,
+            "cancelada_cliente": cancelada_cliente,
+            "cancelada_operador": cancelada_operador,
+        }
+    }
+
+
+# ================== REPORTES (ROLLUPS) =====================
+
+def _leer_mes(valor):
+    """'YYYY-MM' -> date del primer día del mes (ValueError si no es válido)."""
+    anio, mes = valor.split("-")
+    return date(int(anio), int(mes), 1)
+
+
+@admin_bp.get("/reportes/ingresos")
+@jwt_required()
+def admin_reporte_ingresos():
+    """
+    Reservas e ingresos desde el rollup mensual (no recorre travel.reservas).
+    Filtros: ?desde=YYYY-MM &hasta=YYYY-MM &tour_id= &moneda=
+    ?agrupar=mes,tour_id,moneda (por defecto las tres) suma sobre el resto.
+    """
+    _, error = _require_admin()
+    if error:
+        return error
+
+    dimensiones = {
+        "mes": ReporteIngresoMensual.mes,
+        "tour_id": ReporteIngresoMensual.tour_id,
+        "moneda": ReporteIngresoMensual.moneda,
+    }
+    agrupar = [d.strip() for d in request.args.get("agrupar", "mes,tour_id,moneda").split(",") if d.strip()]
+    if not agrupar or any(d not in dimensiones for d in agrupar):
+        return jsonify({"message": "agrupar admite: mes, tour_id, moneda"}), 400
+
+    metricas = (
+        "reservas", "reservas_confirmadas", "reservas_canceladas",
+        "personas", "monto_reservado", "monto_pagado",
+    )
+    columnas = [dimensiones[d] for d in agrupar]
+    q = db.session.query(
+        *columnas,
+        *[func.sum(getattr(ReporteIngresoMensual, m)).label(m) for m in metricas],
+    )
+
+    try:
+        if request.args.get("desde"):
+            q = q.filter(ReporteIngresoMensual.mes >= _leer_mes(request.args["desde"]))
+        if request.args.get("hasta"):
+            q = q.filter(ReporteIngresoMensual.mes <= _leer_mes(request.args["hasta"]))
+        if request.args.get("tour_id"):
+            q = q.filter(ReporteIngresoMensual.tour_id == int(request.args["tour_id"]))
+    except ValueError:
+        return jsonify({"message": "Filtros inválidos: meses YYYY-MM y tour_id numérico"}), 400
+    if request.args.get("moneda"):
+        q = q.filter(ReporteIngresoMensual.moneda == request.args["moneda"].upper())
+
+    filas = q.group_by(*columnas).order_by(*columnas).all()
+
+    resultado = []
+    for fila in filas:
+        item = {d: getattr(fila, d) for d in agrupar}
+        if "mes" in item:
+            item["mes"] = item["mes"].strftime("%Y-%m")
+        for m in metricas:
+            valor = getattr(fila, m) or 0
+            item[m] = float(valor) if m.startswith("monto") else int(valor)
+        resultado.append(item)
+
+    return jsonify(resultado)
+
+
+@admin_bp.get("/reportes/salidas")
+@jwt_required()
+def admin_reporte_salidas():
+    """
+    Ocupación por fecha de salida desde el rollup de salidas.
+    Filtros: ?tour_id= &desde=YYYY-MM-DD &hasta=YYYY-MM-DD (fecha de inicio)
+    """
+    _, error = _require_admin()
+    if error:
+        return error
+
+    q = (
+        db.session.query(ReporteSalida, FechaTour.fecha_inicio, FechaTour.fecha_fin, FechaTour.cupos_totales)
+        .join(FechaTour, FechaTour.id == ReporteSalida.fecha_tour_id)
+    )
+    try:
+        if request.args.get("tour_id"):
+            q = q.filter(ReporteSalida.tour_id == int(request.args["tour_id"]))
+        if request.args.get("desde"):
+            q = q.filter(FechaTour.fecha_inicio >= date.fromisoformat(request.args["desde"]))
+        if request.args.get("hasta"):
+            q = q.filter(FechaTour.fecha_inicio <= date.fromisoformat(request.args["hasta"]))
+    except ValueError:
+        return jsonify({"message": "Filtros inválidos: fechas YYYY-MM-DD y tour_id numérico"}), 400
+
+    resultado = []
+    for salida, fecha_inicio, fecha_fin, cupos_totales in q.order_by(FechaTour.fecha_inicio).all():
+        resultado.append({
+            **salida.to_dict(),
+            "fecha_inicio": fecha_inicio.isoformat() if fecha_inicio else None,
+            "fecha_fin": fecha_fin.isoformat() if fecha_fin else None,
+            "cupos_totales": cupos_totales,
+            "ocupacion": round(salida.personas / cupos_totales, 4) if cupos_totales else None,
+        })
+
+    return jsonify(resultado)
+
+
+# ================== CACHÉ DEL CATÁLOGO =====================
+
+@admin_bp.get("/cache/estadisticas")
+@jwt_required()
+def admin_cache_estadisticas():
+    """Hits/misses y ocupación de la caché de respuestas públicas (de este worker)."""
+    _, error = _require_admin()
+    if error:
+        return error
+
+    return jsonify(cache_service.respuestas.estadisticas())
+
+
 # ================== TOURS =====================
 
 @admin_bp.get("/tours")
 @jwt_required()
 def admin_list_tours():
+    """
+    Listado de tours del admin.
+    ?view=detail (por defecto) | summary  -> summary: solo la fila de la grilla
+    ?fields=fechas,banners                 -> detalle con solo esos campos
+    ?page=1&per_page=50                    -> paginado en el servidor
+    Solo se cargan las relaciones pedidas, en lote para todos los tours de la página.
+    """
     _, error = _require_admin()
     if error:
         return error
 
-    tours = Tour.query.order_by(Tour.created_at.desc()).all()
-    return jsonify([t.to_detail_dict() for t in tours])
+    vista = request.args.get("view", "detail")
+    if vista not in ("summary", "detail"):
+        return jsonify({"message": "view debe ser 'summary' o 'detail'"}), 400
+
+    campos = None
+    if request.args.get("fields"):
+        campos = {c.strip() for c in request.args["fields"].split(",") if c.strip()}
+        desconocidos = campos - set(Tour.CAMPOS_DETALLE)
+        if desconocidos:
+            return jsonify({
+                "message": f"Campos no válidos: {', '.join(sorted(desconocidos))}",
+                "campos_validos": list(Tour.CAMPOS_DETALLE),
+            }), 400
+        vista = "detail"
+
+    if vista == "summary":
+        q = Tour.query.options(joinedload(Tour.categoria))
+        serializar = Tour.to_summary_dict
+    else:
+        q = Tour.query.options(*tour_detail_options(campos))
+        serializar = lambda t: {**t.to_summary_dict(), **t.to_detail_dict(campos)}
+
+    q = q.order_by(Tour.created_at.desc(), Tour.id.desc())
+
+    def con_cupos_al_dia(tours):
+        if vista == "detail" and (campos is None or "fechas" in campos):
+            cupos_service.al_dia([f for t in tours for f in t.fechas])
+        return tours
+
+    if "page" not in request.args:
+        return jsonify([serializar(t) for t in con_cupos_al_dia(q.all())])
+
+    q, paginacion = paginar(q, request.args)
+    tours = con_cupos_al_dia(q.all())
+    return jsonify({"items": [serializar(t) for t in tours], **paginacion})
 
 
 @admin_bp.post("/tours")
@@ -346,10 +552,11 @@ def admin_get_tour(tour_id):
     if error:
         return error
 
-    tour = Tour.query.get(tour_id)
+    tour = Tour.query.options(*tour_detail_options()).filter_by(id=tour_id).first()
     if not tour:
         return jsonify({"message": "Tour no encontrado"}), 404
 
+    cupos_service.al_dia(tour.fechas)
     return jsonify(tour.to_detail_dict())
 
 
@@ -483,7 +690,8 @@ def admin_delete_tour_permanente(tour_id):
         # 1. Eliminar comentarios del tour
         Comentario.query.filter_by(tour_id=tour_id).delete()
 
-        # 2. Eliminar reservas del tour
+        # 2. Eliminar reservas del tour (descontándolas de los reportes)
+        reportes_service.quitar_reservas(Reserva.query.filter_by(tour_id=tour_id))
         Reserva.query.filter_by(tour_id=tour_id).delete()
 
         # 3. Eliminar fechas del tour (las reservas ya fueron eliminadas)
@@ -596,13 +804,14 @@ def admin_update_fecha(fecha_id):
     if "cupos_totales" in data:
         fecha.cupos_totales = int(data["cupos_totales"])
     if "cupos_ocupados" in data:
-        fecha.cupos_ocupados = int(data["cupos_ocupados"])
+        cupos_service.ajustar(fecha, data["cupos_ocupados"])
     if "estado" in data:
         fecha.estado = data["estado"]
     if "notas" in data:
         fecha.notas = data["notas"]
 
     db.session.commit()
+    cupos_service.al_dia([fecha])
     return jsonify({"message": "Fecha actualizada", "fecha": fecha.to_dict()})
 
 
@@ -619,6 +828,7 @@ def admin_delete_fecha(fecha_id):
 
     try:
         # Eliminar reservas asociadas a esta fecha antes de borrarla
+        reportes_service.quitar_reservas(Reserva.query.filter_by(fecha_tour_id=fecha_id))
         Reserva.query.filter_by(fecha_tour_id=fecha_id).delete()
         db.session.delete(fecha)
         db.session.commit()
@@ -1164,116 +1374,274 @@ def admin_remove_guia_from_tour(tour_id, guia_id):
 # REEMPLAZA EN admin_routes.py - Endpoint de listar reservas
 # =====================================================
 
+# Columnas por las que se puede ordenar el listado de reservas
+ORDEN_RESERVAS = {
+    "created_at": Reserva.created_at,
+    "fecha_inicio": FechaTour.fecha_inicio,
+    "monto_total": Reserva.monto_total,
+}
+
+MAPEO_ESTADO_RESERVA = {
+    "pre_reserva": ReservaEstado.PRE_RESERVA,
+    "confirmada": ReservaEstado.CONFIRMADA,
+    "cancelada_cliente": ReservaEstado.CANCELADA_CLIENTE,
+    "cancelada_operador": ReservaEstado.CANCELADA_OPERADOR,
+}
+
+MAPEO_ESTADO_COMENTARIO = {
+    "pendiente": ComentarioEstado.PENDIENTE,
+    "aprobado": ComentarioEstado.APROBADO,
+    "rechazado": ComentarioEstado.RECHAZADO,
+}
+
+MAPEO_ESTADO_PAGO = {
+    "pendiente": PagoEstado.PENDIENTE,
+    "pagado": PagoEstado.PAGADO,
+    "reembolso_parcial": PagoEstado.REEMBOLSO_PARCIAL,
+    "reembolso_total": PagoEstado.REEMBOLSO_TOTAL,
+    "sin_reembolso": PagoEstado.SIN_REEMBOLSO,
+}
+
+
+def _consulta_reservas_admin(args):
+    """
+    Reservas con su cliente, tour y fecha en una sola consulta (LEFT JOIN,
+    solo las columnas que se muestran), con los filtros y el orden de la
+    query string. Devuelve (query, None) o (None, respuesta_de_error).
+
+    Filtros: estado_reserva, estado_pago, tour_id, usuario_id,
+             desde / hasta (YYYY-MM-DD, fecha de creación),
+             salida_desde / salida_hasta (fecha de inicio del tour),
+             busqueda (nombre, apellido o email del cliente)
+    Orden:   orden=created_at|fecha_inicio|monto_total  dir=asc|desc
+    """
+    q = (
+        db.session.query(
+            Reserva,
+            Bundle("usuario", Usuario.id, Usuario.nombre, Usuario.apellido, Usuario.email, Usuario.telefono),
+            Bundle("tour", Tour.id, Tour.nombre, Tour.slug, Tour.pais),
+            Bundle("fecha", FechaTour.fecha_inicio, FechaTour.fecha_fin),
+        )
+        .outerjoin(Usuario, Usuario.id == Reserva.usuario_id)
+        .outerjoin(Tour, Tour.id == Reserva.tour_id)
+        .outerjoin(FechaTour, FechaTour.id == Reserva.fecha_tour_id)
+    )
+
+    estado_reserva = MAPEO_ESTADO_RESERVA.get((args.get("estado_reserva") or "").strip().lower())
+    if estado_reserva:
+        q = q.filter(Reserva.estado_reserva == estado_reserva)
+
+    estado_pago = MAPEO_ESTADO_PAGO.get((args.get("estado_pago") or "").strip().lower())
+    if estado_pago:
+        q = q.filter(Reserva.estado_pago == estado_pago)
+
+    try:
+        if args.get("tour_id"):
+            q = q.filter(Reserva.tour_id == int(args["tour_id"]))
+        if args.get("usuario_id"):
+            q = q.filter(Reserva.usuario_id == int(args["usuario_id"]))
+
+        if args.get("desde"):
+            q = q.filter(Reserva.created_at >= date.fromisoformat(args["desde"]))
+        if args.get("hasta"):
+            q = q.filter(Reserva.created_at < date.fromisoformat(args["hasta"]) + timedelta(days=1))
+        if args.get("salida_desde"):
+            q = q.filter(FechaTour.fecha_inicio >= date.fromisoformat(args["salida_desde"]))
+        if args.get("salida_hasta"):
+            q = q.filter(FechaTour.fecha_inicio <= date.fromisoformat(args["salida_hasta"]))
+    except ValueError:
+        return None, (jsonify({"message": "Filtros inválidos: ids numéricos y fechas YYYY-MM-DD"}), 400)
+
+    busqueda = (args.get("busqueda") or "").strip()
+    if busqueda:
+        patron = f"%{busqueda}%"
+        q = q.filter(or_(
+            Usuario.nombre.ilike(patron),
+            Usuario.apellido.ilike(patron),
+            Usuario.email.ilike(patron),
+            (Usuario.nombre + " " + func.coalesce(Usuario.apellido, "")).ilike(patron),
+        ))
+
+    columna = ORDEN_RESERVAS.get(args.get("orden", "created_at"))
+    if columna is None:
+        return None, (jsonify({
+            "message": f"orden debe ser uno de: {', '.join(ORDEN_RESERVAS)}"
+        }), 400)
+
+    if args.get("dir", "desc").lower() == "asc":
+        q = q.order_by(columna.asc().nullslast(), Reserva.id.asc())
+    else:
+        q = q.order_by(columna.desc().nullslast(), Reserva.id.desc())
+
+    return q, None
+
+
+def _fila_reserva_admin(r, usuario, tour, fecha):
+    """Serializa una fila de _consulta_reservas_admin()."""
+    usuario = usuario if usuario.id is not None else None
+    tour = tour if tour.id is not None else None
+
+    return {
+        "id": r.id,
+        "usuario_id": r.usuario_id,
+        "tour_id": r.tour_id,
+        "fecha_tour_id": r.fecha_tour_id,
+        "numero_personas": r.numero_personas,
+        "estado_reserva": r.estado_reserva.value if hasattr(r.estado_reserva, 'value') else r.estado_reserva,
+        "estado_pago": r.estado_pago.value if hasattr(r.estado_pago, 'value') else r.estado_pago,
+        "monto_total": float(r.monto_total) if r.monto_total else 0,
+        "moneda": r.moneda or "USD",
+        "metodo_pago_externo": r.metodo_pago_externo,
+        "referencia_pago": r.referencia_pago,
+        "fecha_pago": r.fecha_pago.isoformat() if r.fecha_pago else None,
+        "comentarios_cliente": r.comentarios_cliente,
+        "created_at": r.created_at.isoformat() if r.created_at else None,
+
+        # ⭐ DATOS DEL CLIENTE
+        "usuario": {
+            "id": usuario.id,
+            "nombre": usuario.nombre,
+            "apellido": usuario.apellido,
+            "email": usuario.email,
+            "telefono": usuario.telefono,
+        } if usuario else None,
+
+        # Alias para compatibilidad
+        "cliente_nombre": usuario.nombre if usuario else None,
+        "cliente_email": usuario.email if usuario else None,
+        "cliente_telefono": usuario.telefono if usuario else None,
+
+        # ⭐ DATOS DEL TOUR
+        "tour": {
+            "id": tour.id,
+            "nombre": tour.nombre,
+            "slug": tour.slug,
+            "pais": tour.pais,
+        } if tour else None,
+
+        # Alias para compatibilidad
+        "tour_nombre": tour.nombre if tour else None,
+
+        # ⭐ DATOS DE LA FECHA
+        "fecha_inicio": fecha.fecha_inicio.isoformat() if fecha.fecha_inicio else None,
+        "fecha_fin": fecha.fecha_fin.isoformat() if fecha.fecha_fin else None,
+    }
+
+
 @admin_bp.get("/reservas")
 @jwt_required()
 def admin_list_reservas():
     """
-    Lista todas las reservas con datos completos del cliente y tour.
-    Soporta filtros: estado_reserva, estado_pago, tour_id, usuario_id
+    Lista las reservas con datos completos del cliente y tour, en una sola
+    consulta (ver _consulta_reservas_admin para filtros y orden).
+    ?page=1&per_page=50 -> respuesta paginada {items, total, page, per_page, pages}
+    Sin page devuelve la lista completa, como antes.
     """
     _, error = _require_admin()
     if error:
         return error
 
-    estado_reserva_str = request.args.get("estado_reserva")
-    estado_pago_str = request.args.get("estado_pago")
-    tour_id = request.args.get("tour_id")
-    usuario_id = request.args.get("usuario_id")
+    q, error = _consulta_reservas_admin(request.args)
+    if error:
+        return error
 
-    q = Reserva.query
+    if "page" not in request.args:
+        return jsonify([_fila_reserva_admin(*fila) for fila in q.all()])
 
-    if estado_reserva_str:
-        estado_reserva_str = estado_reserva_str.strip().lower()
-        mapping_reserva = {
-            "pre_reserva": ReservaEstado.PRE_RESERVA,
-            "confirmada": ReservaEstado.CONFIRMADA,
-            "cancelada_cliente": ReservaEstado.CANCELADA_CLIENTE,
-            "cancelada_operador": ReservaEstado.CANCELADA_OPERADOR,
-        }
-        estado_reserva_enum = mapping_reserva.get(estado_reserva_str)
-        if estado_reserva_enum:
-            q = q.filter_by(estado_reserva=estado_reserva_enum)
-
-    if estado_pago_str:
-        estado_pago_str = estado_pago_str.strip().lower()
-        mapping_pago = {
-            "pendiente": PagoEstado.PENDIENTE,
-            "pagado": PagoEstado.PAGADO,
-            "reembolso_parcial": PagoEstado.REEMBOLSO_PARCIAL,
-            "reembolso_total": PagoEstado.REEMBOLSO_TOTAL,
-            "sin_reembolso": PagoEstado.SIN_REEMBOLSO,
-        }
-        estado_pago_enum = mapping_pago.get(estado_pago_str)
-        if estado_pago_enum:
-            q = q.filter_by(estado_pago=estado_pago_enum)
+    q, paginacion = paginar(q, request.args)
+    return jsonify({"items": [_fila_reserva_admin(*fila) for fila in q.all()], **paginacion})
 
-    if tour_id:
-        q = q.filter_by(tour_id=int(tour_id))
-    if usuario_id:
-        q = q.filter_by(usuario_id=int(usuario_id))
+# Columnas del export contable: (encabezado, columna)
+COLUMNAS_EXPORT_RESERVAS = (
+    ("id", Reserva.id),
+    ("creada", Reserva.created_at),
+    ("estado_reserva", Reserva.estado_reserva),
+    ("estado_pago", Reserva.estado_pago),
+    ("cliente_nombre", Usuario.nombre),
+    ("cliente_apellido", Usuario.apellido),
+    ("cliente_email", Usuario.email),
+    ("cliente_telefono", Usuario.telefono),
+    ("tour", Tour.nombre),
+    ("fecha_inicio", FechaTour.fecha_inicio),
+    ("fecha_fin", FechaTour.fecha_fin),
+    ("numero_personas", Reserva.numero_personas),
+    ("monto_total", Reserva.monto_total),
+    ("moneda", Reserva.moneda),
+    ("metodo_pago", Reserva.metodo_pago_externo),
+    ("referencia_pago", Reserva.referencia_pago),
+    ("fecha_pago", Reserva.fecha_pago),
+)
 
-    reservas = q.order_by(Reserva.created_at.desc()).all()
 
-    # Construir respuesta con datos completos
-    resultado = []
-    for r in reservas:
-        # Obtener datos del usuario
-        usuario = Usuario.query.get(r.usuario_id)
-        # Obtener datos del tour
-        tour = Tour.query.get(r.tour_id)
-        # Obtener datos de la fecha
-        fecha = FechaTour.query.get(r.fecha_tour_id) if r.fecha_tour_id else None
+# Excel/LibreOffice evalúan como fórmula una celda que empieza con estos
+# caracteres (nombres, emails y comentarios los escribe el cliente)
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
 
-        resultado.append({
-            "id": r.id,
-            "usuario_id": r.usuario_id,
-            "tour_id": r.tour_id,
-            "fecha_tour_id": r.fecha_tour_id,
-            "numero_personas": r.numero_personas,
-            "estado_reserva": r.estado_reserva.value if hasattr(r.estado_reserva, 'value') else r.estado_reserva,
-            "estado_pago": r.estado_pago.value if hasattr(r.estado_pago, 'value') else r.estado_pago,
-            "monto_total": float(r.monto_total) if r.monto_total else 0,
-            "moneda": r.moneda or "USD",
-            "metodo_pago_externo": r.metodo_pago_externo,
-            "referencia_pago": r.referencia_pago,
-            "fecha_pago": r.fecha_pago.isoformat() if r.fecha_pago else None,
-            "comentarios_cliente": r.comentarios_cliente,
-            "created_at": r.created_at.isoformat() if r.created_at else None,
-            
-            # ⭐ DATOS DEL CLIENTE
-            "usuario": {
-                "id": usuario.id if usuario else None,
-                "nombre": usuario.nombre if usuario else None,
-                "apellido": getattr(usuario, 'apellido', None) if usuario else None,
-                "email": usuario.email if usuario else None,
-                "telefono": getattr(usuario, 'telefono', None) if usuario else None,
-            } if usuario else None,
-            
-            # Alias para compatibilidad
-            "cliente_nombre": usuario.nombre if usuario else None,
-            "cliente_email": usuario.email if usuario else None,
-            "cliente_telefono": getattr(usuario, 'telefono', None) if usuario else None,
-            
-            # ⭐ DATOS DEL TOUR
-            "tour": {
-                "id": tour.id if tour else None,
-                "nombre": tour.nombre if tour else None,
-                "slug": tour.slug if tour else None,
-                "pais": tour.pais if tour else None,
-            } if tour else None,
-            
-            # Alias para compatibilidad
-            "tour_nombre": tour.nombre if tour else None,
-            
-            # ⭐ DATOS DE LA FECHA
-            "fecha_inicio": fecha.fecha_inicio.isoformat() if fecha and fecha.fecha_inicio else None,
-            "fecha_fin": fecha.fecha_fin.isoformat() if fecha and fecha.fecha_fin else None,
-        })
 
-    return jsonify(resultado)
+def _celda_csv(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "value"):
+        return valor.value
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+@admin_bp.get("/reservas/export")
+@jwt_required()
+def admin_export_reservas():
+    """
+    Exporta las reservas a CSV (para contabilidad) con los mismos filtros y
+    orden que GET /admin/reservas. Las filas se leen con un cursor del lado
+    del servidor y se envían a medida que llegan: la memoria no crece con la
+    cantidad de reservas.
+    """
+    _, error = _require_admin()
+    if error:
+        return error
+
+    formato = request.args.get("formato", "csv").lower()
+    if formato != "csv":
+        return jsonify({"message": "Formato no soportado, usa formato=csv"}), 400
+
+    q, error = _consulta_reservas_admin(request.args)
+    if error:
+        return error
+
+    q = q.with_entities(*(columna for _, columna in COLUMNAS_EXPORT_RESERVAS)) \
+        .execution_options(yield_per=1000)
+
+    def generar():
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+
+        # BOM para que Excel abra el archivo como UTF-8
+        buffer.write("\ufeff")
+        escritor.writerow([encabezado for encabezado, _ in COLUMNAS_EXPORT_RESERVAS])
+
+        for i, fila in enumerate(q, start=1):
+            escritor.writerow([_celda_csv(valor) for valor in fila])
+            if i % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        yield buffer.getvalue()
+
+    nombre = f"reservas_{date.today().isoformat()}.csv"
+    return current_app.response_class(
+        stream_with_context(generar()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
+    )
+
 
 @admin_bp.post("/reservas")
 @jwt_required()
+@idempotente
 def admin_create_reserva():
     """
     Crea una reserva desde el panel de administración.
@@ -1310,9 +1678,6 @@ def admin_create_reserva():
     if not fecha:
         return jsonify({"message": "La fecha seleccionada no pertenece a este tour"}), 400
 
-    if fecha.cupos_ocupados + numero_personas > fecha.cupos_totales:
-        return jsonify({"message": "No hay cupos suficientes para esta fecha"}), 400
-
     estado_reserva_str = data.get("estado_reserva", "pre_reserva").strip().lower()
     mapping_reserva = {
         "pre_reserva": ReservaEstado.PRE_RESERVA,
@@ -1345,15 +1710,26 @@ def admin_create_reserva():
         comentarios_internos=data.get("comentarios_internos"),
     )
 
-    fecha.cupos_ocupados += numero_personas
+    # Ocupar los cupos en un solo UPDATE condicional (sin sobreventa); una
+    # reserva cargada ya cancelada no ocupa cupos
+    try:
+        reserva_service.mover_cupos(None, reserva_service.cupos_tomados(reserva))
+    except cupos_service.CuposInsuficientes:
+        db.session.rollback()
+        return jsonify({"message": "No hay cupos suficientes para esta fecha"}), 400
 
     db.session.add(reserva)
-    db.session.commit()
+    db.session.flush()
 
-    return jsonify({
+    # Con Idempotency-Key, la respuesta se confirma junto con la reserva
+    cuerpo = {
         "message": "Reserva creada correctamente",
         "reserva": reserva.to_dict_public(),
-    }), 201
+    }
+    idempotencia_service.anotar_respuesta(cuerpo, 201)
+    db.session.commit()
+
+    return jsonify(cuerpo), 201
 
 
 @admin_bp.get("/reservas/pre-reservas")
@@ -1382,9 +1758,22 @@ def confirmar_reserva(reserva_id):
     referencia = data.get("referencia_pago")
     fecha_pago = data.get("fecha_pago")
 
-    reserva = Reserva.query.get(reserva_id)
+    # Fila bloqueada: si el barrido de expiración la canceló antes, aquí se
+    # lee el estado ya cancelado y no se "resucita" sin cupos
+    reserva = reserva_service.bloquear(reserva_id)
     if not reserva:
+        db.session.rollback()
         return jsonify({"message": "Reserva no encontrada"}), 404
+    if reserva.estado_reserva == ReservaEstado.CONFIRMADA:
+        # Repetir la confirmación (doble clic, reintento) no es un error y
+        # no pisa los datos del pago ya registrados
+        cuerpo = {"message": "La reserva ya estaba confirmada", "reserva": reserva.to_dict_public()}
+        db.session.rollback()
+        return jsonify(cuerpo)
+    if reserva.estado_reserva != ReservaEstado.PRE_RESERVA:
+        estado = reserva.estado_reserva.value
+        db.session.rollback()
+        return jsonify({"message": f"Solo se puede confirmar una pre-reserva (estado actual: {estado})"}), 409
 
     reserva.estado_reserva = ReservaEstado.CONFIRMADA
     reserva.estado_pago = PagoEstado.PAGADO
@@ -1404,24 +1793,24 @@ def admin_list_comentarios():
     # OJO: esta versión ya no exige admin ni token.
     # Úsala solo para devolver lo que quieras mostrar en la web pública.
 
+    # Cola de moderación paginada por cursor: ?limit=50&cursor=<next_cursor>
+    # (orden: más recientes primero). Sin ?limit devuelve la lista completa.
     estado = request.args.get("estado")
-    q = Comentario.query
+    # Sin datos personales del autor: el endpoint es público
+    q = (
+        db.session.query(Comentario, Bundle("tour", Tour.nombre, Tour.slug))
+        .outerjoin(Tour, Tour.id == Comentario.tour_id)
+    )
 
     if estado:
-        estado_normalizado = estado.strip().lower()
-        mapping = {
-            "pendiente": ComentarioEstado.PENDIENTE,
-            "aprobado": ComentarioEstado.APROBADO,
-            "rechazado": ComentarioEstado.RECHAZADO,
-        }
-        estado_enum = mapping.get(estado_normalizado)
+        estado_enum = MAPEO_ESTADO_COMENTARIO.get(estado.strip().lower())
         if estado_enum:
-            q = q.filter_by(estado=estado_enum)
+            q = q.filter(Comentario.estado == estado_enum)
 
-    comentarios = q.order_by(Comentario.created_at.desc()).all()
+    q = q.order_by(Comentario.created_at.desc(), Comentario.id.desc())
 
-    return jsonify([
-        {
+    def serializar(c, tour):
+        return {
             "id": c.id,
             "tour_id": c.tour_id,
             "usuario_id": c.usuario_id,
@@ -1430,9 +1819,90 @@ def admin_list_comentarios():
             "estado": c.estado.value,
             "respuesta_admin": c.respuesta_admin,
             "created_at": c.created_at.isoformat(),
+            "tour_nombre": tour.nombre,
+            "tour_slug": tour.slug,
         }
-        for c in comentarios
-    ])
+
+    if "limit" not in request.args:
+        return jsonify([serializar(*fila) for fila in q.all()])
+
+    try:
+        limite = leer_limite(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        if cursor:
+            creado, ultimo_id = decodificar_cursor(cursor, fecha_hora, entero)
+            q = q.filter(or_(
+                Comentario.created_at < creado,
+                and_(Comentario.created_at == creado, Comentario.id < ultimo_id),
+            ))
+    except (ValueError, TypeError):
+        return jsonify({"message": "limit o cursor inválido"}), 400
+
+    filas = q.limit(limite + 1).all()
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    siguiente = None
+    if hay_mas:
+        ultimo = filas[-1][0]
+        siguiente = codificar_cursor([ultimo.created_at.isoformat(), ultimo.id])
+
+    return jsonify({
+        "items": [serializar(*fila) for fila in filas],
+        "limit": limite,
+        "next_cursor": siguiente,
+    })
+
+
+@admin_bp.post("/comentarios/lote")
+@jwt_required()
+def admin_comentarios_lote():
+    """
+    Modera varios comentarios con una sola sentencia.
+    Body: {"accion": "aprobar" | "rechazar" | "eliminar", "ids": [1, 2, 3],
+           "respuesta_admin": "..." (solo al rechazar, como PATCH .../rechazar)}
+    Los documentos públicos de los tours afectados se regeneran una vez por tour.
+    """
+    _, error = _require_admin()
+    if error:
+        return error
+
+    data = request.get_json() or {}
+    accion = data.get("accion")
+    try:
+        ids = sorted({int(i) for i in data.get("ids") or []})
+    except (TypeError, ValueError):
+        return jsonify({"message": "ids debe ser una lista de números"}), 400
+
+    if accion not in ("aprobar", "rechazar", "eliminar"):
+        return jsonify({"message": "accion debe ser aprobar, rechazar o eliminar"}), 400
+    if not ids:
+        return jsonify({"message": "No se enviaron ids"}), 400
+    if len(ids) > 1000:
+        return jsonify({"message": "Máximo 1000 comentarios por lote"}), 400
+
+    if accion == "eliminar":
+        stmt = delete(Comentario)
+    else:
+        valores = {"estado": ComentarioEstado.APROBADO if accion == "aprobar" else ComentarioEstado.RECHAZADO}
+        if accion == "rechazar":
+            valores["respuesta_admin"] = data.get("respuesta_admin")
+        stmt = update(Comentario).values(**valores)
+
+    stmt = stmt.where(Comentario.id.in_(ids)).returning(Comentario.id, Comentario.tour_id)
+    afectados = db.session.execute(stmt, execution_options={"synchronize_session": "fetch"}).all()
+
+    documento_service.marcar_tours({tour_id for _, tour_id in afectados})
+    db.session.commit()
+
+    procesados = {comentario_id for comentario_id, _ in afectados}
+    return jsonify({
+        "message": f"{len(procesados)} comentario(s) procesado(s)",
+        "accion": accion,
+        "procesados": sorted(procesados),
+        "no_encontrados": [i for i in ids if i not in procesados],
+    })
+
 
 @admin_bp.patch("/comentarios/<int:comentario_id>/aprobar")
 @jwt_required()
@@ -1633,11 +2103,15 @@ def admin_update_reserva(reserva_id):
     _, error = _require_admin()
     if error: return error
 
-    reserva = Reserva.query.get(reserva_id)
+    # Fila bloqueada hasta el commit: los cupos que ocupa no cambian por
+    # debajo (cancelación del cliente, barrido de expiración)
+    reserva = reserva_service.bloquear(reserva_id)
     if not reserva:
+        db.session.rollback()
         return jsonify({"message": "Reserva no encontrada"}), 404
 
     data = request.get_json() or {}
+    antes = reserva_service.cupos_tomados(reserva)
     
     # Actualizar campos permitidos
     if "numero_personas" in data:
@@ -1647,7 +2121,11 @@ def admin_update_reserva(reserva_id):
         reserva.monto_total = data["monto_total"]
     
     if "estado_reserva" in data:
-        reserva.estado_reserva = data["estado_reserva"]
+        estado = MAPEO_ESTADO_RESERVA.get(str(data["estado_reserva"]).strip().lower())
+        if estado is None:
+            db.session.rollback()
+            return jsonify({"message": "estado_reserva inválido"}), 400
+        reserva.estado_reserva = estado
     
     if "estado_pago" in data:
         reserva.estado_pago = data["estado_pago"]
@@ -1667,6 +2145,13 @@ def admin_update_reserva(reserva_id):
     if "fecha_tour_id" in data:
         reserva.fecha_tour_id = int(data["fecha_tour_id"])
 
+    # Cancelar devuelve los cupos, reactivar o cambiar personas/fecha los ocupa
+    try:
+        reserva_service.mover_cupos(antes, reserva_service.cupos_tomados(reserva))
+    except cupos_service.CuposInsuficientes as e:
+        db.session.rollback()
+        return jsonify({"message": f"No hay cupos suficientes. Disponibles: {e.disponibles}"}), 400
+
     db.session.commit()
     return jsonify({"message": "Reserva actualizada", "reserva": reserva.to_dict_public()})
 
@@ -1682,6 +2167,7 @@ def admin_list_usuarios_completo():
     """
     Lista todos los usuarios con estadísticas de reservas.
     Soporta filtros: rol, activo, busqueda
+    Paginación opcional: ?page=1&per_page=50 (agrega "paginacion" a la respuesta)
     """
     _, error = _require_admin()
     if error:
@@ -1715,31 +2201,47 @@ def admin_list_usuarios_completo():
             )
         )
 
-    usuarios = q.order_by(Usuario.created_at.desc()).all()
-
-    resultado = []
-    for u in usuarios:
-        # Contar reservas del usuario
-        total_reservas = Reserva.query.filter_by(usuario_id=u.id).count()
-        reservas_confirmadas = Reserva.query.filter_by(
-            usuario_id=u.id, 
-            estado_reserva=ReservaEstado.CONFIRMADA
-        ).count()
-        reservas_canceladas = Reserva.query.filter(
-            Reserva.usuario_id == u.id,
-            Reserva.estado_reserva.in_([ReservaEstado.CANCELADA_CLIENTE, ReservaEstado.CANCELADA_OPERADOR])
-        ).count()
-        
-        # Calcular monto total gastado
-        monto_total_gastado = db.session.query(func.sum(Reserva.monto_total)).filter(
-            Reserva.usuario_id == u.id,
-            Reserva.estado_pago == PagoEstado.PAGADO
-        ).scalar() or 0
+    q = q.order_by(Usuario.created_at.desc(), Usuario.id.desc())
+
+    paginacion = None
+    if "page" in request.args:
+        q, paginacion = paginar(q, request.args)
+
+    # Estadísticas de todos los usuarios de la página en un solo GROUP BY,
+    # restringido a los ids de la página y unido con LEFT JOIN
+    pagina = q.with_entities(Usuario.id).subquery()
+    cancelada = Reserva.estado_reserva.in_([ReservaEstado.CANCELADA_CLIENTE, ReservaEstado.CANCELADA_OPERADOR])
+    stats = (
+        db.session.query(
+            Reserva.usuario_id.label("usuario_id"),
+            func.count(Reserva.id).label("total_reservas"),
+            func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.CONFIRMADA).label("confirmadas"),
+            func.count(Reserva.id).filter(cancelada).label("canceladas"),
+            func.sum(Reserva.monto_total).filter(Reserva.estado_pago == PagoEstado.PAGADO).label("monto_pagado"),
+            func.max(Reserva.created_at).label("ultima_reserva"),
+        )
+        .filter(Reserva.usuario_id.in_(db.session.query(pagina.c.id)))
+        .group_by(Reserva.usuario_id)
+        .subquery()
+    )
 
-        # Última reserva
-        ultima_reserva = Reserva.query.filter_by(usuario_id=u.id)\
-            .order_by(Reserva.created_at.desc()).first()
+    filas = (
+        db.session.query(
+            Usuario,
+            func.coalesce(stats.c.total_reservas, 0),
+            func.coalesce(stats.c.confirmadas, 0),
+            func.coalesce(stats.c.canceladas, 0),
+            func.coalesce(stats.c.monto_pagado, 0),
+            stats.c.ultima_reserva,
+        )
+        .join(pagina, pagina.c.id == Usuario.id)
+        .outerjoin(stats, stats.c.usuario_id == Usuario.id)
+        .order_by(Usuario.created_at.desc(), Usuario.id.desc())
+        .all()
+    )
 
+    resultado = []
+    for u, total_reservas, confirmadas, canceladas, monto_pagado, ultima_reserva in filas:
         resultado.append({
             "id": u.id,
             "nombre": u.nombre,
@@ -1750,30 +2252,37 @@ def admin_list_usuarios_completo():
             "rol": u.rol,
             "activo": u.activo,
             "created_at": u.created_at.isoformat() if u.created_at else None,
-            
+
             # ⭐ ESTADÍSTICAS
             "stats": {
                 "total_reservas": total_reservas,
-                "reservas_confirmadas": reservas_confirmadas,
-                "reservas_canceladas": reservas_canceladas,
-                "monto_total_gastado": float(monto_total_gastado),
-                "ultima_reserva": ultima_reserva.created_at.isoformat() if ultima_reserva else None,
+                "reservas_confirmadas": confirmadas,
+                "reservas_canceladas": canceladas,
+                "monto_total_gastado": float(monto_pagado),
+                "ultima_reserva": ultima_reserva.isoformat() if ultima_reserva else None,
             }
         })
 
-    # Stats generales
-    stats_generales = {
-        "total_usuarios": Usuario.query.count(),
-        "total_clientes": Usuario.query.filter_by(rol="cliente").count(),
-        "total_admins": Usuario.query.filter(Usuario.rol.in_(["admin", "super_admin"])).count(),
-        "usuarios_activos": Usuario.query.filter_by(activo=True).count(),
-        "usuarios_inactivos": Usuario.query.filter_by(activo=False).count(),
-    }
-
-    return jsonify({
+    # Stats generales (una sola consulta)
+    generales = db.session.query(
+        func.count(Usuario.id),
+        func.count(Usuario.id).filter(Usuario.rol == "cliente"),
+        func.count(Usuario.id).filter(Usuario.rol.in_(["admin", "super_admin"])),
+        func.count(Usuario.id).filter(Usuario.activo == True),
+        func.count(Usuario.id).filter(Usuario.activo == False),
+    ).one()
+    stats_generales = dict(zip(
+        ("total_usuarios", "total_clientes", "total_admins", "usuarios_activos", "usuarios_inactivos"),
+        generales,
+    ))
+
+    respuesta = {
         "usuarios": resultado,
         "stats": stats_generales
-    })
+    }
+    if paginacion:
+        respuesta["paginacion"] = paginacion
+    return jsonify(respuesta)
 
 
 @admin_bp.get("/usuarios/<int:usuario_id>/detalle")
@@ -1794,10 +2303,18 @@ def admin_get_usuario_detalle(usuario_id):
     reservas = Reserva.query.filter_by(usuario_id=usuario.id)\
         .order_by(Reserva.created_at.desc()).all()
 
+    # Obtener comentarios del usuario
+    comentarios = Comentario.query.filter_by(usuario_id=usuario.id)\
+        .order_by(Comentario.created_at.desc()).all()
+
+    # Tours y fechas de todo el historial: una consulta IN por modelo
+    tours = cargador(Tour).pedir([r.tour_id for r in reservas] + [c.tour_id for c in comentarios])
+    fechas = cargador(FechaTour).pedir(r.fecha_tour_id for r in reservas)
+
     historial_reservas = []
     for r in reservas:
-        tour = Tour.query.get(r.tour_id)
-        fecha = FechaTour.query.get(r.fecha_tour_id) if r.fecha_tour_id else None
+        tour = tours.obtener(r.tour_id)
+        fecha = fechas.obtener(r.fecha_tour_id)
         
         historial_reservas.append({
             "id": r.id,
@@ -1813,13 +2330,9 @@ def admin_get_usuario_detalle(usuario_id):
             "created_at": r.created_at.isoformat() if r.created_at else None,
         })
 
-    # Obtener comentarios del usuario
-    comentarios = Comentario.query.filter_by(usuario_id=usuario.id)\
-        .order_by(Comentario.created_at.desc()).all()
-
     historial_comentarios = []
     for c in comentarios:
-        tour = Tour.query.get(c.tour_id)
+        tour = tours.obtener(c.tour_id)
         historial_comentarios.append({
             "id": c.id,
             "tour_id": c.tour_id,
@@ -2317,29 +2830,66 @@ def admin_set_banner_principal(banner_id):
     })
 
 
-@admin_bp.post("/banners/reorder")
+# ================== REORDENAMIENTO =====================
+
+def _reordenar(entidad, parcial=False):
+    """
+    Aplica el orden del body en una sola sentencia y hace commit.
+    Body: { "orden": [id1, id2, ...], "tour_id": 5 }  (el grupo es opcional:
+    tour_id, o seccion para portadas). El orden debe incluir todas las filas
+    del grupo; si no, 400. Con parcial (rutas antiguas) basta una parte y el
+    resto conserva su orden relativo detrás.
+    """
+    data = request.get_json() or {}
+    config = reorden_service.ENTIDADES.get(entidad)
+    if config is None:
+        return jsonify({"message": "Entidad no reordenable"}), 404
+
+    try:
+        ids = reorden_service.leer_ids(data.get("orden"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    grupo = data.get(config.grupo) if config.grupo else None
+    try:
+        actualizados = reorden_service.reordenar(entidad, ids, grupo, parcial=parcial)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    db.session.commit()
+
+    return jsonify({
+        "message": "Orden actualizado",
+        "actualizados": len(actualizados),
+    })
+
+
+@admin_bp.post("/reorder/<string:entidad>")
 @jwt_required()
-def admin_reorder_banners():
+def admin_reorder(entidad):
     """
-    Reordena los banners de un tour.
-    Body: { "orden": [id1, id2, id3, ...] }
+    Reordena cualquier entidad ordenable: banners, ubicaciones, galeria,
+    itinerarios, secciones, incluye, portadas o categorias.
+    Body: { "orden": [id1, id2, id3, ...], "tour_id": 5 (opcional) }
     """
     _, error = _require_admin()
     if error:
         return error
 
-    data = request.get_json() or {}
-    orden_ids = data.get("orden", [])
+    return _reordenar(entidad)
 
-    if not orden_ids:
-        return jsonify({"message": "Debe proporcionar lista de IDs"}), 400
 
-    for idx, banner_id in enumerate(orden_ids):
-        TourBanner.query.filter_by(id=banner_id).update({"orden": idx})
-
-    db.session.commit()
+@admin_bp.post("/banners/reorder")
+@jwt_required()
+def admin_reorder_banners():
+    """
+    Reordena los banners de un tour (desde 0).
+    Body: { "orden": [id1, id2, id3, ...] }; puede ser solo una parte.
+    """
+    _, error = _require_admin()
+    if error:
+        return error
 
-    return jsonify({"message": "Orden actualizado"})
+    return _reordenar("banners", parcial=True)
 
 
 # ================== UBICACIONES DEL TOUR (PARA MAPAS) =====================
@@ -2504,61 +3054,92 @@ def admin_create_ubicaciones_batch(tour_id):
     if not ubicaciones_data:
         return jsonify({"message": "Debe proporcionar al menos una ubicacion"}), 400
 
-    creadas = []
-    for ub_data in ubicaciones_data:
-        if not ub_data.get("nombre"):
-            continue
-
-        ubicacion = TourUbicacion(
-            tour_id=tour.id,
-            nombre=ub_data["nombre"],
-            pais=ub_data.get("pais") or tour.pais,
-            provincia=ub_data.get("provincia"),
-            ciudad=ub_data.get("ciudad"),
-            descripcion=ub_data.get("descripcion"),
-            latitud=ub_data.get("latitud"),
-            longitud=ub_data.get("longitud"),
-            orden=ub_data.get("orden", 1),
-            dia_inicio=ub_data.get("dia_inicio"),
-            dia_fin=ub_data.get("dia_fin"),
-            tipo_ubicacion=ub_data.get("tipo_ubicacion", "destino"),
-            imagen_url=ub_data.get("imagen_url"),
-            activo=True,
-        )
-        db.session.add(ubicacion)
-        creadas.append(ubicacion)
+    valores, errores = ubicaciones_service.validar(
+        ubicaciones_data, tour, ubicaciones_service.siguiente_orden(tour.id)
+    )
+    if errores:
+        return jsonify({"message": "Hay ubicaciones inválidas", "errores": errores[:50]}), 400
 
+    # Serializar antes del commit: después las instancias quedan expiradas
+    creadas = [u.to_dict() for u in ubicaciones_service.insertar(tour.id, valores)]
     db.session.commit()
 
     return jsonify({
         "message": f"{len(creadas)} ubicaciones creadas",
-        "ubicaciones": [u.to_dict() for u in creadas]
+        "ubicaciones": creadas
     }), 201
 
 
-@admin_bp.post("/ubicaciones/reorder")
+@admin_bp.post("/tours/<int:tour_id>/ubicaciones/import")
 @jwt_required()
-def admin_reorder_ubicaciones():
+def admin_import_ubicaciones(tour_id):
     """
-    Reordena las ubicaciones de un tour.
-    Body: { "orden": [id1, id2, id3, ...] }
+    Importa las ubicaciones de un tour desde un archivo (campo "file").
+    - .csv: encabezados nombre, latitud, longitud, orden, dia_inicio, dia_fin,
+      pais, provincia, ciudad, descripcion, tipo_ubicacion, imagen_url
+    - .geojson / .json: FeatureCollection de puntos con esos campos en properties
+    ?reemplazar=1 borra antes las ubicaciones actuales del tour.
+    Si alguna fila es inválida no se importa nada.
     """
     _, error = _require_admin()
     if error:
         return error
 
-    data = request.get_json() or {}
-    orden_ids = data.get("orden", [])
+    tour = Tour.query.get(tour_id)
+    if not tour:
+        return jsonify({"message": "Tour no encontrado"}), 404
 
-    if not orden_ids:
-        return jsonify({"message": "Debe proporcionar lista de IDs"}), 400
+    if "file" not in request.files:
+        return jsonify({"message": "No se envió ningún archivo"}), 400
 
-    for idx, ubicacion_id in enumerate(orden_ids):
-        TourUbicacion.query.filter_by(id=ubicacion_id).update({"orden": idx + 1})
+    file = request.files["file"]
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    formato = (request.args.get("formato") or extension.lstrip(".")).lower()
 
+    try:
+        texto = file.read().decode("utf-8-sig")
+        if formato == "csv":
+            filas = ubicaciones_service.leer_csv(texto)
+        elif formato in ("geojson", "json"):
+            filas = ubicaciones_service.leer_geojson(texto)
+        else:
+            return jsonify({"message": "Formato no soportado (csv o geojson)"}), 400
+    except UnicodeDecodeError:
+        return jsonify({"message": "El archivo debe estar en UTF-8"}), 400
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    reemplazar = request.args.get("reemplazar") in ("1", "true")
+    orden_inicial = 1 if reemplazar else ubicaciones_service.siguiente_orden(tour.id)
+
+    valores, errores = ubicaciones_service.validar(filas, tour, orden_inicial)
+    if errores:
+        return jsonify({"message": "Hay ubicaciones inválidas", "errores": errores[:50]}), 400
+
+    if reemplazar:
+        TourUbicacion.query.filter_by(tour_id=tour.id).delete()
+    # Serializar antes del commit: después las instancias quedan expiradas
+    creadas = [u.to_dict() for u in ubicaciones_service.insertar(tour.id, valores)]
     db.session.commit()
 
-    return jsonify({"message": "Orden actualizado"})
+    return jsonify({
+        "message": f"{len(creadas)} ubicaciones importadas",
+        "ubicaciones": creadas
+    }), 201
+
+
+@admin_bp.post("/ubicaciones/reorder")
+@jwt_required()
+def admin_reorder_ubicaciones():
+    """
+    Reordena las ubicaciones de un tour (desde 1).
+    Body: { "orden": [id1, id2, id3, ...] }; puede ser solo una parte.
+    """
+    _, error = _require_admin()
+    if error:
+        return error
+
+    return _reordenar("ubicaciones", parcial=True)
 
 
 # ================== GALERIA - Actualizar descripcion =====================
@@ -2607,8 +3188,9 @@ def admin_delete_reserva_permanente(reserva_id):
     if error:
         return error
 
-    reserva = Reserva.query.get(reserva_id)
+    reserva = reserva_service.bloquear(reserva_id)
     if not reserva:
+        db.session.rollback()
         return jsonify({"message": "Reserva no encontrada"}), 404
 
     try:
@@ -2618,6 +3200,8 @@ def admin_delete_reserva_permanente(reserva_id):
             "usuario": reserva.usuario.email if reserva.usuario else "N/A"
         }
 
+        # Una reserva activa devuelve sus cupos al borrarse
+        reserva_service.mover_cupos(reserva_service.cupos_tomados(reserva), None)
         db.session.delete(reserva)
         db.session.commit()
 
@@ -2660,7 +3244,8 @@ def admin_delete_usuario_permanente(usuario_id):
     try:
         nombre_usuario = f"{usuario.nombre} ({usuario.email})"
 
-        # 1. Eliminar reservas del usuario
+        # 1. Eliminar reservas del usuario (descontándolas de los reportes)
+        reportes_service.quitar_reservas(Reserva.query.filter_by(usuario_id=usuario_id))
         Reserva.query.filter_by(usuario_id=usuario_id).delete()
 
         # 2. Eliminar comentarios del usuario
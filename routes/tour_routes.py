@@ -1,10 +1,16 @@
 # routes/tour_routes.py
-from datetime import datetime
 from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, or_, distinct, func
 
+import busqueda_service
+import cupos_service
+import documento_service
+import reserva_service
+from cache_service import cachear, estadisticas_usuarios, respuesta_no_modificada
 from extensions import db
-from email_service import enviar_email, ADMIN_EMAIL
+from idempotencia_service import idempotente
+from paginacion import codificar_cursor, decodificar_cursor, entero, leer_limite, opcional
 from models import (
     Tour,
     Comentario,
@@ -12,13 +18,12 @@ from models import (
     Usuario,
     ComentarioEstado,
     Reserva,
-    FechaTour,
     ReservaEstado,
-    PagoEstado,
     Guia,
     TourUbicacion,
     Categoria,
-    PortadaHome
+    PortadaHome,
+    tour_card_options,
 )
 
 tour_bp = Blueprint("tours", __name__, url_prefix="/tours")
@@ -27,6 +32,7 @@ tour_bp = Blueprint("tours", __name__, url_prefix="/tours")
 # ================== PORTADAS (PÚBLICO) =====================
 
 @tour_bp.get("/portadas")
+@cachear(PortadaHome)
 def list_portadas():
     """
     Lista portadas activas. Filtrar por sección: ?seccion=home
@@ -43,34 +49,41 @@ def list_portadas():
 # ================== CATEGORÍAS (PÚBLICO) =====================
 
 @tour_bp.get("/categorias")
+@cachear(Categoria, Tour)
 def list_categorias():
     """
     Lista todas las categorías activas con sus tours.
-    Ideal para el menú de navegación/header.
+    Ideal para el menú de navegación/header: una sola consulta (ver
+    Categoria.menu) y cero mientras la respuesta siga en caché.
     """
-    categorias = Categoria.query.filter_by(activo=True).order_by(Categoria.orden).all()
-    return jsonify([c.to_dict_with_tours() for c in categorias])
+    return jsonify(Categoria.menu())
 
 
 @tour_bp.get("/categorias/<slug>")
+@cachear(Categoria, Tour)
 def get_categoria(slug):
     """
     Detalle de una categoría con todos sus tours activos.
     """
-    categoria = Categoria.query.filter_by(slug=slug, activo=True).first()
-    if not categoria:
+    categorias = Categoria.menu(slug=slug)
+    if not categorias:
         return jsonify({"message": "Categoría no encontrada"}), 404
 
-    return jsonify(categoria.to_dict_with_tours())
+    return jsonify(categorias[0])
 
 
 # ================== TOURS (PÚBLICO) =====================
 
 @tour_bp.get("")
+@cachear(Tour, Categoria)
 def list_tours():
     """
     Listado de tours para la página de catálogo.
     Filtros opcionales: ?pais=ecuador&categoria=galapagos
+
+    Paginación opcional por cursor: ?limit=12&cursor=<next_cursor anterior>
+    Orden estable: orden_destacado (nulos al final), id.
+    Sin ?limit responde la lista completa, como siempre.
     """
     pais = request.args.get("pais")
     categoria_slug = request.args.get("categoria")
@@ -85,8 +98,57 @@ def list_tours():
         if categoria:
             q = q.filter(Tour.categoria_id == categoria.id)
 
-    tours = q.order_by(Tour.orden_destacado.nullslast()).all()
-    return jsonify([t.to_card_dict() for t in tours])
+    orden = (Tour.orden_destacado.asc().nullslast(), Tour.id.asc())
+
+    if "limit" not in request.args:
+        tours = q.options(*tour_card_options()).order_by(*orden).all()
+        return jsonify([t.to_card_dict() for t in tours])
+
+    try:
+        limite = leer_limite(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        despues_de = decodificar_cursor(cursor, opcional(entero), entero) if cursor else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    total = q.order_by(None).count()
+
+    if despues_de:
+        orden_destacado, ultimo_id = despues_de
+        if orden_destacado is None:
+            q = q.filter(Tour.orden_destacado.is_(None), Tour.id > ultimo_id)
+        else:
+            q = q.filter(or_(
+                Tour.orden_destacado > orden_destacado,
+                and_(Tour.orden_destacado == orden_destacado, Tour.id > ultimo_id),
+                Tour.orden_destacado.is_(None),
+            ))
+
+    # Se pide una fila extra para saber si hay página siguiente
+    tours = q.options(*tour_card_options()).order_by(*orden).limit(limite + 1).all()
+    hay_mas = len(tours) > limite
+    tours = tours[:limite]
+
+    return jsonify({
+        "items": [t.to_card_dict() for t in tours],
+        "total": total,
+        "limit": limite,
+        "next_cursor": codificar_cursor([tours[-1].orden_destacado, tours[-1].id]) if hay_mas else None,
+    })
+
+
+@tour_bp.get("/buscar")
+def buscar_tours():
+    """
+    Búsqueda facetada sobre el índice en memoria (ver busqueda_service).
+    Filtros: ?pais= &categoria= &nivel= &duracion= &precio= &mes=YYYY-MM
+    Cada filtro acepta varios valores separados por coma.
+    Responde los tours, el total y el conteo por faceta.
+    """
+    indice = busqueda_service.obtener_indice(
+        current_app.config.get("INDICE_CATALOGO_REVISION", 30)
+    )
+    return jsonify(indice.buscar(busqueda_service.leer_filtros(request.args)))
 
 
 @tour_bp.get("/<slug>")
@@ -94,28 +156,33 @@ def get_tour(slug):
     """
     Detalle de un tour + comentarios aprobados.
     URL: /tours/<slug>
+
+    Se sirve el documento precalculado (ver documento_service): una lectura
+    por slug (único) y sus bytes tal cual, con los cupos ocupados de sus
+    salidas insertados en las marcas. Con If-None-Match vigente responde 304
+    sin leer el documento.
     """
-    tour = Tour.query.filter_by(slug=slug, activo=True).first()
-    if not tour:
+    if request.if_none_match:
+        vigente = documento_service.obtener_etag(slug)
+        if vigente and vigente.etag:
+            ocupados = cupos_service.ocupados_del_tour(vigente.tour_id)
+            etag = documento_service.etag_con_cupos(vigente.etag, ocupados)
+            if request.if_none_match.contains(etag):
+                return respuesta_no_modificada(etag)
+
+    fila = documento_service.obtener_documento(slug)
+    if fila is None:
         return jsonify({"message": "Tour no encontrado"}), 404
 
-    comentarios = (
-        Comentario.query
-        .filter(
-            Comentario.tour_id == tour.id,
-            Comentario.estado == ComentarioEstado.APROBADO,
-        )
-        .order_by(Comentario.created_at.desc())
-        .all()
+    documento, etag, tour_id = fila
+    ocupados = cupos_service.ocupados_del_tour(tour_id)
+    respuesta = current_app.response_class(
+        documento_service.con_cupos(documento, ocupados), mimetype="application/json"
     )
-
-    return jsonify(
-        {
-            "tour": tour.to_detail_dict(),
-            "comentarios": [c.to_public_dict() for c in comentarios],
-        }
-    )
-
+    if etag:
+        respuesta.set_etag(documento_service.etag_con_cupos(etag, ocupados))
+        respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta
 
 
 # ================== COMENTARIOS (CLIENTE) =====================
@@ -172,97 +239,18 @@ def crear_comentario(tour_id):
 
 @tour_bp.post("/<int:tour_id>/reservas")
 @jwt_required()
+@idempotente
 def crear_reserva_pre_reserva(tour_id):
     """
-    Crea una PRE-RESERVA para un tour.
+    Crea una PRE-RESERVA para un tour (ver reserva_service).
     Envía correo de confirmación al cliente y notificación al admin.
     URL: POST /tours/<tour_id>/reservas
     """
-    user_id = get_jwt_identity()
-    usuario = Usuario.query.get(user_id)
-
-    if not usuario:
-        return jsonify({"message": "Usuario no encontrado"}), 404
-
-    tour = Tour.query.get(tour_id)
-    if not tour or not tour.activo:
-        return jsonify({"message": "Tour no encontrado o inactivo"}), 404
-
-    data = request.get_json() or {}
-    required = ["fecha_tour_id", "numero_personas"]
-    if not all(field in data for field in required):
-        return jsonify({"message": "Faltan campos obligatorios"}), 400
-
     try:
-        fecha_tour_id = int(data["fecha_tour_id"])
-        numero_personas = int(data["numero_personas"])
-    except (ValueError, TypeError):
-        return jsonify({"message": "fecha_tour_id y numero_personas deben ser enteros"}), 400
-
-    if numero_personas < 1:
-        return jsonify({"message": "numero_personas debe ser al menos 1"}), 400
-
-    fecha = FechaTour.query.filter_by(id=fecha_tour_id, tour_id=tour.id).first()
-    if not fecha:
-        return jsonify({"message": "La fecha seleccionada no pertenece a este tour"}), 400
-
-    cupos_disponibles = fecha.cupos_totales - (fecha.cupos_ocupados or 0)
-    if numero_personas > cupos_disponibles:
-        return jsonify({"message": f"No hay cupos suficientes. Disponibles: {cupos_disponibles}"}), 400
-
-    # Calcular monto
-    precio_pp = float(tour.precio_pp) if tour.precio_pp else 0
-    monto_total = data.get("monto_total") or (precio_pp * numero_personas)
-
-    # Obtener datos de contacto (del formulario mejorado)
-    datos_contacto = data.get("datos_contacto", {})
-    email_destino = datos_contacto.get("email") or usuario.email
-    nombre_contacto = datos_contacto.get("nombre") or usuario.nombre
-    telefono_contacto = datos_contacto.get("telefono") or getattr(usuario, 'telefono', None)
-
-    # Crear reserva
-    reserva = Reserva(
-        usuario_id=usuario.id,
-        tour_id=tour.id,
-        fecha_tour_id=fecha.id,
-        numero_personas=numero_personas,
-        estado_reserva=ReservaEstado.PRE_RESERVA,
-        estado_pago=PagoEstado.PENDIENTE,
-        monto_total=monto_total,
-        moneda=tour.moneda or "USD",
-        comentarios_cliente=data.get("comentarios_cliente"),
-    )
-
-    fecha.cupos_ocupados = (fecha.cupos_ocupados or 0) + numero_personas
-
-    db.session.add(reserva)
-    db.session.commit()
-
-    # ==================== ENVIAR CORREOS ====================
-    correo_enviado = False
-    try:
-        enviar_correo_cliente(reserva, usuario, tour, fecha, email_destino, nombre_contacto)
-        enviar_correo_admin(reserva, usuario, tour, fecha, telefono_contacto)
-        correo_enviado = True
-        print(f"✅ Correos enviados para reserva #{reserva.id}")
-    except Exception as e:
-        current_app.logger.error(f"❌ Error enviando correo: {str(e)}")
-        print(f"❌ Error enviando correo: {str(e)}")
-
-    return jsonify({
-        "message": "Pre-reserva creada exitosamente." + (" Te hemos enviado un correo de confirmación." if correo_enviado else " (No se pudo enviar el correo)"),
-        "reserva": {
-            "id": reserva.id,
-            "tour_nombre": tour.nombre,
-            "fecha_inicio": fecha.fecha_inicio.isoformat() if fecha.fecha_inicio else None,
-            "fecha_fin": fecha.fecha_fin.isoformat() if fecha.fecha_fin else None,
-            "numero_personas": reserva.numero_personas,
-            "monto_total": float(reserva.monto_total) if reserva.monto_total else 0,
-            "moneda": reserva.moneda,
-            "estado_reserva": reserva.estado_reserva.value,
-            "estado_pago": reserva.estado_pago.value,
-        }
-    }), 201
+        cuerpo = reserva_service.crear_pre_reserva(get_jwt_identity(), tour_id, request.get_json() or {})
+    except reserva_service.ErrorReserva as e:
+        return jsonify({"message": e.mensaje}), e.estado
+    return jsonify(cuerpo), 201
 
 
 @tour_bp.get("/mis-reservas")
@@ -272,20 +260,7 @@ def listar_mis_reservas():
     Lista todas las reservas del usuario logueado.
     URL: GET /tours/mis-reservas
     """
-    user_id = get_jwt_identity()
-    usuario = Usuario.query.get(user_id)
-
-    if not usuario:
-        return jsonify({"message": "Usuario no encontrado"}), 404
-
-    reservas = (
-        Reserva.query
-        .filter_by(usuario_id=usuario.id)
-        .order_by(Reserva.created_at.desc())
-        .all()
-    )
-
-    return jsonify([r.to_dict_public() for r in reservas])
+    return jsonify(reserva_service.listar_del_usuario(get_jwt_identity()))
 
 
 @tour_bp.get("/mi-perfil/estadisticas")
@@ -297,55 +272,48 @@ def mis_estadisticas():
     - Total de comentarios y desglose por estado
     - Tours visitados/reservados
     - Gasto total
+    Se calcula con dos consultas agregadas y queda en caché por usuario
+    hasta que cambien sus reservas, sus comentarios o sus datos.
     """
-    user_id = get_jwt_identity()
-    usuario = Usuario.query.get(user_id)
-
-    if not usuario:
-        return jsonify({"message": "Usuario no encontrado"}), 404
-
-    # Reservas del usuario
-    reservas = Reserva.query.filter_by(usuario_id=usuario.id).all()
-
-    # Conteo por estado de reserva
-    reservas_por_estado = {
-        "pre_reserva": 0,
-        "confirmada": 0,
-        "cancelada_cliente": 0,
-        "cancelada_operador": 0
-    }
-
-    gasto_total = 0
-    tours_ids = set()
-
-    for r in reservas:
-        estado = r.estado_reserva.value if hasattr(r.estado_reserva, 'value') else str(r.estado_reserva)
-        if estado in reservas_por_estado:
-            reservas_por_estado[estado] += 1
-        tours_ids.add(r.tour_id)
-        if r.monto_total and estado == "confirmada":
-            gasto_total += float(r.monto_total)
-
-    # Comentarios del usuario
-    comentarios = Comentario.query.filter_by(usuario_id=usuario.id).all()
-
-    comentarios_por_estado = {
-        "pendiente": 0,
-        "aprobado": 0,
-        "rechazado": 0
-    }
-
-    calificaciones = []
-    for c in comentarios:
-        estado = c.estado.value if hasattr(c.estado, 'value') else str(c.estado)
-        if estado in comentarios_por_estado:
-            comentarios_por_estado[estado] += 1
-        if c.calificacion:
-            calificaciones.append(c.calificacion)
-
-    promedio_calificacion = sum(calificaciones) / len(calificaciones) if calificaciones else 0
-
-    return jsonify({
+    user_id = int(get_jwt_identity())
+
+    estadisticas = estadisticas_usuarios.obtener(user_id)
+    if estadisticas is None:
+        usuario = Usuario.query.get(user_id)
+        if not usuario:
+            return jsonify({"message": "Usuario no encontrado"}), 404
+
+        estadisticas = _calcular_estadisticas_usuario(usuario)
+        estadisticas_usuarios.guardar(user_id, estadisticas)
+
+    return jsonify(estadisticas)
+
+
+def _calcular_estadisticas_usuario(usuario):
+    confirmada = Reserva.estado_reserva == ReservaEstado.CONFIRMADA
+    reservas = db.session.query(
+        func.count(Reserva.id),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.PRE_RESERVA),
+        func.count(Reserva.id).filter(confirmada),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.CANCELADA_CLIENTE),
+        func.count(Reserva.id).filter(Reserva.estado_reserva == ReservaEstado.CANCELADA_OPERADOR),
+        func.count(distinct(Reserva.tour_id)),
+        func.sum(Reserva.monto_total).filter(confirmada),
+    ).filter(Reserva.usuario_id == usuario.id).one()
+
+    comentarios = db.session.query(
+        func.count(Comentario.id),
+        func.count(Comentario.id).filter(Comentario.estado == ComentarioEstado.PENDIENTE),
+        func.count(Comentario.id).filter(Comentario.estado == ComentarioEstado.APROBADO),
+        func.count(Comentario.id).filter(Comentario.estado == ComentarioEstado.RECHAZADO),
+        func.avg(Comentario.calificacion).filter(Comentario.calificacion != 0),
+    ).filter(Comentario.usuario_id == usuario.id).one()
+
+    (total_reservas, pre_reserva, confirmadas, cancelada_cliente,
+     cancelada_operador, tours_diferentes, gasto_total) = reservas
+    (total_comentarios, pendientes, aprobados, rechazados, promedio_calificacion) = comentarios
+
+    return {
         "usuario": {
             "id": usuario.id,
             "nombre": usuario.nombre,
@@ -353,258 +321,32 @@ def mis_estadisticas():
             "miembro_desde": usuario.created_at.isoformat() if usuario.created_at else None
         },
         "reservas": {
-            "total": len(reservas),
-            "por_estado": reservas_por_estado,
-            "tours_diferentes": len(tours_ids),
-            "gasto_total": round(gasto_total, 2)
+            "total": total_reservas,
+            "por_estado": {
+                "pre_reserva": pre_reserva,
+                "confirmada": confirmadas,
+                "cancelada_cliente": cancelada_cliente,
+                "cancelada_operador": cancelada_operador,
+            },
+            "tours_diferentes": tours_diferentes,
+            "gasto_total": round(float(gasto_total or 0), 2)
         },
         "comentarios": {
-            "total": len(comentarios),
-            "por_estado": comentarios_por_estado,
-            "promedio_calificacion": round(promedio_calificacion, 1)
+            "total": total_comentarios,
+            "por_estado": {
+                "pendiente": pendientes,
+                "aprobado": aprobados,
+                "rechazado": rechazados,
+            },
+            "promedio_calificacion": round(float(promedio_calificacion or 0), 1)
         }
-    })
-
-
-# =====================================================
-# FUNCIONES DE ENVÍO DE CORREO
-# =====================================================
-
-def enviar_correo_cliente(reserva, usuario, tour, fecha, email_destino, nombre_contacto):
-    """Envía correo de confirmación de pre-reserva al cliente"""
-    
-    fecha_inicio_str = fecha.fecha_inicio.strftime('%d de %B, %Y') if fecha.fecha_inicio else 'Por confirmar'
-    fecha_fin_str = fecha.fecha_fin.strftime('%d de %B, %Y') if fecha.fecha_fin else 'Por confirmar'
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{ font-family: 'Segoe UI', Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f5f5f5; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: #fff; }}
-            .header {{ background: linear-gradient(135deg, #C1A919 0%, #a08915 100%); color: white; padding: 30px; text-align: center; }}
-            .header h1 {{ margin: 0; font-size: 24px; }}
-            .success-icon {{ font-size: 50px; margin-bottom: 10px; }}
-            .content {{ padding: 30px; }}
-            .info-box {{ background: #fffaf0; border: 1px solid #f0e6c8; border-radius: 10px; padding: 20px; margin: 20px 0; }}
-            .info-row {{ padding: 12px 0; border-bottom: 1px solid #f0f0f0; }}
-            .info-row:last-child {{ border-bottom: none; }}
-            .info-label {{ color: #666; font-size: 14px; }}
-            .info-value {{ font-weight: bold; color: #333; font-size: 16px; }}
-            .total {{ font-size: 28px; color: #C1A919; font-weight: bold; }}
-            .cta-button {{ display: inline-block; background: #25D366; color: white; padding: 15px 30px; text-decoration: none; border-radius: 30px; font-weight: bold; margin: 10px 5px; }}
-            .footer {{ background: #f9f9f9; padding: 20px; text-align: center; font-size: 12px; color: #888; }}
-            .next-steps {{ background: #e8f5e9; border-left: 4px solid #4CAF50; padding: 15px 20px; margin: 20px 0; border-radius: 0 10px 10px 0; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="success-icon">✈️</div>
-                <h1>¡Solicitud de Reserva Recibida!</h1>
-                <p style="margin: 10px 0 0; opacity: 0.9;">Reserva #{reserva.id}</p>
-            </div>
-            
-            <div class="content">
-                <p>Hola <strong>{nombre_contacto}</strong>,</p>
-                
-                <p>¡Gracias por elegirnos! Hemos recibido tu solicitud de reserva para <strong>{tour.nombre}</strong>.</p>
-                
-                <p>Nuestro equipo revisará tu solicitud y te contactará en las próximas <strong>24 horas</strong> para confirmar los detalles y coordinar el pago.</p>
-                
-                <div class="info-box">
-                    <h3 style="margin-top: 0; color: #C1A919; border-bottom: 2px solid #f0e6c8; padding-bottom: 10px;">📋 Resumen de tu solicitud</h3>
-                    
-                    <div class="info-row">
-                        <div class="info-label">Número de reserva</div>
-                        <div class="info-value">#{reserva.id}</div>
-                    </div>
-                    <div class="info-row">
-                        <div class="info-label">Tour</div>
-                        <div class="info-value">{tour.nombre}</div>
-                    </div>
-                    <div class="info-row">
-                        <div class="info-label">Destino</div>
-                        <div class="info-value">{tour.pais or 'Ecuador'}</div>
-                    </div>
-                    <div class="info-row">
-                        <div class="info-label">Fecha de salida</div>
-                        <div class="info-value">📅 {fecha_inicio_str}</div>
-                    </div>
-                    <div class="info-row">
-                        <div class="info-label">Fecha de regreso</div>
-                        <div class="info-value">📅 {fecha_fin_str}</div>
-                    </div>
-                    <div class="info-row">
-                        <div class="info-label">Duración</div>
-                        <div class="info-value">{tour.duracion_dias or 'N/A'} días</div>
-                    </div>
-                    <div class="info-row">
-                        <div class="info-label">Pasajeros</div>
-                        <div class="info-value">👥 {reserva.numero_personas} persona(s)</div>
-                    </div>
-                    <div class="info-row" style="background: #fffaf0; margin: 10px -20px -20px; padding: 20px; border-radius: 0 0 10px 10px;">
-                        <div class="info-label">Total estimado</div>
-                        <div class="total">${reserva.monto_total} {reserva.moneda}</div>
-                    </div>
-                </div>
-                
-                {"<div style='background: #f5f5f5; padding: 15px; border-radius: 10px; margin: 20px 0;'><strong>💬 Tus comentarios:</strong><p style='margin: 10px 0 0; color: #666;'>" + str(reserva.comentarios_cliente) + "</p></div>" if reserva.comentarios_cliente else ""}
-                
-                <div class="next-steps">
-                    <h4 style="margin-top: 0; color: #2e7d32;">📌 ¿Qué sigue?</h4>
-                    <p style="margin: 5px 0;">1️⃣ Revisaremos tu solicitud (máximo 24 horas)</p>
-                    <p style="margin: 5px 0;">2️⃣ Te contactaremos para confirmar disponibilidad</p>
-                    <p style="margin: 5px 0;">3️⃣ Coordinaremos la forma de pago</p>
-                    <p style="margin: 5px 0;">4️⃣ ¡Recibirás tu confirmación final!</p>
-                </div>
-                
-                <p style="text-align: center; margin-top: 30px;">
-                    <a href="https://wa.me/593985676029?text=Hola! Acabo de hacer una pre-reserva para {tour.nombre}. Mi número es %23{reserva.id}" class="cta-button">
-                        📱 Contactar por WhatsApp
-                    </a>
-                </p>
-                
-                <p style="text-align: center; color: #888; font-size: 14px; margin-top: 20px;">
-                    ¿Tienes preguntas? Responde a este correo o contáctanos por WhatsApp.
-                </p>
-            </div>
-            
-            <div class="footer">
-                <p style="font-size: 16px; margin-bottom: 5px;"><strong>Mirlo Tours</strong></p>
-                <p>🌍 Especialistas en turismo de naturaleza</p>
-                <p>📍 Ecuador | 📞 +593 98 567 6029</p>
-                <hr style="border: none; border-top: 1px solid #ddd; margin: 15px 0;">
-                <p style="font-size: 11px; color: #aaa;">
-                    Este correo fue enviado porque solicitaste una reserva en nuestro sitio web.
-                </p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    enviar_email(
-        [email_destino],
-        f"✈️ Solicitud de Reserva #{reserva.id} - {tour.nombre}",
-        html_content
-    )
-
+    }
 
-def enviar_correo_admin(reserva, usuario, tour, fecha, telefono_contacto):
-    """Envía notificación al admin sobre nueva pre-reserva"""
-
-    admin_email = ADMIN_EMAIL
-    
-    fecha_inicio_str = fecha.fecha_inicio.strftime('%d/%m/%Y') if fecha.fecha_inicio else 'Por confirmar'
-    fecha_fin_str = fecha.fecha_fin.strftime('%d/%m/%Y') if fecha.fecha_fin else 'Por confirmar'
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f5f5f5; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: #fff; }}
-            .header {{ background: #C1A919; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 25px; }}
-            .alert {{ background: #fff3cd; border: 1px solid #ffc107; padding: 15px; margin-bottom: 20px; border-radius: 8px; }}
-            .section {{ margin-bottom: 25px; }}
-            .section-title {{ font-size: 14px; color: #666; text-transform: uppercase; margin-bottom: 10px; border-bottom: 1px solid #eee; padding-bottom: 5px; }}
-            .info-table {{ width: 100%; border-collapse: collapse; }}
-            .info-table td {{ padding: 10px; border-bottom: 1px solid #f0f0f0; }}
-            .info-table td:first-child {{ font-weight: bold; width: 40%; color: #666; }}
-            .highlight {{ background: #fffaf0; padding: 15px; border-radius: 8px; text-align: center; margin: 20px 0; }}
-            .highlight .amount {{ font-size: 28px; color: #C1A919; font-weight: bold; }}
-            .btn {{ display: inline-block; background: #C1A919; color: white; padding: 12px 25px; text-decoration: none; border-radius: 25px; font-weight: bold; }}
-            .footer {{ background: #f9f9f9; padding: 15px; text-align: center; font-size: 12px; color: #888; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h2 style="margin: 0;">🔔 Nueva Pre-Reserva #{reserva.id}</h2>
-            </div>
-            
-            <div class="content">
-                <div class="alert">
-                    <strong>⚠️ Acción requerida:</strong> Un cliente ha solicitado una reserva.
-                </div>
-                
-                <div class="section">
-                    <div class="section-title">👤 Datos del Cliente</div>
-                    <table class="info-table">
-                        <tr>
-                            <td>Nombre:</td>
-                            <td>{usuario.nombre} {getattr(usuario, 'apellido', '') or ''}</td>
-                        </tr>
-                        <tr>
-                            <td>Email:</td>
-                            <td><a href="mailto:{usuario.email}">{usuario.email}</a></td>
-                        </tr>
-                        <tr>
-                            <td>Teléfono:</td>
-                            <td>{telefono_contacto or 'No proporcionado'}</td>
-                        </tr>
-                    </table>
-                </div>
-                
-                <div class="section">
-                    <div class="section-title">🏔️ Datos de la Reserva</div>
-                    <table class="info-table">
-                        <tr>
-                            <td>Tour:</td>
-                            <td><strong>{tour.nombre}</strong></td>
-                        </tr>
-                        <tr>
-                            <td>Fecha:</td>
-                            <td>{fecha_inicio_str} → {fecha_fin_str}</td>
-                        </tr>
-                        <tr>
-                            <td>Pasajeros:</td>
-                            <td>{reserva.numero_personas} persona(s)</td>
-                        </tr>
-                        <tr>
-                            <td>Estado:</td>
-                            <td><span style="background: #fff3cd; padding: 3px 10px; border-radius: 15px; font-size: 12px;">⏳ PRE-RESERVA</span></td>
-                        </tr>
-                    </table>
-                </div>
-                
-                <div class="highlight">
-                    <div style="color: #666; font-size: 14px;">Monto Total</div>
-                    <div class="amount">${reserva.monto_total} {reserva.moneda}</div>
-                </div>
-                
-                {"<div class='section'><div class='section-title'>💬 Comentarios del Cliente</div><p style='background: #f5f5f5; padding: 15px; border-radius: 8px; margin: 0;'>" + str(reserva.comentarios_cliente) + "</p></div>" if reserva.comentarios_cliente else ""}
-                
-                <div style="text-align: center; margin-top: 25px;">
-                    <a href="https://www.mirlotoursec.com/admin/reservas/{reserva.id}" class="btn">
-                        👁️ Ver en Panel de Admin
-                    </a>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <p>Reserva creada el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    enviar_email(
-        [admin_email],
-        f"🔔 Nueva Pre-Reserva #{reserva.id} - {tour.nombre} - {usuario.nombre}",
-        html_content
-    )
 
-    # ================== GUÍAS PÚBLICOS =====================
+# ================== GUÍAS PÚBLICOS =====================
 
 @tour_bp.get("/guias")
+@cachear(Guia)
 def public_list_guias():
     """Lista pública de guías activos para mostrar en el frontend"""
     guias = Guia.query.filter_by(activo=True).order_by(Guia.nombre.asc()).all()
@@ -629,6 +371,7 @@ def public_list_guias():
 # ================== UBICACIONES PUBLICAS (PARA MAPAS) =====================
 
 @tour_bp.get("/<slug>/ubicaciones")
+@cachear(Tour, TourUbicacion)
 def get_tour_ubicaciones(slug):
     """
     Obtiene las ubicaciones de un tour para mostrar en un mapa.
@@ -0,0 +1,272 @@
+# tests/conftest.py
+"""
+Entorno de pruebas.
+
+Por defecto cada prueba corre sobre un SQLite en memoria con el schema
+"travel" adjunto (ATTACH) y las funciones de Postgres que usa el código
+(greatest, now, advisory locks) registradas en la conexión. Con
+TEST_DATABASE_URL=postgresql://... se usa esa base (se crean y borran las
+tablas del schema travel en cada prueba).
+
+    python -m pytest -q
+    TEST_DATABASE_URL=postgresql://localhost/mirlo_test python -m pytest -q
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+# Antes de importar config/app: nada de BD remota ni hilos de fondo
+os.environ.setdefault("DATABASE_URL", os.environ.get("TEST_DATABASE_URL", "sqlite://"))
+os.environ["INDICE_CATALOGO_PRECARGA"] = "0"
+os.environ["RESERVAS_EXPIRACION_HILO"] = "0"
+os.environ["RESERVAS_CORREOS_EN_FONDO"] = "0"
+os.environ.setdefault("JWT_SECRET_KEY", "clave-de-pruebas-con-longitud-suficiente")
+
+import pytest
+from sqlalchemy import BigInteger, event, literal, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Values
+from sqlalchemy.pool import NullPool, StaticPool
+
+import config
+
+POSTGRES = os.environ.get("TEST_DATABASE_URL", "").startswith("postgresql")
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_sqlite(tipo, compilador, **kw):
+    # INTEGER PRIMARY KEY es lo único que SQLite autoincrementa
+    return "INTEGER"
+
+
+@compiles(Values, "sqlite")
+def _values_sqlite(valores, compilador, **kw):
+    # SQLite no acepta "(VALUES ...) AS nombre (columnas)": sus columnas se
+    # llaman column1, column2, ... y se renombran con un SELECT
+    filas = ", ".join(
+        "(" + ", ".join(compilador.process(literal(v, c.type), **kw) for v, c in zip(fila, valores.columns)) + ")"
+        for lote in valores._data
+        for fila in lote
+    )
+    columnas = ", ".join(f"column{i} AS {c.name}" for i, c in enumerate(valores.columns, start=1))
+    return f"(SELECT {columnas} FROM (VALUES {filas})) AS {valores.name}"
+
+
+def _opciones_motor(ruta_sqlite=None):
+    if POSTGRES:
+        return os.environ["TEST_DATABASE_URL"], {"poolclass": NullPool}
+    if ruta_sqlite is None:
+        return "sqlite://", {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    return f"sqlite:///{ruta_sqlite}", {
+        "poolclass": NullPool,
+        "connect_args": {"check_same_thread": False, "timeout": 30},
+    }
+
+
+def _preparar_sqlite(motor, ruta_travel=":memory:", inmediata=False):
+    """ATTACH del schema travel y funciones de Postgres en cada conexión."""
+
+    @event.listens_for(motor, "connect")
+    def _conectar(conexion, registro):
+        if not isinstance(conexion, sqlite3.Connection):
+            return
+        if inmediata:
+            conexion.isolation_level = None
+        conexion.execute(f"ATTACH DATABASE '{ruta_travel}' AS travel")
+        conexion.create_function("greatest", 2, max)
+        conexion.create_function("now", 0, lambda: date.today().isoformat())
+        conexion.create_function("pg_advisory_xact_lock", 2, lambda a, b: None)
+        conexion.create_function("pg_try_advisory_xact_lock", 2, lambda a, b: 1)
+
+    if inmediata:
+        # SQLite no tiene bloqueos de fila: cada transacción toma el de
+        # escritura al empezar (BEGIN IMMEDIATE) en vez de fallar con BUSY
+        @event.listens_for(motor, "begin")
+        def _empezar(conexion):
+            conexion.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _configurar(ruta_sqlite=None):
+    uri, opciones = _opciones_motor(ruta_sqlite)
+    config.Config.SQLALCHEMY_DATABASE_URI = uri
+    config.Config.SQLALCHEMY_ENGINE_OPTIONS = opciones
+
+
+# app.py crea una app al importarse: que ya apunte a la BD de pruebas
+_configurar()
+
+
+def crear_app_prueba(ruta_sqlite=None):
+    """App con la BD de pruebas y las tablas creadas (vacías)."""
+    from app import create_app
+    from extensions import db
+
+    _configurar(ruta_sqlite)
+
+    app = create_app()
+    app.config["TESTING"] = True
+
+    with app.app_context():
+        if not POSTGRES:
+            ruta_travel = f"{ruta_sqlite}.travel" if ruta_sqlite else ":memory:"
+            _preparar_sqlite(db.engine, ruta_travel, inmediata=ruta_sqlite is not None)
+        else:
+            with db.engine.begin() as conexion:
+                conexion.execute(text("CREATE SCHEMA IF NOT EXISTS travel"))
+        db.create_all()
+    return app
+
+
+def _limpiar_memoria():
+    """Cachés y el índice del catálogo son globales del proceso."""
+    import busqueda_service
+    import cache_service
+
+    cache_service.respuestas.limpiar()
+    cache_service.instantaneas.limpiar()
+    cache_service.estadisticas_usuarios.limpiar()
+    cache_service._version = None
+    busqueda_service._indice = None
+    busqueda_service._pendientes.clear()
+
+
+def sembrar(app, salidas=1, cupos=10):
+    """Admin, cliente, categoría, guía y un tour activo con sus salidas. Devuelve ids y tokens."""
+    from flask_jwt_extended import create_access_token
+
+    from extensions import db
+    from models import Categoria, FechaTour, Guia, Tour, Usuario
+
+    with app.app_context():
+        admin = Usuario(nombre="Ana", apellido="Admin", email="admin@mirlo.test", rol="admin")
+        admin.set_password("secreto")
+        cliente = Usuario(nombre="Carlos", apellido="Cliente", email="cliente@mirlo.test", rol="cliente")
+        cliente.set_password("secreto")
+        categoria = Categoria(nombre="Galápagos", slug="galapagos", orden=1)
+        guia = Guia(nombre="Juan")
+        db.session.add_all([admin, cliente, categoria, guia])
+        db.session.flush()
+
+        tour = Tour(
+            nombre="Islas Encantadas",
+            slug="islas-encantadas",
+            pais="Ecuador",
+            duracion_dias=5,
+            precio_pp=850,
+            moneda="USD",
+            categoria_id=categoria.id,
+            guia_principal_id=guia.id,
+            nivel_actividad="moderada",
+        )
+        db.session.add(tour)
+        db.session.flush()
+
+        inicio = date.today() + timedelta(days=40)
+        fechas = [
+            FechaTour(
+                tour_id=tour.id,
+                fecha_inicio=inicio + timedelta(days=7 * i),
+                fecha_fin=inicio + timedelta(days=7 * i + 4),
+                cupos_totales=cupos,
+            )
+            for i in range(salidas)
+        ]
+        db.session.add_all(fechas)
+        db.session.commit()
+
+        return {
+            "admin_id": admin.id,
+            "cliente_id": cliente.id,
+            "tour_id": tour.id,
+            "tour_slug": tour.slug,
+            "categoria_id": categoria.id,
+            "guia_id": guia.id,
+            "fecha_ids": [f.id for f in fechas],
+            "admin": {"Authorization": f"Bearer {create_access_token(identity=str(admin.id))}"},
+            "cliente": {"Authorization": f"Bearer {create_access_token(identity=str(cliente.id))}"},
+        }
+
+
+def _desmontar(app):
+    from extensions import db
+
+    with app.app_context():
+        db.session.remove()
+        if POSTGRES:
+            db.drop_all()
+        db.engine.dispose()
+    _limpiar_memoria()
+
+
+# =====================================================
+# FIXTURES
+# =====================================================
+
+@pytest.fixture
+def app():
+    app = crear_app_prueba()
+    yield app
+    _desmontar(app)
+
+
+@pytest.fixture
+def app_concurrente(tmp_path):
+    """App sobre un archivo (una conexión por hilo) para pruebas con hilos."""
+    app = crear_app_prueba(str(tmp_path / "mirlo.db"))
+    yield app
+    _desmontar(app)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def datos(app):
+    return sembrar(app)
+
+
+@pytest.fixture(autouse=True)
+def correos(monkeypatch):
+    """Los correos de Resend no salen: se anotan (destinatarios, asunto)."""
+    import reserva_service
+
+    enviados = []
+
+    def _enviar(to, subject, html, from_email=None):
+        enviados.append((to, subject))
+        return {"id": f"prueba-{len(enviados)}"}
+
+    monkeypatch.setattr(reserva_service, "enviar_email", _enviar)
+    return enviados
+
+
+@pytest.fixture
+def contar_consultas(app):
+    """
+    Cuenta las sentencias enviadas a la BD dentro del bloque:
+
+        with contar_consultas() as consultas:
+            client.get("/tours/x")
+        assert len(consultas) == 3
+    """
+    from extensions import db
+
+    @contextmanager
+    def contar():
+        consultas = []
+
+        def _anotar(conexion, cursor, sentencia, parametros, contexto, multiples):
+            consultas.append(sentencia)
+
+        with app.app_context():
+            motor = db.engine
+        event.listen(motor, "before_cursor_execute", _anotar)
+        try:
+            yield consultas
+        finally:
+            event.remove(motor, "before_cursor_execute", _anotar)
+
+    return contar
@@ -0,0 +1,98 @@
+# tests/test_admin_listados.py
+"""Listados paginados y export del admin (user-010 / user-011 / user-017)."""
+import csv
+import io
+
+from extensions import db
+from models import Reserva, Tour, Usuario
+
+
+def _agregar_tours(app, n):
+    with app.app_context():
+        for i in range(n):
+            db.session.add(Tour(nombre=f"Tour {i}", slug=f"tour-{i}", pais="Perú",
+                               duracion_dias=3, precio_pp=100))
+        db.session.commit()
+
+
+def test_tours_del_admin_paginados(app, client, datos):
+    _agregar_tours(app, 4)
+
+    completa = client.get("/admin/tours?view=summary", headers=datos["admin"]).json
+    assert len(completa) == 5
+
+    vistos = []
+    for page in (1, 2, 3):
+        pagina = client.get(f"/admin/tours?view=summary&page={page}&per_page=2", headers=datos["admin"]).json
+        assert (pagina["total"], pagina["page"], pagina["per_page"], pagina["pages"]) == (5, page, 2, 3)
+        vistos += [t["id"] for t in pagina["items"]]
+    assert vistos == [t["id"] for t in completa]
+
+
+def test_tours_del_admin_acota_page_y_per_page(client, datos):
+    pagina = client.get("/admin/tours?page=0&per_page=1000", headers=datos["admin"]).json
+    assert (pagina["page"], pagina["per_page"], len(pagina["items"])) == (1, 200, 1)
+
+    fuera = client.get("/admin/tours?page=9", headers=datos["admin"]).json
+    assert fuera["items"] == [] and fuera["total"] == 1
+
+
+def _agregar_reservas(app, datos, n, prefijo="Cliente"):
+    """n reservas, cada una de un cliente distinto."""
+    with app.app_context():
+        for i in range(n):
+            usuario = Usuario(nombre=f"{prefijo} {i}", email=f"{prefijo.lower()}{i}@mirlo.test", rol="cliente")
+            usuario.set_password("x")
+            db.session.add(usuario)
+            db.session.flush()
+            db.session.add(Reserva(usuario_id=usuario.id, tour_id=datos["tour_id"],
+                                   fecha_tour_id=datos["fecha_ids"][0], numero_personas=1,
+                                   monto_total=850 + i))
+        db.session.commit()
+
+
+def _consultas_reservas(client, datos, contar_consultas, url):
+    with contar_consultas() as consultas:
+        r = client.get(url, headers=datos["admin"])
+    assert r.status_code == 200
+    return len(consultas), r.json
+
+
+def test_reservas_del_admin_con_consultas_constantes(app, client, datos, contar_consultas):
+    _agregar_reservas(app, datos, 2)
+    pocas, lista = _consultas_reservas(client, datos, contar_consultas, "/admin/reservas")
+    assert len(lista) == 2
+
+    _agregar_reservas(app, datos, 30, prefijo="Otro")
+    muchas, lista = _consultas_reservas(client, datos, contar_consultas, "/admin/reservas")
+    assert len(lista) == 32
+    assert lista[0]["usuario"]["nombre"] and lista[0]["tour"]["slug"] == datos["tour_slug"]
+    assert muchas == pocas
+
+    paginada, pagina = _consultas_reservas(
+        client, datos, contar_consultas, "/admin/reservas?page=2&per_page=10&busqueda=otro&orden=monto_total"
+    )
+    assert (pagina["total"], len(pagina["items"])) == (30, 10)
+    assert paginada == pocas + 1  # + el COUNT
+
+
+def test_export_csv_neutraliza_formulas(app, client, datos):
+    with app.app_context():
+        usuario = Usuario(nombre="=HYPERLINK(\"http://x\")", apellido="@SUM(A1)", email="f@mirlo.test",
+                          telefono="+593 99", rol="cliente")
+        usuario.set_password("x")
+        db.session.add(usuario)
+        db.session.flush()
+        db.session.add(Reserva(usuario_id=usuario.id, tour_id=datos["tour_id"],
+                               fecha_tour_id=datos["fecha_ids"][0], numero_personas=2, monto_total=1700))
+        db.session.commit()
+
+    r = client.get("/admin/reservas/export", headers=datos["admin"])
+    assert r.status_code == 200
+    encabezado, fila = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+    celdas = dict(zip(encabezado, fila))
+    assert celdas["cliente_nombre"] == "'=HYPERLINK(\"http://x\")"
+    assert celdas["cliente_apellido"] == "'@SUM(A1)"
+    assert celdas["cliente_telefono"] == "'+593 99"
+    assert celdas["cliente_email"] == "f@mirlo.test"
+    assert celdas["monto_total"] == "1700.00"
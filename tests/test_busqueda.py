@@ -0,0 +1,47 @@
+# tests/test_busqueda.py
+"""Índice de facetas del catálogo y su señal de revisión (user-006)."""
+from datetime import date, timedelta
+
+from extensions import db
+from models import CatalogoVersion, FechaTour
+
+
+def _version(app):
+    with app.app_context():
+        fila = db.session.get(CatalogoVersion, "fechas_tour")
+        return fila.version if fila else 0
+
+
+def test_facetas_y_filtros(client, datos):
+    r = client.get("/tours/buscar?pais=ecuador&duracion=4-7")
+    assert r.status_code == 200
+    assert r.json["total"] == 1
+    assert r.json["facetas"]["categoria"] == {"galapagos": 1}
+
+    mes = (date.today() + timedelta(days=40)).strftime("%Y-%m")
+    assert r.json["facetas"]["mes"] == {mes: 1}
+    assert client.get("/tours/buscar?mes=1999-01").json["total"] == 0
+
+
+def test_reservas_no_tocan_la_version_ni_el_mes(app, client, datos):
+    antes = _version(app)
+    r = client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": 10},
+        headers=datos["cliente"],
+    )
+    assert r.status_code == 201
+    assert _version(app) == antes
+
+    # Salida llena pero abierta: sigue contando para la faceta del mes
+    assert client.get("/tours/buscar").json["facetas"]["mes"]
+
+
+def test_alta_de_salida_incrementa_la_version(app, datos):
+    antes = _version(app)
+    with app.app_context():
+        inicio = date.today() + timedelta(days=90)
+        db.session.add(FechaTour(tour_id=datos["tour_id"], fecha_inicio=inicio,
+                                 fecha_fin=inicio + timedelta(days=4), cupos_totales=8))
+        db.session.commit()
+    assert _version(app) == antes + 1
@@ -0,0 +1,74 @@
+# tests/test_cache.py
+"""Caché de respuestas del catálogo y versión para ETag (user-003 / user-004)."""
+from sqlalchemy import update
+
+import cache_service
+from extensions import db
+from models import CatalogoVersion, Categoria, Guia
+
+
+def test_acierto_de_cache_sin_consultas(client, datos, contar_consultas):
+    primera = client.get("/tours/guias")
+    assert primera.status_code == 200
+
+    with contar_consultas() as consultas:
+        segunda = client.get("/tours/guias")
+        condicional = client.get("/tours/guias", headers={"If-None-Match": primera.headers["ETag"]})
+
+    assert segunda.get_data() == primera.get_data()
+    assert condicional.status_code == 304
+    assert consultas == []
+
+
+def test_commit_propio_cambia_el_etag_al_instante(app, client, datos):
+    etag = client.get("/tours/guias").headers["ETag"]
+
+    with app.app_context():
+        db.session.get(Guia, datos["guia_id"]).nombre = "Juan Carlos"
+        db.session.commit()
+
+    r = client.get("/tours/guias", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json[0]["nombre"] == "Juan Carlos"
+
+
+def test_cambio_de_otro_worker_tras_la_revision(app, client, datos):
+    etag = client.get("/tours/guias").headers["ETag"]
+
+    # Otro worker incrementa la versión: este no ve su after_commit
+    with app.app_context():
+        with db.engine.begin() as conexion:
+            conexion.execute(update(CatalogoVersion).values(version=CatalogoVersion.version + 1))
+
+    assert client.get("/tours/guias", headers={"If-None-Match": etag}).status_code == 304
+
+    cache_service._version_leida_en = 0.0  # venció el intervalo de revisión
+    assert client.get("/tours/guias", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_cambio_en_otra_tabla_conserva_la_entrada(app, client, datos, contar_consultas):
+    primera = client.get("/tours/guias")
+    etag = primera.headers["ETag"]
+    invalidadas = cache_service.respuestas.estadisticas()["invalidadas"]
+
+    # Commit propio sobre una tabla de la que /tours/guias no depende
+    with app.app_context():
+        db.session.get(Categoria, datos["categoria_id"]).nombre = "Islas"
+        db.session.commit()
+
+    # Y otro worker que cambia esa misma tabla, visto tras la revisión
+    with app.app_context():
+        with db.engine.begin() as conexion:
+            conexion.execute(
+                update(CatalogoVersion)
+                .where(CatalogoVersion.tabla == "categorias")
+                .values(version=CatalogoVersion.version + 1)
+            )
+    cache_service._version_leida_en = 0.0
+
+    assert client.get("/tours/guias", headers={"If-None-Match": etag}).status_code == 304
+    with contar_consultas() as consultas:
+        r = client.get("/tours/guias")
+    assert r.get_data() == primera.get_data()
+    assert consultas == []
+    assert cache_service.respuestas.estadisticas()["invalidadas"] == invalidadas
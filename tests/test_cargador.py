@@ -0,0 +1,65 @@
+# tests/test_cargador.py
+"""Carga por lotes con memoria por request (user-015)."""
+from datetime import date, timedelta
+
+from cargador import cargador
+from extensions import db
+from models import FechaTour, Reserva, Tour
+
+
+def test_un_in_por_lote_y_memoria_del_request(app, datos, contar_consultas):
+    with app.test_request_context():
+        tours = cargador(Tour)
+        assert cargador(Tour) is tours
+
+        with contar_consultas() as consultas:
+            tours.pedir([datos["tour_id"], None, 999])
+            assert tours.obtener(datos["tour_id"]).slug == datos["tour_slug"]
+            assert tours.obtener(999) is None
+            assert tours.obtener(None) is None
+            varios = tours.obtener_varios([datos["tour_id"], 999])
+            assert varios == {datos["tour_id"]: tours.obtener(datos["tour_id"]), 999: None}
+        assert len(consultas) == 1
+        assert " IN " in consultas[0]
+
+    # Otro request empieza sin memoria
+    with app.test_request_context():
+        with contar_consultas() as consultas:
+            cargador(Tour).obtener(datos["tour_id"])
+        assert len(consultas) == 1
+
+
+def _agregar_reservas(app, datos, n, prefijo="tour"):
+    """n reservas del cliente, cada una en un tour y una salida distintos."""
+    with app.app_context():
+        inicio = date.today() + timedelta(days=60)
+        for i in range(n):
+            tour = Tour(nombre=f"Tour {i}", slug=f"{prefijo}-{i}", pais="Perú", duracion_dias=3, precio_pp=100)
+            db.session.add(tour)
+            db.session.flush()
+            fecha = FechaTour(tour_id=tour.id, fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=2), cupos_totales=5)
+            db.session.add(fecha)
+            db.session.flush()
+            db.session.add(Reserva(usuario_id=datos["cliente_id"], tour_id=tour.id, fecha_tour_id=fecha.id,
+                                   numero_personas=1, monto_total=100))
+        db.session.commit()
+
+
+def _mis_reservas(client, datos, contar_consultas):
+    with contar_consultas() as consultas:
+        r = client.get("/tours/mis-reservas", headers=datos["cliente"])
+    assert r.status_code == 200
+    return r.json, len(consultas)
+
+
+def test_mis_reservas_con_consultas_constantes(app, client, datos, contar_consultas):
+    _agregar_reservas(app, datos, 1)
+    lista, pocas = _mis_reservas(client, datos, contar_consultas)
+    assert [r["tour_slug"] for r in lista] == ["tour-0"]
+
+    _agregar_reservas(app, datos, 15, prefijo="otro")
+    lista, muchas = _mis_reservas(client, datos, contar_consultas)
+    assert len(lista) == 16
+    assert all(r["tour_slug"] and r["fecha_inicio"] for r in lista)
+    # Reservas + un IN de tours + un IN de salidas, sin importar cuántas
+    assert muchas == pocas
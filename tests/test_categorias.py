@@ -0,0 +1,51 @@
+# tests/test_categorias.py
+"""Menú de categorías en una sola consulta (user-007)."""
+from extensions import db
+from models import Categoria, Tour
+
+
+def _catalogo(app, datos):
+    """Galápagos con un tour destacado y uno inactivo; Andes sin tours; Selva inactiva."""
+    with app.app_context():
+        andes = Categoria(nombre="Andes", slug="andes", orden=2)
+        selva = Categoria(nombre="Selva", slug="selva", orden=0, activo=False)
+        db.session.add_all([andes, selva])
+        db.session.flush()
+        destacado = Tour(nombre="Bahía", slug="bahia", pais="Ecuador", duracion_dias=2, precio_pp=300,
+                         categoria_id=datos["categoria_id"], orden_destacado=1)
+        db.session.add_all([
+            destacado,
+            Tour(nombre="Oculto", slug="oculto", pais="Ecuador", duracion_dias=2,
+                 categoria_id=datos["categoria_id"], activo=False),
+            Tour(nombre="Amazonas", slug="amazonas", pais="Ecuador", duracion_dias=4,
+                 categoria_id=selva.id),
+        ])
+        db.session.commit()
+        return destacado.id
+
+
+def test_menu_con_la_forma_de_siempre(app, client, datos):
+    destacado = _catalogo(app, datos)
+
+    menu = client.get("/tours/categorias").json
+    assert [(c["slug"], c["total_tours"]) for c in menu] == [("galapagos", 2), ("andes", 0)]
+    assert [t["id"] for t in menu[0]["tours"]] == [destacado, datos["tour_id"]]
+
+    with app.app_context():
+        # Mismo contenido que el to_dict_with_tours() de siempre (que carga los tours aparte)
+        anterior = db.session.get(Categoria, datos["categoria_id"]).to_dict_with_tours()
+    assert {**menu[0], "tours": sorted(menu[0]["tours"], key=lambda t: t["id"])} == {
+        **anterior, "tours": sorted(anterior["tours"], key=lambda t: t["id"])
+    }
+
+    assert client.get("/tours/categorias/andes").json["tours"] == []
+    assert client.get("/tours/categorias/selva").status_code == 404
+
+
+def test_menu_en_una_consulta(app, datos, contar_consultas):
+    _catalogo(app, datos)
+    with app.app_context():
+        with contar_consultas() as consultas:
+            menu = Categoria.menu()
+        assert len(consultas) == 1
+        assert sum(c["total_tours"] for c in menu) == 2
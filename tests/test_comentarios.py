@@ -0,0 +1,48 @@
+# tests/test_comentarios.py
+"""Cola de moderación de comentarios (user-018)."""
+from extensions import db
+from models import Comentario, ComentarioEstado
+
+
+def _comentar(app, datos, n, respuesta_admin=None):
+    with app.app_context():
+        comentarios = [
+            Comentario(usuario_id=datos["cliente_id"], tour_id=datos["tour_id"], calificacion=5,
+                       comentario=f"Comentario {i}", respuesta_admin=respuesta_admin)
+            for i in range(n)
+        ]
+        db.session.add_all(comentarios)
+        db.session.commit()
+        return [c.id for c in comentarios]
+
+
+def test_listado_publico_sin_datos_del_autor(app, client, datos):
+    _comentar(app, datos, 3)
+
+    lista = client.get("/admin/comentarios").json
+    assert len(lista) == 3
+    assert all("usuario_nombre" not in c for c in lista)
+
+    pagina = client.get("/admin/comentarios?limit=2").json
+    assert len(pagina["items"]) == 2 and pagina["next_cursor"]
+    resto = client.get(f"/admin/comentarios?limit=2&cursor={pagina['next_cursor']}").json
+    assert [c["id"] for c in pagina["items"] + resto["items"]] == [c["id"] for c in lista]
+
+
+def test_rechazo_en_lote_igual_que_el_individual(app, client, datos):
+    ids = _comentar(app, datos, 4, respuesta_admin="Respuesta anterior")
+
+    r = client.patch(f"/admin/comentarios/{ids[0]}/rechazar", json={}, headers=datos["admin"])
+    assert r.status_code == 200
+    r = client.post("/admin/comentarios/lote", json={"accion": "rechazar", "ids": ids[1:3]},
+                    headers=datos["admin"])
+    assert r.json["procesados"] == ids[1:3]
+    r = client.post("/admin/comentarios/lote",
+                    json={"accion": "rechazar", "ids": [ids[3]], "respuesta_admin": "Lenguaje inapropiado"},
+                    headers=datos["admin"])
+    assert r.status_code == 200
+
+    with app.app_context():
+        comentarios = {c.id: c for c in Comentario.query.all()}
+    assert all(c.estado == ComentarioEstado.RECHAZADO for c in comentarios.values())
+    assert [comentarios[i].respuesta_admin for i in ids] == [None, None, None, "Lenguaje inapropiado"]
@@ -0,0 +1,110 @@
+# tests/test_cupos.py
+"""Asignación y liberación de cupos sin sobreventa ni doble liberación (user-021)."""
+from concurrent.futures import ThreadPoolExecutor
+
+from extensions import db
+from models import FechaTour, Reserva, ReservaEstado
+from tests.conftest import sembrar
+
+
+def _reservar(client, datos, personas=2):
+    return client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": personas},
+        headers=datos["cliente"],
+    )
+
+
+def _ocupados(app, datos):
+    with app.app_context():
+        ocupados = db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados
+        db.session.remove()
+        return ocupados
+
+
+def test_cancelar_dos_veces_libera_una_vez(app, client, datos):
+    _reservar(client, datos, 3)
+    reserva_id = _reservar(client, datos, 2).json["reserva"]["id"]
+    assert _ocupados(app, datos) == 5
+
+    url = f"/reservas/{reserva_id}/cancelar"
+    assert client.patch(url, json={}, headers=datos["cliente"]).status_code == 200
+    assert client.patch(url, json={}, headers=datos["cliente"]).status_code == 400
+    assert _ocupados(app, datos) == 3
+
+
+def test_cancelar_reserva_ajena(app, client, datos):
+    reserva_id = _reservar(client, datos).json["reserva"]["id"]
+    r = client.patch(f"/reservas/{reserva_id}/cancelar", json={}, headers=datos["admin"])
+    assert r.status_code == 403
+    assert _ocupados(app, datos) == 2
+
+
+def test_admin_cancela_y_reactiva(app, client, datos):
+    reserva_id = _reservar(client, datos, 4).json["reserva"]["id"]
+    url = f"/admin/reservas/{reserva_id}"
+
+    r = client.put(url, json={"estado_reserva": "cancelada_operador"}, headers=datos["admin"])
+    assert r.status_code == 200
+    assert _ocupados(app, datos) == 0
+
+    # Cancelar otra vez no libera de nuevo
+    client.put(url, json={"estado_reserva": "cancelada_cliente"}, headers=datos["admin"])
+    assert _ocupados(app, datos) == 0
+
+    _reservar(client, datos, 8)
+    r = client.put(url, json={"estado_reserva": "confirmada"}, headers=datos["admin"])
+    assert r.status_code == 400
+    assert _ocupados(app, datos) == 8
+
+    r = client.put(url, json={"estado_reserva": "confirmada", "numero_personas": 2}, headers=datos["admin"])
+    assert r.status_code == 200
+    assert _ocupados(app, datos) == 10
+
+    r = client.put(url, json={"numero_personas": 1}, headers=datos["admin"])
+    assert _ocupados(app, datos) == 9
+
+    assert client.put(url, json={"estado_reserva": "otro"}, headers=datos["admin"]).status_code == 400
+
+
+def test_borrar_reserva_activa_libera_cupos(app, client, datos):
+    reserva_id = _reservar(client, datos, 3).json["reserva"]["id"]
+    r = client.delete(f"/admin/reservas/{reserva_id}/permanente", headers=datos["admin"])
+    assert r.status_code == 200
+    assert _ocupados(app, datos) == 0
+
+
+def test_reservas_concurrentes_sin_sobreventa(app_concurrente):
+    datos = sembrar(app_concurrente, cupos=10)
+
+    def reservar(_):
+        return _reservar(app_concurrente.test_client(), datos, 1).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as hilos:
+        estados = list(hilos.map(reservar, range(25)))
+
+    assert estados.count(201) == 10
+    assert estados.count(400) == 15
+    with app_concurrente.app_context():
+        assert Reserva.query.count() == 10
+    assert _ocupados(app_concurrente, datos) == 10
+
+
+def test_cancelaciones_concurrentes_liberan_una_vez(app_concurrente):
+    datos = sembrar(app_concurrente, cupos=10)
+    client = app_concurrente.test_client()
+    _reservar(client, datos, 4)
+    reserva_id = _reservar(client, datos, 3).json["reserva"]["id"]
+
+    def cancelar(_):
+        return app_concurrente.test_client().patch(
+            f"/reservas/{reserva_id}/cancelar", json={}, headers=datos["cliente"]
+        ).status_code
+
+    with ThreadPoolExecutor(max_workers=6) as hilos:
+        estados = list(hilos.map(cancelar, range(6)))
+
+    assert sorted(estados) == [200, 400, 400, 400, 400, 400]
+    assert _ocupados(app_concurrente, datos) == 4
+    with app_concurrente.app_context():
+        assert db.session.get(Reserva, reserva_id).estado_reserva == ReservaEstado.CANCELADA_CLIENTE
@@ -0,0 +1,138 @@
+# tests/test_cupos_plazas.py
+"""Modo plazas de cupos (CUPOS_MODO=plazas): sin filas ni bloqueos compartidos por reserva (user-022)."""
+import re
+
+import pytest
+
+import cupos_service
+import reportes_service
+from extensions import db
+from models import CupoPlaza, FechaTour, ReportePendiente, ReporteSalida
+
+# Filas que comparten todas las reservas de una salida (o de un mes)
+_COMPARTIDAS = ("fechas_tour", "reporte_salidas", "reporte_ingresos_mensual", "tours", "tour_documentos")
+
+
+@pytest.fixture
+def plazas(app):
+    app.config["CUPOS_MODO"] = "plazas"
+
+
+def _reservar(client, datos, personas=2):
+    return client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": personas},
+        headers=datos["cliente"],
+    )
+
+
+def _escrituras(consultas):
+    """Tabla destino de cada INSERT/UPDATE/DELETE."""
+    destinos = (re.match(r"\s*(?:INSERT INTO|UPDATE|DELETE FROM) travel\.(\w+)", c) for c in consultas)
+    return [d.group(1) for d in destinos if d]
+
+
+def _ocupadas(fecha_id):
+    return CupoPlaza.query.filter_by(fecha_tour_id=fecha_id, ocupada=True).count()
+
+
+def test_reserva_toma_plazas_sin_bloqueo_compartido(plazas, client, datos, contar_consultas):
+    assert _reservar(client, datos).status_code == 201  # crea las plazas de la salida
+
+    with contar_consultas() as consultas:
+        assert _reservar(client, datos).status_code == 201
+
+    escrituras = _escrituras(consultas)
+    assert not set(escrituras) & set(_COMPARTIDAS)
+    assert escrituras.count("cupos_plazas") == 1
+    assert "reporte_pendientes" in escrituras
+    assert not any("pg_advisory" in c for c in consultas)
+
+
+def test_plazas_parten_de_la_columna(app, client, datos):
+    # Reservas hechas en modo fila antes de cambiar de modo
+    _reservar(client, datos, 3)
+    app.config["CUPOS_MODO"] = "plazas"
+    assert _reservar(client, datos, 2).status_code == 201
+
+    fecha_id = datos["fecha_ids"][0]
+    with app.app_context():
+        assert CupoPlaza.query.filter_by(fecha_tour_id=fecha_id).count() == 10
+        assert _ocupadas(fecha_id) == 5
+        assert cupos_service.disponibles(fecha_id) == 5
+
+
+def test_sin_sobreventa(plazas, app, client, datos):
+    assert _reservar(client, datos, 8).status_code == 201
+    r = _reservar(client, datos, 3)
+    assert r.status_code == 400
+    assert r.json["message"] == "No hay cupos suficientes. Disponibles: 2"
+    assert _reservar(client, datos, 2).status_code == 201
+
+    with app.app_context():
+        # El rechazo no dejó plazas tomadas
+        assert _ocupadas(datos["fecha_ids"][0]) == 10
+
+
+def test_ajuste_del_admin_y_totales_reducidos(plazas, app, client, datos):
+    fecha_id = datos["fecha_ids"][0]
+    _reservar(client, datos, 4)
+    r = client.put(
+        f"/admin/fechas/{fecha_id}",
+        json={"cupos_totales": 5, "cupos_ocupados": 6},
+        headers=datos["admin"],
+    )
+    assert r.status_code == 200
+    assert r.json["fecha"]["cupos_ocupados"] == 6
+
+    # La plaza 6 queda por encima de los totales: no hay nada libre
+    assert _reservar(client, datos, 1).status_code == 400
+
+    client.put(f"/admin/fechas/{fecha_id}", json={"cupos_totales": 8}, headers=datos["admin"])
+    reserva_id = _reservar(client, datos, 2).json["reserva"]["id"]
+    client.patch(f"/reservas/{reserva_id}/cancelar", json={}, headers=datos["cliente"])
+    with app.app_context():
+        assert _ocupadas(fecha_id) == 6
+        assert cupos_service.disponibles(fecha_id) == 2
+
+
+def test_cupos_al_dia_sin_compactar(plazas, app, client, datos):
+    _reservar(client, datos, 3)
+
+    fecha = client.get(f"/tours/{datos['tour_slug']}").json["tour"]["fechas"][0]
+    assert fecha["cupos_ocupados"] == 3
+    fecha = client.get(f"/admin/tours/{datos['tour_id']}", headers=datos["admin"]).json["fechas"][0]
+    assert fecha["cupos_ocupados"] == 3
+    fecha = client.get("/admin/tours?fields=fechas", headers=datos["admin"]).json[0]["fechas"][0]
+    assert fecha["cupos_ocupados"] == 3
+
+    with app.app_context():
+        # La columna es la foto de la última compactación
+        assert db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados == 0
+        assert cupos_service.disponibles(datos["fecha_ids"][0]) == 7
+
+
+def test_compactar_y_plegar_reportes(plazas, app, client, datos):
+    _reservar(client, datos, 3)
+    reserva_id = _reservar(client, datos, 2).json["reserva"]["id"]
+    client.patch(f"/reservas/{reserva_id}/cancelar", json={}, headers=datos["cliente"])
+
+    with app.app_context():
+        assert db.session.get(ReporteSalida, datos["fecha_ids"][0]) is None
+        assert cupos_service.compactar() == 1
+        assert cupos_service.compactar() == 0
+        assert reportes_service.plegar_pendientes() > 0
+
+        fecha_id = datos["fecha_ids"][0]
+        assert db.session.get(FechaTour, fecha_id).cupos_ocupados == 3
+        salida = db.session.get(ReporteSalida, fecha_id)
+        assert (salida.reservas, salida.reservas_canceladas, salida.personas) == (2, 1, 3)
+        assert ReportePendiente.query.count() == 0
+        assert cupos_service.conciliar() == []
+
+    # Lo que llega después de compactar entra en la próxima foto
+    _reservar(client, datos, 1)
+    with app.app_context():
+        assert cupos_service.disponibles(datos["fecha_ids"][0]) == 6
+        cupos_service.compactar()
+        assert db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados == 4
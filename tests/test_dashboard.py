@@ -0,0 +1,57 @@
+# tests/test_dashboard.py
+"""Resumen del dashboard del admin: una consulta por tabla y foto corta (user-013)."""
+from extensions import db
+from models import Comentario, PagoEstado, Reserva, ReservaEstado
+
+
+def _reservas(app, datos):
+    with app.app_context():
+        estados = [
+            (ReservaEstado.PRE_RESERVA, PagoEstado.PENDIENTE, 100),
+            (ReservaEstado.CONFIRMADA, PagoEstado.PAGADO, 250),
+            (ReservaEstado.CONFIRMADA, PagoEstado.PAGADO, 300),
+            (ReservaEstado.CANCELADA_CLIENTE, PagoEstado.REEMBOLSO_TOTAL, 400),
+        ]
+        db.session.add_all([
+            Reserva(usuario_id=datos["cliente_id"], tour_id=datos["tour_id"], fecha_tour_id=datos["fecha_ids"][0],
+                    numero_personas=1, estado_reserva=estado, estado_pago=pago, monto_total=monto)
+            for estado, pago, monto in estados
+        ])
+        db.session.add(Comentario(usuario_id=datos["cliente_id"], tour_id=datos["tour_id"], comentario="Pendiente"))
+        db.session.commit()
+
+
+def _resumen(client, datos, contar_consultas):
+    with contar_consultas() as consultas:
+        r = client.get("/admin/dashboard/resumen", headers=datos["admin"])
+    assert r.status_code == 200
+    return r.json, len(consultas)
+
+
+def test_resumen_y_foto_compartida(app, client, datos, contar_consultas):
+    _reservas(app, datos)
+
+    resumen, primera = _resumen(client, datos, contar_consultas)
+    assert resumen == {
+        "tours_activos": 1,
+        "total_reservas": 4,
+        "comentarios_pendientes": 1,
+        "pagos_pendientes": 1,
+        "ingresos_totales": 550.0,
+        "reservas_estado": {"pre_reserva": 1, "confirmada": 2, "cancelada_cliente": 1, "cancelada_operador": 0},
+    }
+
+    # Dentro del TTL: solo la consulta del admin, ninguna de agregados
+    repetido, segunda = _resumen(client, datos, contar_consultas)
+    assert repetido == resumen
+    assert primera - segunda == 3
+
+    # Un commit sobre reservas descarta la foto al instante
+    r = client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": 1},
+        headers=datos["cliente"],
+    )
+    assert r.status_code == 201
+    resumen, _ = _resumen(client, datos, contar_consultas)
+    assert (resumen["total_reservas"], resumen["reservas_estado"]["pre_reserva"]) == (5, 2)
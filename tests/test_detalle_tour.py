@@ -0,0 +1,85 @@
+# tests/test_detalle_tour.py
+"""Consultas de Tour.to_detail_dict() con tour_detail_options() (user-001)."""
+from datetime import date, timedelta
+
+from extensions import db
+from models import (
+    FechaTour,
+    Galeria,
+    Guia,
+    Itinerario,
+    Tour,
+    TourBanner,
+    TourGuia,
+    TourIncluye,
+    TourSeccion,
+    TourUbicacion,
+    tour_detail_options,
+)
+
+
+def _agregar_contenido(tour_id, n):
+    """n filas de cada colección del detalle (y n guías de equipo distintos)."""
+    inicio = date.today() + timedelta(days=30)
+    for i in range(n):
+        guia = Guia(nombre=f"Guía {i}")
+        db.session.add(guia)
+        db.session.flush()
+        db.session.add_all([
+            FechaTour(tour_id=tour_id, fecha_inicio=inicio + timedelta(days=i),
+                      fecha_fin=inicio + timedelta(days=i + 3), cupos_totales=12),
+            Itinerario(tour_id=tour_id, orden_dia=i + 1, titulo_dia=f"Día {i + 1}", descripcion_dia="..."),
+            Galeria(tour_id=tour_id, foto_url=f"/g{i}.jpg", orden=i + 1),
+            TourSeccion(tour_id=tour_id, tipo="clima", titulo=f"S{i}", contenido="..."),
+            TourIncluye(tour_id=tour_id, tipo="incluye", descripcion=f"Item {i}"),
+            TourGuia(tour_id=tour_id, guia_id=guia.id, rol="Apoyo"),
+            TourBanner(tour_id=tour_id, media_url=f"/b{i}.jpg", orden=i),
+            TourUbicacion(tour_id=tour_id, nombre=f"Punto {i}", pais="Ecuador", latitud=-0.1 * i, longitud=-78.0),
+        ])
+    db.session.commit()
+
+
+def _consultas_detalle(app, contar_consultas, tour_id):
+    with app.app_context():
+        with contar_consultas() as consultas:
+            tour = Tour.query.options(*tour_detail_options()).filter_by(id=tour_id).one()
+            detalle = tour.to_detail_dict()
+        db.session.remove()
+    return len(consultas), detalle
+
+
+def test_detalle_con_consultas_constantes(app, datos, contar_consultas):
+    with app.app_context():
+        _agregar_contenido(datos["tour_id"], 1)
+    pocas, detalle = _consultas_detalle(app, contar_consultas, datos["tour_id"])
+    assert len(detalle["ubicaciones"]) == 1
+
+    with app.app_context():
+        _agregar_contenido(datos["tour_id"], 15)
+    muchas, detalle = _consultas_detalle(app, contar_consultas, datos["tour_id"])
+    assert len(detalle["ubicaciones"]) == 16
+    assert len(detalle["guias_equipo"]) == 16
+
+    # Un SELECT del tour (con categoría y guía principal) + uno por colección
+    assert muchas == pocas
+    assert muchas <= 10
+
+
+def test_detalle_con_campos_carga_solo_lo_pedido(app, datos, contar_consultas):
+    with app.app_context():
+        _agregar_contenido(datos["tour_id"], 3)
+
+    with app.app_context():
+        with contar_consultas() as consultas:
+            tour = (
+                Tour.query
+                .options(*tour_detail_options(["fechas", "galeria"]))
+                .filter_by(id=datos["tour_id"])
+                .one()
+            )
+            detalle = tour.to_detail_dict(["fechas", "galeria"])
+
+    assert len(detalle["fechas"]) == 4
+    assert len(detalle["galeria"]) == 3
+    assert "itinerarios" not in detalle
+    assert len(consultas) == 3
@@ -0,0 +1,121 @@
+# tests/test_documentos.py
+"""Documento precalculado de GET /tours/<slug> y cupos fuera de él (user-002)."""
+import documento_service
+from extensions import db
+from models import FechaTour, Guia, Tour, TourDocumento
+
+
+def _reservar(client, datos, personas=2):
+    return client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": personas},
+        headers=datos["cliente"],
+    )
+
+
+def test_detalle_se_sirve_del_documento(client, datos):
+    r = client.get(f"/tours/{datos['tour_slug']}")
+    assert r.status_code == 200
+    fecha = r.json["tour"]["fechas"][0]
+    assert fecha["cupos_totales"] == 10
+    assert fecha["cupos_ocupados"] == 0
+
+    r2 = client.get(f"/tours/{datos['tour_slug']}", headers={"If-None-Match": r.headers["ETag"]})
+    assert r2.status_code == 304
+
+
+def test_reserva_no_regenera_el_documento(app, client, datos, contar_consultas):
+    client.get(f"/tours/{datos['tour_slug']}")
+    with app.app_context():
+        antes = db.session.get(TourDocumento, datos["tour_id"]).documento
+
+    with contar_consultas() as consultas:
+        assert _reservar(client, datos).status_code == 201
+    assert not [c for c in consultas if "tour_documentos" in c]
+
+    with app.app_context():
+        assert db.session.get(TourDocumento, datos["tour_id"]).documento == antes
+
+
+def test_cupos_del_detalle_al_dia_tras_reservar(client, datos):
+    r = client.get(f"/tours/{datos['tour_slug']}")
+    etag = r.headers["ETag"]
+
+    assert _reservar(client, datos, personas=3).status_code == 201
+
+    r2 = client.get(f"/tours/{datos['tour_slug']}", headers={"If-None-Match": etag})
+    assert r2.status_code == 200
+    assert r2.json["tour"]["fechas"][0]["cupos_ocupados"] == 3
+    assert r2.headers["ETag"] != etag
+
+
+def test_edicion_de_la_salida_regenera_el_documento(app, client, datos):
+    client.get(f"/tours/{datos['tour_slug']}")
+    with app.app_context():
+        db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_totales = 25
+        db.session.commit()
+
+    r = client.get(f"/tours/{datos['tour_slug']}")
+    assert r.json["tour"]["fechas"][0]["cupos_totales"] == 25
+
+
+def test_respuesta_son_los_bytes_guardados(app, client, datos):
+    # Un texto del admin que imita la marca no se toca: sus comillas van escapadas
+    with app.app_context():
+        db.session.get(Tour, datos["tour_id"]).descripcion_corta = 'x "cupos_ocupados":"@1" y'
+        db.session.commit()
+    _reservar(client, datos, personas=4)
+
+    r = client.get(f"/tours/{datos['tour_slug']}")
+    assert r.json["tour"]["descripcion_corta"] == 'x "cupos_ocupados":"@1" y'
+    assert r.json["tour"]["fechas"][0]["cupos_ocupados"] == 4
+
+    with app.app_context():
+        guardado = db.session.get(TourDocumento, datos["tour_id"]).documento
+    marca = f'"cupos_ocupados":"@{datos["fecha_ids"][0]}"'.encode()
+    assert r.get_data() == guardado.replace(marca, b'"cupos_ocupados":4')
+
+
+def test_get_no_construye_el_documento(app, client, datos, contar_consultas):
+    with app.app_context():
+        TourDocumento.query.delete()
+        db.session.commit()
+
+    with contar_consultas() as consultas:
+        assert client.get(f"/tours/{datos['tour_slug']}").status_code == 404
+    assert not [c for c in consultas if c.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+
+    with app.app_context():
+        assert documento_service.reconstruir_todos() == 1
+    assert client.get(f"/tours/{datos['tour_slug']}").status_code == 200
+
+
+def _toca_documentos(consultas):
+    return [c for c in consultas if "tour_documentos" in c or "pg_advisory_xact_lock" in c or "FOR UPDATE" in c.upper()]
+
+
+def test_comentario_pendiente_y_perfil_no_regeneran(client, datos, contar_consultas):
+    with contar_consultas() as consultas:
+        r = client.post(f"/tours/{datos['tour_id']}/comentarios",
+                        json={"comentario": "Genial", "calificacion": 5}, headers=datos["cliente"])
+        assert r.status_code == 201
+        assert client.put("/auth/perfil", json={"telefono": "0999"}, headers=datos["cliente"]).status_code == 200
+    assert not _toca_documentos(consultas)
+
+
+def test_cambios_visibles_regeneran(app, client, datos):
+    comentario_id = client.post(f"/tours/{datos['tour_id']}/comentarios",
+                                json={"comentario": "Genial", "calificacion": 5}, headers=datos["cliente"]).json["comentario"]["id"]
+    r = client.patch(f"/admin/comentarios/{comentario_id}/aprobar", json={}, headers=datos["admin"])
+    assert r.status_code == 200
+    comentarios = client.get(f"/tours/{datos['tour_slug']}").json["comentarios"]
+    assert [c["usuario"] for c in comentarios] == ["Carlos"]
+
+    # El autor de un comentario aprobado cambia su nombre
+    client.put("/auth/perfil", json={"nombre": "Carla"}, headers=datos["cliente"])
+    assert client.get(f"/tours/{datos['tour_slug']}").json["comentarios"][0]["usuario"] == "Carla"
+
+    with app.app_context():
+        db.session.get(Guia, datos["guia_id"]).nombre = "Juana"
+        db.session.commit()
+    assert client.get(f"/tours/{datos['tour_slug']}").json["tour"]["guia_principal"]["nombre"] == "Juana"
@@ -0,0 +1,78 @@
+# tests/test_estadisticas.py
+"""Estadísticas del perfil en SQL y en caché por usuario (user-016)."""
+from extensions import db
+from models import Comentario
+
+
+def _estadisticas(client, datos, contar_consultas, quien="cliente"):
+    with contar_consultas() as consultas:
+        r = client.get("/tours/mi-perfil/estadisticas", headers=datos[quien])
+    assert r.status_code == 200
+    return r.json, len(consultas)
+
+
+def _reservar(client, datos, personas=2):
+    r = client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": personas},
+        headers=datos["cliente"],
+    )
+    assert r.status_code == 201
+    return r.json["reserva"]["id"]
+
+
+def _comentar(app, datos, usuario_id, calificacion):
+    with app.app_context():
+        comentario = Comentario(usuario_id=usuario_id, tour_id=datos["tour_id"],
+                                calificacion=calificacion, comentario="Muy bueno")
+        db.session.add(comentario)
+        db.session.commit()
+        return comentario.id
+
+
+def test_calculo_y_cache_por_usuario(app, client, datos, contar_consultas):
+    reserva_id = _reservar(client, datos)
+    client.patch(f"/admin/reservas/{reserva_id}/confirmar", json={}, headers=datos["admin"])
+    _reservar(client, datos, 1)
+    _comentar(app, datos, datos["cliente_id"], 4)
+
+    estadisticas, consultas = _estadisticas(client, datos, contar_consultas)
+    assert estadisticas["reservas"]["total"] == 2
+    assert estadisticas["reservas"]["por_estado"]["confirmada"] == 1
+    assert estadisticas["reservas"]["gasto_total"] == 1700.0
+    assert estadisticas["reservas"]["tours_diferentes"] == 1
+    assert estadisticas["comentarios"]["por_estado"]["pendiente"] == 1
+    assert estadisticas["comentarios"]["promedio_calificacion"] == 4.0
+    assert consultas == 3  # usuario + agregado de reservas + agregado de comentarios
+
+    # Repetir no consulta; los cambios de otro usuario no la descartan
+    assert _estadisticas(client, datos, contar_consultas) == (estadisticas, 0)
+    _comentar(app, datos, datos["admin_id"], 1)
+    assert _estadisticas(client, datos, contar_consultas)[1] == 0
+
+
+def test_invalidacion_al_cambiar_sus_datos(app, client, datos, contar_consultas):
+    _estadisticas(client, datos, contar_consultas)
+
+    # Una reserva suya
+    _reservar(client, datos)
+    estadisticas, consultas = _estadisticas(client, datos, contar_consultas)
+    assert (estadisticas["reservas"]["total"], consultas) == (1, 3)
+
+    # La moderación de su comentario (fila a fila y en lote)
+    comentario_id = _comentar(app, datos, datos["cliente_id"], 5)
+    _estadisticas(client, datos, contar_consultas)
+    client.patch(f"/admin/comentarios/{comentario_id}/aprobar", headers=datos["admin"])
+    estadisticas, _ = _estadisticas(client, datos, contar_consultas)
+    assert estadisticas["comentarios"]["por_estado"]["aprobado"] == 1
+
+    r = client.post("/admin/comentarios/lote", json={"accion": "rechazar", "ids": [comentario_id]},
+                    headers=datos["admin"])
+    assert r.status_code == 200
+    estadisticas, _ = _estadisticas(client, datos, contar_consultas)
+    assert estadisticas["comentarios"]["por_estado"]["rechazado"] == 1
+
+    # Su perfil
+    client.put("/auth/perfil", json={"nombre": "Carla"}, headers=datos["cliente"])
+    estadisticas, _ = _estadisticas(client, datos, contar_consultas)
+    assert estadisticas["usuario"]["nombre"] == "Carla"
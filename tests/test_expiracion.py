@@ -0,0 +1,121 @@
+# tests/test_expiracion.py
+"""Barrido de pre-reservas vencidas frente a la confirmación del admin (user-023)."""
+import runpy
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import Flask
+
+import expiracion_service
+from extensions import db
+from models import FechaTour, Reserva, ReservaEstado
+
+
+def _reservar(client, datos, personas=2):
+    return client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": personas},
+        headers=datos["cliente"],
+    ).json["reserva"]["id"]
+
+
+def _envejecer(app, reserva_id, horas):
+    with app.app_context():
+        db.session.get(Reserva, reserva_id).created_at = datetime.utcnow() - timedelta(hours=horas)
+        db.session.commit()
+
+
+def _confirmar(client, datos, reserva_id):
+    return client.patch(
+        f"/admin/reservas/{reserva_id}/confirmar",
+        json={"metodo_pago_externo": "transferencia", "referencia_pago": "T-1"},
+        headers=datos["admin"],
+    )
+
+
+def test_barrido_libera_cupos(app, client, datos):
+    vieja = _reservar(client, datos, 3)
+    _reservar(client, datos, 2)
+    _envejecer(app, vieja, 72)
+
+    with app.app_context():
+        assert expiracion_service.expirar_pre_reservas(48) == 1
+        assert db.session.get(Reserva, vieja).estado_reserva == ReservaEstado.CANCELADA_OPERADOR
+        assert db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados == 2
+
+
+def test_confirmar_pre_reserva(app, client, datos):
+    reserva_id = _reservar(client, datos)
+    r = _confirmar(client, datos, reserva_id)
+    assert r.status_code == 200
+    assert r.json["reserva"]["estado_reserva"] == "confirmada"
+
+    # Confirmar otra vez responde 200 sin pisar el pago registrado
+    r = client.patch(
+        f"/admin/reservas/{reserva_id}/confirmar",
+        json={"metodo_pago_externo": "efectivo", "referencia_pago": "T-2"},
+        headers=datos["admin"],
+    )
+    assert r.status_code == 200
+    assert r.json["message"] == "La reserva ya estaba confirmada"
+    assert r.json["reserva"]["estado_reserva"] == "confirmada"
+    with app.app_context():
+        reserva = db.session.get(Reserva, reserva_id)
+        assert (reserva.metodo_pago_externo, reserva.referencia_pago) == ("transferencia", "T-1")
+        assert db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados == 2
+
+
+def test_confirmar_despues_del_barrido(app, client, datos):
+    reserva_id = _reservar(client, datos)
+    _envejecer(app, reserva_id, 72)
+    with app.app_context():
+        expiracion_service.expirar_pre_reservas(48)
+
+    r = _confirmar(client, datos, reserva_id)
+    assert r.status_code == 409
+    with app.app_context():
+        reserva = db.session.get(Reserva, reserva_id)
+        assert reserva.estado_reserva == ReservaEstado.CANCELADA_OPERADOR
+        assert reserva.referencia_pago is None
+        assert db.session.get(FechaTour, datos["fecha_ids"][0]).cupos_ocupados == 0
+
+
+def test_confirmar_cancelada_por_el_cliente(app, client, datos):
+    reserva_id = _reservar(client, datos)
+    client.patch(f"/reservas/{reserva_id}/cancelar", json={}, headers=datos["cliente"])
+    assert _confirmar(client, datos, reserva_id).status_code == 409
+    assert _confirmar(client, datos, 999999).status_code == 404
+
+
+def test_hilo_lo_arranca_el_worker(monkeypatch):
+    hilos = []
+    monkeypatch.setattr(expiracion_service.threading, "Thread", lambda **kwargs: hilos.append(kwargs) or _Hilo())
+
+    app = Flask(__name__)
+    app.config.update(RESERVAS_EXPIRACION_HORAS=48, RESERVAS_EXPIRACION_HILO=True)
+    # Crear la app (también con `flask <comando>` o `flask run`) no arranca nada
+    expiracion_service.init_app(app)
+    assert hilos == []
+
+    expiracion_service.iniciar_barrido(app)
+    assert [h["name"] for h in hilos] == ["expiracion-pre-reservas"]
+
+    app.config["RESERVAS_EXPIRACION_HILO"] = False
+    expiracion_service.iniciar_barrido(app)
+    assert len(hilos) == 1
+
+
+def test_hook_de_gunicorn(monkeypatch):
+    iniciadas = []
+    monkeypatch.setattr(expiracion_service, "iniciar_barrido", iniciadas.append)
+
+    hooks = runpy.run_path(str(Path(__file__).parent.parent / "gunicorn.conf.py"))
+    hooks["post_worker_init"](None)
+
+    import app as modulo_app
+    assert iniciadas == [modulo_app.app]
+
+
+class _Hilo:
+    def start(self):
+        pass
@@ -0,0 +1,120 @@
+# tests/test_idempotencia.py
+"""Idempotency-Key en la creación de reservas (user-024)."""
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import idempotencia_service
+from extensions import db
+from models import ClaveIdempotencia, FechaTour, Reserva, Tour
+
+
+def _reservar(client, datos, clave, tour_id=None, fecha_id=None, personas=2):
+    return client.post(
+        f"/tours/{tour_id or datos['tour_id']}/reservas",
+        json={"fecha_tour_id": fecha_id or datos["fecha_ids"][0], "numero_personas": personas},
+        headers={**datos["cliente"], "Idempotency-Key": clave},
+    )
+
+
+def _otro_tour(app, datos):
+    with app.app_context():
+        tour = Tour(nombre="Andes", slug="andes", pais="Ecuador", duracion_dias=3, precio_pp=300,
+                    moneda="USD", categoria_id=datos["categoria_id"], guia_principal_id=datos["guia_id"])
+        db.session.add(tour)
+        db.session.flush()
+        inicio = date.today() + timedelta(days=30)
+        fecha = FechaTour(tour_id=tour.id, fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=2), cupos_totales=10)
+        db.session.add(fecha)
+        db.session.commit()
+        return tour.id, fecha.id
+
+
+def test_reintento_repite_la_respuesta(app, client, datos, correos):
+    primera = _reservar(client, datos, "k-1")
+    segunda = _reservar(client, datos, "k-1")
+
+    assert primera.status_code == segunda.status_code == 201
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert segunda.json == primera.json
+    assert len(correos) == 2  # cliente + admin, una sola vez
+    with app.app_context():
+        assert Reserva.query.count() == 1
+
+
+def test_misma_clave_con_otros_datos(client, datos):
+    assert _reservar(client, datos, "k-1").status_code == 201
+    assert _reservar(client, datos, "k-1", personas=3).status_code == 422
+
+
+def test_misma_clave_en_otra_ruta(app, client, datos):
+    tour_id, fecha_id = _otro_tour(app, datos)
+    primera = _reservar(client, datos, "k-1")
+    segunda = _reservar(client, datos, "k-1", tour_id=tour_id, fecha_id=fecha_id)
+
+    assert segunda.status_code == 201
+    assert "Idempotent-Replayed" not in segunda.headers
+    assert segunda.json["reserva"]["id"] != primera.json["reserva"]["id"]
+    with app.app_context():
+        assert {r.tour_id for r in Reserva.query.all()} == {datos["tour_id"], tour_id}
+        assert ClaveIdempotencia.query.count() == 2
+
+
+def test_clave_vencida_se_reclama_y_se_purga(app, client, datos):
+    _reservar(client, datos, "k-1")
+    _reservar(client, datos, "k-2")
+    with app.app_context():
+        vencida = ClaveIdempotencia.query.filter_by(clave="k-1").one()
+        vencida.expira_en = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.session.commit()
+
+    # Vencida: cuenta como una operación nueva
+    r = _reservar(client, datos, "k-1")
+    assert r.status_code == 201
+    assert "Idempotent-Replayed" not in r.headers
+
+    with app.app_context():
+        ClaveIdempotencia.query.filter_by(clave="k-2").one().expira_en = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.session.commit()
+        assert idempotencia_service.purgar() == 1
+        assert [c.clave for c in ClaveIdempotencia.query.all()] == ["k-1"]
+
+
+def test_respuesta_confirmada_con_la_reserva(app, client, datos, monkeypatch):
+    # La vista ya confirmó la reserva; el guardado aparte de la respuesta falla
+    def _fallar(*args):
+        raise RuntimeError("conexión perdida")
+
+    monkeypatch.setattr(idempotencia_service, "_guardar", _fallar)
+    primera = _reservar(client, datos, "k-1")
+    assert primera.status_code == 201
+    monkeypatch.undo()
+
+    # Aunque el reintento llegue después de _ABANDONO, no se reclama de nuevo
+    with app.app_context():
+        fila = ClaveIdempotencia.query.filter_by(clave="k-1").one()
+        assert fila.estado_http == 201
+        fila.created_at = datetime.now(timezone.utc) - idempotencia_service._ABANDONO * 2
+        db.session.commit()
+
+    segunda = _reservar(client, datos, "k-1")
+    assert segunda.status_code == 201
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert segunda.json == primera.json
+    with app.app_context():
+        assert Reserva.query.count() == 1
+
+
+def test_error_de_la_vista_libera_la_clave(app, client, datos, monkeypatch):
+    def _fallar(*args):
+        raise RuntimeError("sin correo")
+
+    monkeypatch.setattr(idempotencia_service, "anotar_respuesta", _fallar)
+    with pytest.raises(RuntimeError):
+        _reservar(client, datos, "k-1")
+    monkeypatch.undo()
+
+    with app.app_context():
+        assert ClaveIdempotencia.query.count() == 0
+        assert Reserva.query.count() == 0
+    assert _reservar(client, datos, "k-1").status_code == 201
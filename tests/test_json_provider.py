@@ -0,0 +1,71 @@
+# tests/test_json_provider.py
+"""Proveedor JSON con orjson (user-008)."""
+import decimal
+from datetime import date, datetime
+
+import pytest
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from models import ComentarioEstado, PagoEstado, ReservaEstado
+
+
+def test_tipos_nativos(app):
+    with app.app_context():
+        datos = app.json.loads(jsonify({
+            "monto": decimal.Decimal("1250.50"),
+            "estado": ReservaEstado.PRE_RESERVA,
+            "pago": PagoEstado.PENDIENTE,
+            "comentario": ComentarioEstado.APROBADO,
+            "texto": "Perú ñandú",
+        }).get_data())
+
+    assert datos == {
+        "monto": 1250.5,
+        "estado": ReservaEstado.PRE_RESERVA.value,
+        "pago": PagoEstado.PENDIENTE.value,
+        "comentario": ComentarioEstado.APROBADO.value,
+        "texto": "Perú ñandú",
+    }
+
+
+def test_fechas_con_el_formato_de_flask(app):
+    payload = {"dia": date(2026, 1, 2), "momento": datetime(2026, 1, 2, 3, 4, 5), "b": 1, "a": [1, 2]}
+    with app.app_context():
+        rapido = app.json.loads(jsonify(payload).get_data())
+        flask_por_defecto = app.json.loads(DefaultJSONProvider(app).response(payload).get_data())
+
+    assert rapido == flask_por_defecto
+    assert rapido["dia"] == "Fri, 02 Jan 2026 00:00:00 GMT"
+
+
+def test_salida_compacta_y_ordenada(app):
+    with app.app_context():
+        cuerpo = jsonify({"b": 1, "a": {"d": None, "c": True}}).get_data()
+    assert cuerpo == b'{"a":{"c":true,"d":null},"b":1}\n'
+
+
+def test_argumentos_de_jsonify(app):
+    with app.app_context():
+        assert app.json.loads(jsonify(1, 2).get_data()) == [1, 2]
+        assert app.json.loads(jsonify(x=1).get_data()) == {"x": 1}
+        assert jsonify().get_data() == b"null\n"
+        with pytest.raises(TypeError):
+            jsonify(1, x=2)
+
+
+def test_modo_debug_indentado(app):
+    app.debug = True
+    with app.app_context():
+        cuerpo = jsonify({"monto": decimal.Decimal("2.5")}).get_data(as_text=True)
+    assert cuerpo == '{\n  "monto": 2.5\n}\n'
+
+
+def test_sin_orjson_mismo_resultado(app, monkeypatch):
+    payload = {"monto": decimal.Decimal("9.99"), "estado": ReservaEstado.CONFIRMADA, "dia": date(2026, 5, 1)}
+    with app.app_context():
+        con_orjson = app.json.loads(jsonify(payload).get_data())
+        monkeypatch.setattr(json_provider, "orjson", None)
+        sin_orjson = app.json.loads(jsonify(payload).get_data())
+    assert con_orjson == sin_orjson
@@ -0,0 +1,84 @@
+# tests/test_paginacion.py
+"""Cursores de paginación por keyset (user-005 / user-018)."""
+import pytest
+
+from paginacion import codificar_cursor, decodificar_cursor, entero, fecha_hora, opcional, paginar
+
+
+def test_cursor_ida_y_vuelta():
+    cursor = codificar_cursor([None, 7])
+    assert decodificar_cursor(cursor, opcional(entero), entero) == [None, 7]
+
+    creado, ultimo_id = decodificar_cursor(codificar_cursor(["2026-01-02T03:04:05", 9]), fecha_hora, entero)
+    assert (creado.year, creado.hour, ultimo_id) == (2026, 3, 9)
+
+
+@pytest.mark.parametrize("valores", [
+    ["x", {}],
+    [1],
+    [1, 2, 3],
+    [1.5, 2],
+    [True, 2],
+    [1, "2"],
+    {"a": 1},
+])
+def test_cursor_manipulado(valores):
+    with pytest.raises(ValueError):
+        decodificar_cursor(codificar_cursor(valores) if isinstance(valores, list) else "e30", opcional(entero), entero)
+
+
+def test_cursor_basura():
+    with pytest.raises(ValueError):
+        decodificar_cursor("%%%no-es-base64", entero, entero)
+
+
+def test_listado_de_tours_rechaza_cursor_manipulado(client, datos):
+    cursor = codificar_cursor(["x", {}])
+    r = client.get(f"/tours?limit=5&cursor={cursor}")
+    assert r.status_code == 400
+
+
+def test_comentarios_del_admin_rechazan_cursor_manipulado(client, datos):
+    for valores in (["x", {}], [123, 1], ["2026-01-01T00:00:00", "1"]):
+        r = client.get(f"/admin/comentarios?limit=5&cursor={codificar_cursor(valores)}", headers=datos["admin"])
+        assert r.status_code == 400
+
+
+def test_recorrer_tours_por_paginas(app, client, datos):
+    from extensions import db
+    from models import Tour
+
+    with app.app_context():
+        for i, orden in enumerate([2, None, 1, None, 3]):
+            db.session.add(Tour(nombre=f"Tour {i}", slug=f"tour-{i}", pais="Perú",
+                               duracion_dias=3, precio_pp=100, orden_destacado=orden))
+        db.session.commit()
+
+    vistos, cursor = [], None
+    while True:
+        url = "/tours?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        pagina = client.get(url).json
+        vistos += [t["slug"] for t in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if not cursor:
+            break
+
+    assert pagina["total"] == 6
+    assert vistos == [t["slug"] for t in client.get("/tours").json]
+
+
+@pytest.mark.parametrize("args, esperado", [
+    ({"page": "2", "per_page": "1"}, {"total": 2, "page": 2, "per_page": 1, "pages": 2}),
+    ({"page": "0", "per_page": "999"}, {"total": 2, "page": 1, "per_page": 200, "pages": 1}),
+    ({"page": "x", "per_page": "-3"}, {"total": 2, "page": 1, "per_page": 1, "pages": 2}),
+])
+def test_paginar(app, datos, args, esperado):
+    from werkzeug.datastructures import MultiDict
+
+    from models import Usuario
+
+    with app.app_context():
+        q, paginacion = paginar(Usuario.query.order_by(Usuario.id), MultiDict(args))
+        assert paginacion == esperado
+        ids = [u.id for u in q.all()]
+    assert ids == ([datos["cliente_id"]] if esperado["page"] == 2 else [datos["admin_id"], datos["cliente_id"]][:esperado["per_page"]])
@@ -0,0 +1,102 @@
+# tests/test_reorden.py
+"""Reordenamiento en una sola sentencia (user-019)."""
+from extensions import db
+from models import Categoria, Galeria, Tour, TourBanner, TourUbicacion
+
+
+def _galeria(app, tour_id, n):
+    with app.app_context():
+        fotos = [Galeria(tour_id=tour_id, foto_url=f"/g{i}.jpg", orden=i + 1) for i in range(n)]
+        db.session.add_all(fotos)
+        db.session.commit()
+        return [f.id for f in fotos]
+
+
+def _otro_tour(app):
+    with app.app_context():
+        tour = Tour(nombre="Otro", slug="otro", pais="Perú", duracion_dias=3, precio_pp=100)
+        db.session.add(tour)
+        db.session.commit()
+        return tour.id
+
+
+def _orden_galeria(app, tour_id):
+    with app.app_context():
+        return [g.id for g in Galeria.query.filter_by(tour_id=tour_id).order_by(Galeria.orden)]
+
+
+def test_reordena_la_galeria_completa(app, client, datos, contar_consultas):
+    ids = _galeria(app, datos["tour_id"], 50)
+    nuevo = list(reversed(ids))
+
+    with contar_consultas() as consultas:
+        r = client.post("/admin/reorder/galeria", json={"orden": nuevo}, headers=datos["admin"])
+    assert r.status_code == 200
+    assert r.json["actualizados"] == 50
+    assert len([c for c in consultas if c.lstrip().upper().startswith("UPDATE") and "galerias" in c]) == 1
+    assert _orden_galeria(app, datos["tour_id"]) == nuevo
+
+
+def test_rechaza_orden_parcial(app, client, datos):
+    ids = _galeria(app, datos["tour_id"], 4)
+
+    r = client.post("/admin/reorder/galeria", json={"orden": ids[2:], "tour_id": datos["tour_id"]},
+                    headers=datos["admin"])
+    assert r.status_code == 400
+    assert _orden_galeria(app, datos["tour_id"]) == ids
+
+
+def test_rechaza_ids_de_otro_grupo(app, client, datos):
+    ids = _galeria(app, datos["tour_id"], 3)
+    ajenos = _galeria(app, _otro_tour(app), 2)
+
+    for body in (
+        {"orden": ids + ajenos[:1], "tour_id": datos["tour_id"]},
+        {"orden": ids + ajenos[:1]},
+        {"orden": ajenos, "tour_id": datos["tour_id"]},
+        {"orden": ids + [999999]},
+    ):
+        r = client.post("/admin/reorder/galeria", json=body, headers=datos["admin"])
+        assert r.status_code == 400, body
+    assert _orden_galeria(app, datos["tour_id"]) == ids
+
+
+def test_reordena_entidad_sin_grupo(app, client, datos):
+    with app.app_context():
+        db.session.add(Categoria(nombre="Andes", slug="andes", orden=2))
+        db.session.commit()
+        ids = [c.id for c in Categoria.query.order_by(Categoria.orden)]
+
+    assert client.post("/admin/reorder/categorias", json={"orden": ids[:1]},
+                       headers=datos["admin"]).status_code == 400
+    r = client.post("/admin/reorder/categorias", json={"orden": ids[::-1]}, headers=datos["admin"])
+    assert r.status_code == 200
+
+    with app.app_context():
+        assert [c.id for c in Categoria.query.order_by(Categoria.orden)] == ids[::-1]
+
+
+def test_rutas_antiguas_aceptan_una_parte(app, client, datos):
+    with app.app_context():
+        banners = [TourBanner(tour_id=datos["tour_id"], media_url=f"/b{i}.jpg", orden=i) for i in range(3)]
+        ubicaciones = [TourUbicacion(tour_id=datos["tour_id"], nombre=f"U{i}", pais="Ecuador", orden=i + 1)
+                       for i in range(3)]
+        db.session.add_all(banners + ubicaciones)
+        db.session.commit()
+        b = [x.id for x in banners]
+        u = [x.id for x in ubicaciones]
+
+    r = client.post("/admin/banners/reorder", json={"orden": [b[2]]}, headers=datos["admin"])
+    assert r.status_code == 200
+    r = client.post("/admin/ubicaciones/reorder", json={"orden": [u[2], u[1]]}, headers=datos["admin"])
+    assert r.status_code == 200
+
+    with app.app_context():
+        orden_banners = [(x.id, x.orden) for x in TourBanner.query.order_by(TourBanner.orden)]
+        orden_ubicaciones = [(x.id, x.orden) for x in TourUbicacion.query.order_by(TourUbicacion.orden)]
+    # Lo enviado primero; el resto detrás en su orden relativo. Banners desde 0, ubicaciones desde 1
+    assert orden_banners == [(b[2], 0), (b[0], 1), (b[1], 2)]
+    assert orden_ubicaciones == [(u[2], 1), (u[1], 2), (u[0], 3)]
+
+    # La ruta genérica sigue exigiendo el grupo completo
+    assert client.post("/admin/reorder/banners", json={"orden": [b[0]]}, headers=datos["admin"]).status_code == 400
@@ -0,0 +1,87 @@
+# tests/test_reportes.py
+"""Rollups de reportes mantenidos por deltas (user-014), en modo fila."""
+from decimal import Decimal
+
+import reportes_service
+from extensions import db
+from models import ReporteIngresoMensual, ReporteSalida
+from tests.conftest import sembrar
+
+
+def _rollups():
+    mensual = [
+        (r.mes, r.tour_id, r.moneda, r.reservas, r.reservas_confirmadas, r.reservas_canceladas,
+         r.personas, Decimal(r.monto_reservado), Decimal(r.monto_pagado))
+        for r in ReporteIngresoMensual.query.order_by(
+            ReporteIngresoMensual.mes, ReporteIngresoMensual.tour_id, ReporteIngresoMensual.moneda
+        )
+    ]
+    salidas = [
+        (r.fecha_tour_id, r.tour_id, r.reservas, r.reservas_confirmadas, r.reservas_canceladas,
+         r.personas, r.personas_confirmadas, Decimal(r.monto_reservado))
+        for r in ReporteSalida.query.order_by(ReporteSalida.fecha_tour_id)
+    ]
+    return mensual, salidas
+
+
+def _reservar(client, datos, fecha_id, personas):
+    r = client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": fecha_id, "numero_personas": personas},
+        headers=datos["cliente"],
+    )
+    assert r.status_code == 201
+    return r.json["reserva"]["id"]
+
+
+def test_deltas_coinciden_con_la_reconstruccion(app, client):
+    datos = sembrar(app, salidas=2)
+    primera, segunda = datos["fecha_ids"]
+
+    # Crear -> confirmar -> editar (personas, monto y salida)
+    reserva_id = _reservar(client, datos, primera, 2)
+    r = client.patch(
+        f"/admin/reservas/{reserva_id}/confirmar",
+        json={"metodo_pago_externo": "transferencia", "referencia_pago": "T-1"},
+        headers=datos["admin"],
+    )
+    assert r.status_code == 200
+    r = client.put(
+        f"/admin/reservas/{reserva_id}",
+        json={"numero_personas": 3, "monto_total": 2400, "fecha_tour_id": segunda},
+        headers=datos["admin"],
+    )
+    assert r.status_code == 200
+
+    # Crear -> cancelar por el cliente
+    cancelada = _reservar(client, datos, primera, 4)
+    r = client.patch(f"/reservas/{cancelada}/cancelar", json={}, headers=datos["cliente"])
+    assert r.status_code == 200
+
+    # Alta desde el panel, ya pagada
+    r = client.post(
+        "/admin/reservas",
+        json={
+            "usuario_id": datos["cliente_id"],
+            "tour_id": datos["tour_id"],
+            "fecha_tour_id": primera,
+            "numero_personas": 1,
+            "estado_reserva": "confirmada",
+            "estado_pago": "pagado",
+            "monto_total": 850,
+        },
+        headers=datos["admin"],
+    )
+    assert r.status_code == 201
+
+    with app.app_context():
+        incrementales = _rollups()
+        mensual, salidas = incrementales
+        assert [(s[0], s[2:7]) for s in salidas] == [
+            (primera, (2, 1, 1, 1, 1)),
+            (segunda, (1, 1, 0, 3, 3)),
+        ]
+        assert [m[3:] for m in mensual] == [(3, 2, 1, 4, Decimal("3250.00"), Decimal("3250.00"))]
+
+        assert reportes_service.reconstruir_reportes() == 3
+        assert _rollups() == incrementales
@@ -0,0 +1,66 @@
+# tests/test_reservas.py
+"""Creación de pre-reservas: monto del servidor y correos fuera del request (user-025)."""
+import threading
+import time
+
+import reserva_service
+from extensions import db
+from models import Reserva
+
+
+def _reservar(client, datos, personas=2, **extra):
+    return client.post(
+        f"/tours/{datos['tour_id']}/reservas",
+        json={"fecha_tour_id": datos["fecha_ids"][0], "numero_personas": personas, **extra},
+        headers=datos["cliente"],
+    )
+
+
+def test_monto_lo_calcula_el_servidor(app, client, datos):
+    r = _reservar(client, datos, 3, monto_total=1)
+    assert r.status_code == 201
+    assert r.json["reserva"]["monto_total"] == 850 * 3
+    with app.app_context():
+        assert db.session.get(Reserva, r.json["reserva"]["id"]).monto_total == 850 * 3
+
+
+def test_correos_al_cliente_y_al_admin(client, datos, correos):
+    r = _reservar(client, datos, datos_contacto={"email": "otra@mirlo.test"})
+    assert r.status_code == 201
+    assert [destino for destino, _ in correos] == [["otra@mirlo.test"], [reserva_service.ADMIN_EMAIL]]
+
+
+def test_fallo_de_correo_no_cambia_la_respuesta(app, client, datos, monkeypatch):
+    monkeypatch.setattr(reserva_service, "enviar_email", lambda *args, **kwargs: None)
+    r = _reservar(client, datos)
+    assert r.status_code == 201
+    assert r.json["message"] == "Pre-reserva creada exitosamente. Te enviaremos un correo de confirmación."
+
+
+def test_correos_en_fondo_no_retienen_la_respuesta(app, client, datos, monkeypatch):
+    app.config["RESERVAS_CORREOS_EN_FONDO"] = True
+    soltar = threading.Event()
+    enviados = []
+
+    def _enviar_lento(to, subject, html, from_email=None):
+        soltar.wait(5)
+        enviados.append(to)
+        return {"id": "fondo"}
+
+    monkeypatch.setattr(reserva_service, "enviar_email", _enviar_lento)
+
+    r = _reservar(client, datos)
+    assert r.status_code == 201
+    assert enviados == []
+
+    soltar.set()
+    limite = time.monotonic() + 5
+    while len(enviados) < 2 and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert len(enviados) == 2
+
+
+def test_rutas_de_reserva_registradas_una_vez(app):
+    reglas = [r.rule for r in app.url_map.iter_rules()]
+    assert reglas.count("/tours/<int:tour_id>/reservas") == 1
+    assert reglas.count("/tours/mis-reservas") == 1
@@ -0,0 +1,53 @@
+# tests/test_tarjetas.py
+"""Textos largos diferidos y listados de tarjetas con tour_card_options() (user-009)."""
+from extensions import db
+from models import Itinerario, Tour, tour_card_options, tour_detail_options
+
+_TEXTOS = ("descripcion_corta", "descripcion_larga", "ruta_resumida", "descripcion_dia")
+
+
+def _agregar_tours(app, datos, n):
+    with app.app_context():
+        for i in range(n):
+            tour = Tour(nombre=f"Tour {i}", slug=f"tour-{i}", pais="Perú", duracion_dias=3, precio_pp=100,
+                        categoria_id=datos["categoria_id"], descripcion_larga="x" * 5000)
+            db.session.add(tour)
+            db.session.flush()
+            db.session.add(Itinerario(tour_id=tour.id, orden_dia=1, titulo_dia="Llegada", descripcion_dia="y" * 5000))
+        db.session.commit()
+
+
+def test_tarjetas_sin_textos_largos(app, datos, contar_consultas):
+    _agregar_tours(app, datos, 20)
+    with app.app_context():
+        with contar_consultas() as consultas:
+            tarjetas = [t.to_card_dict() for t in Tour.query.options(*tour_card_options()).all()]
+    assert len(tarjetas) == 21
+    assert tarjetas[0]["categoria"]["slug"] == "galapagos"
+    # Un solo SELECT (tour + categoría), sin las columnas de texto
+    assert len(consultas) == 1
+    assert not any(texto in consultas[0] for texto in _TEXTOS)
+
+
+def test_textos_diferidos_y_detalle(app, datos, contar_consultas):
+    _agregar_tours(app, datos, 1)
+    with app.app_context():
+        with contar_consultas() as consultas:
+            tour = Tour.query.filter_by(slug="tour-0").one()
+            assert tour.descripcion_larga == "x" * 5000  # un SELECT más, al pedirlo
+        assert "descripcion_larga" not in consultas[0]
+        assert len(consultas) == 2
+        db.session.remove()
+
+        with contar_consultas() as consultas:
+            tour = Tour.query.options(*tour_detail_options()).filter_by(slug="tour-0").one()
+            detalle = tour.to_detail_dict()
+        total = len(consultas)
+        assert detalle["descripcion_larga"] == "x" * 5000
+        assert detalle["itinerarios"][0]["descripcion_dia"] == "y" * 5000
+
+        # Los textos vinieron con el detalle: leerlos no consulta más
+        with contar_consultas() as consultas:
+            tour.descripcion_corta, tour.itinerarios[0].descripcion_dia
+        assert consultas == []
+        assert total <= 10
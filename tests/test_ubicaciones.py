@@ -0,0 +1,65 @@
+# tests/test_ubicaciones.py
+"""Importación de ubicaciones desde GeoJSON (user-020)."""
+import io
+import json
+
+import pytest
+
+import ubicaciones_service
+from models import TourUbicacion
+
+
+def _importar(client, datos, documento):
+    texto = documento if isinstance(documento, str) else json.dumps(documento)
+    return client.post(
+        f"/admin/tours/{datos['tour_id']}/ubicaciones/import",
+        data={"file": (io.BytesIO(texto.encode()), "ruta.geojson")},
+        headers=datos["admin"],
+        content_type="multipart/form-data",
+    )
+
+
+def _punto(nombre, lon, lat):
+    return {"type": "Feature", "properties": {"name": nombre},
+            "geometry": {"type": "Point", "coordinates": [lon, lat]}}
+
+
+def test_importa_feature_collection(app, client, datos):
+    r = _importar(client, datos, {"type": "FeatureCollection", "features": [
+        _punto("Quito", -78.5, -0.2),
+        _punto("Puerto Ayora", -90.3, -0.7),
+    ]})
+    assert r.status_code == 201
+    assert [u["nombre"] for u in r.json["ubicaciones"]] == ["Quito", "Puerto Ayora"]
+    assert r.json["ubicaciones"][1]["latitud"] == -0.7
+
+
+@pytest.mark.parametrize("documento", ["[1, 2]", '"texto"', "null",
+                                       {"type": "FeatureCollection", "features": {"a": 1}}])
+def test_documento_con_forma_invalida(client, datos, documento):
+    r = _importar(client, datos, documento)
+    assert r.status_code == 400
+    assert "message" in r.json
+
+
+def test_features_invalidas_se_reportan_por_fila(app, client, datos):
+    r = _importar(client, datos, {"type": "FeatureCollection", "features": [
+        _punto("Quito", -78.5, -0.2),
+        "no soy una feature",
+        {"type": "Feature", "properties": ["x"], "geometry": None},
+        {"type": "Feature", "properties": {"name": "A"}, "geometry": "Point"},
+        {"type": "Feature", "properties": {"name": "B"}, "geometry": {"type": "Point", "coordinates": 5}},
+        {"type": "Feature", "properties": {"name": "C"}, "geometry": {"type": "LineString", "coordinates": []}},
+        _punto("D", {"x": 1}, 0),
+    ]})
+    assert r.status_code == 400
+    filas_con_error = {e["fila"] for e in r.json["errores"]}
+    assert filas_con_error == {2, 3, 4, 5, 6, 7}
+
+    with app.app_context():
+        assert TourUbicacion.query.count() == 0
+
+
+def test_leer_geojson_sin_geometria():
+    filas = ubicaciones_service.leer_geojson(json.dumps({"type": "Feature", "properties": {"nombre": "Sin mapa"}}))
+    assert filas == [{"nombre": "Sin mapa"}]
@@ -0,0 +1,241 @@
+# ubicaciones_service.py
+"""
+Carga masiva de ubicaciones de un tour (mapa de la ruta).
+
+Las filas llegan como JSON, CSV o GeoJSON, se validan todas juntas (columna
+por columna, reportando cada error con su número de fila) y se insertan con
+un solo INSERT ... RETURNING multi-fila en vez de un flush por objeto:
+
+    filas = leer_csv(texto)              # o leer_geojson / lista del JSON
+    valores, errores = validar(filas, tour, siguiente_orden(tour.id))
+    creadas = insertar(tour.id, valores)
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import func, insert
+
+import documento_service
+from extensions import db
+from models import TourUbicacion
+
+MAX_FILAS = 5000
+
+# Nombres alternativos aceptados en los encabezados del CSV / properties
+_ALIAS = {
+    "lat": "latitud",
+    "latitude": "latitud",
+    "lng": "longitud",
+    "lon": "longitud",
+    "long": "longitud",
+    "longitude": "longitud",
+    "name": "nombre",
+    "tipo": "tipo_ubicacion",
+}
+
+_TEXTOS = ("nombre", "pais", "provincia", "ciudad", "descripcion", "tipo_ubicacion", "imagen_url")
+_ENTEROS = ("orden", "dia_inicio", "dia_fin")
+
+
+# =====================================================
+# LECTURA DE ARCHIVOS
+# =====================================================
+
+def _normalizar_claves(fila):
+    normalizada = {}
+    for clave, valor in fila.items():
+        clave = (clave or "").strip().lower()
+        normalizada[_ALIAS.get(clave, clave)] = valor
+    return normalizada
+
+
+def leer_csv(texto):
+    """Filas de un CSV con encabezados (nombre, latitud, longitud, ...). Acepta ',' o ';'."""
+    texto = texto.lstrip("\ufeff")
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:2048], delimiters=",;")
+    except csv.Error:
+        dialecto = csv.excel
+    return [_normalizar_claves(fila) for fila in csv.DictReader(io.StringIO(texto), dialect=dialecto)]
+
+
+def _fila_de_feature(feature):
+    """
+    Fila de un Feature. Lo que no tiene la forma de GeoJSON queda anotado en
+    "_error" y validar() lo reporta con el número de fila.
+    """
+    if not isinstance(feature, dict):
+        return {"_error": "La feature no es un objeto"}
+
+    propiedades = feature.get("properties")
+    if propiedades is None:
+        propiedades = {}
+    if not isinstance(propiedades, dict):
+        return {"_error": "properties debe ser un objeto"}
+    fila = _normalizar_claves(propiedades)
+
+    geometria = feature.get("geometry")
+    if geometria is None:
+        return fila
+    if not isinstance(geometria, dict):
+        fila["_error"] = "geometry debe ser un objeto"
+    elif geometria.get("type") != "Point":
+        fila["_error"] = f"Geometría no soportada: {geometria.get('type')} (solo Point)"
+    elif not isinstance(geometria.get("coordinates"), list) or len(geometria["coordinates"]) < 2:
+        fila["_error"] = "coordinates debe ser [longitud, latitud]"
+    else:
+        fila["longitud"], fila["latitud"] = geometria["coordinates"][:2]
+    return fila
+
+
+def leer_geojson(texto):
+    """
+    Filas de un FeatureCollection de puntos: las properties dan los campos y
+    las coordenadas [longitud, latitud] la posición. ValueError si el
+    documento no es un GeoJSON; los errores de cada feature los reporta validar().
+    """
+    try:
+        documento = json.loads(texto)
+    except json.JSONDecodeError:
+        raise ValueError("El archivo no es un GeoJSON válido")
+
+    if not isinstance(documento, dict):
+        raise ValueError("Se esperaba un Feature o FeatureCollection")
+    if documento.get("type") == "Feature":
+        features = [documento]
+    elif documento.get("type") == "FeatureCollection":
+        features = documento.get("features") or []
+        if not isinstance(features, list):
+            raise ValueError("features debe ser una lista")
+    else:
+        raise ValueError("Se esperaba un Feature o FeatureCollection")
+
+    return [_fila_de_feature(feature) for feature in features]
+
+
+# =====================================================
+# VALIDACIÓN
+# =====================================================
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _columna(filas, campo, convertir, errores):
+    """Convierte una columna entera; anota (fila, mensaje) por cada valor inválido."""
+    resultado = []
+    for i, fila in enumerate(filas, start=1):
+        valor = fila.get(campo)
+        if _vacio(valor):
+            resultado.append(None)
+            continue
+        try:
+            resultado.append(convertir(valor))
+        except (InvalidOperation, TypeError, ValueError):
+            errores.append({"fila": i, "error": f"{campo} inválido: {valor}"})
+            resultado.append(None)
+    return resultado
+
+
+def _decimal(valor):
+    numero = Decimal(str(valor).strip().replace(",", "."))
+    if not numero.is_finite():
+        raise ValueError(valor)
+    return numero
+
+
+def _entero(valor):
+    return int(str(valor).strip())
+
+
+def siguiente_orden(tour_id):
+    """Primer orden libre al final de la ruta del tour."""
+    maximo = (
+        db.session.query(func.max(TourUbicacion.orden))
+        .filter(TourUbicacion.tour_id == tour_id)
+        .scalar()
+    )
+    return (maximo or 0) + 1
+
+
+def validar(filas, tour, orden_inicial=1):
+    """
+    Valida y normaliza las filas. Devuelve (valores, errores): valores está
+    listo para insertar() y solo se debe usar si errores está vacío.
+    """
+    errores = []
+    if not filas:
+        return [], [{"fila": None, "error": "Debe proporcionar al menos una ubicacion"}]
+    if len(filas) > MAX_FILAS:
+        return [], [{"fila": None, "error": f"Máximo {MAX_FILAS} ubicaciones por carga"}]
+
+    # Elementos que no son objetos cuentan como filas vacías (sin nombre)
+    filas = [fila if isinstance(fila, dict) else {} for fila in filas]
+
+    latitudes = _columna(filas, "latitud", _decimal, errores)
+    longitudes = _columna(filas, "longitud", _decimal, errores)
+    enteros = {campo: _columna(filas, campo, _entero, errores) for campo in _ENTEROS}
+
+    valores = []
+    for i, fila in enumerate(filas):
+        n = i + 1
+        lat, lon = latitudes[i], longitudes[i]
+        textos = {
+            campo: str(fila.get(campo)).strip() if not _vacio(fila.get(campo)) else None
+            for campo in _TEXTOS
+        }
+
+        if fila.get("_error"):
+            errores.append({"fila": n, "error": fila["_error"]})
+        if not textos["nombre"]:
+            errores.append({"fila": n, "error": "nombre es obligatorio"})
+        if (lat is None) != (lon is None):
+            errores.append({"fila": n, "error": "latitud y longitud van juntas"})
+        if lat is not None and not -90 <= lat <= 90:
+            errores.append({"fila": n, "error": f"latitud fuera de rango: {lat}"})
+        if lon is not None and not -180 <= lon <= 180:
+            errores.append({"fila": n, "error": f"longitud fuera de rango: {lon}"})
+
+        dia_inicio, dia_fin = enteros["dia_inicio"][i], enteros["dia_fin"][i]
+        if dia_inicio is not None and dia_fin is not None and dia_fin < dia_inicio:
+            errores.append({"fila": n, "error": "dia_fin es anterior a dia_inicio"})
+
+        orden = enteros["orden"][i]
+        valores.append({
+            "tour_id": tour.id,
+            "nombre": textos["nombre"],
+            "pais": textos["pais"] or tour.pais,
+            "provincia": textos["provincia"],
+            "ciudad": textos["ciudad"],
+            "descripcion": textos["descripcion"],
+            "latitud": lat,
+            "longitud": lon,
+            "orden": orden if orden is not None else orden_inicial + i,
+            "dia_inicio": dia_inicio,
+            "dia_fin": dia_fin,
+            "tipo_ubicacion": textos["tipo_ubicacion"] or "destino",
+            "imagen_url": textos["imagen_url"],
+            "activo": True,
+        })
+
+    errores.sort(key=lambda e: e["fila"] or 0)
+    return valores, errores
+
+
+# =====================================================
+# INSERCIÓN
+# =====================================================
+
+def insertar(tour_id, valores):
+    """
+    Inserta todas las filas con un INSERT ... RETURNING multi-fila y devuelve
+    las ubicaciones creadas. No hace commit.
+    """
+    if not valores:
+        return []
+    creadas = db.session.scalars(insert(TourUbicacion).returning(TourUbicacion), valores).all()
+    # INSERT masivo: avisar qué documento de tour hay que regenerar
+    documento_service.marcar_tours([tour_id])
+    return creadas